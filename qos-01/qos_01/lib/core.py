@@ -53,6 +53,9 @@ class Signal(Protocol):
     y: np.ndarray
     linked_signal: Signal | None
     source: ColumnDataSource
+    plot: figure
+    dtype: type
+    _pending: bool
 
     def generate(self, f: Callable, **kwargs) -> np.ndarray:
         ...
@@ -63,6 +66,45 @@ class Signal(Protocol):
     def _add_callbacks(self) -> None:
         ...
 
+    def _render(self) -> None:
+        ...
+
+    def _request_render(self) -> None:
+        """
+        Render on the next tick of the document, so that a burst of slider
+        events is coalesced into one update. Without a document (standalone
+        output) render at once.
+        """
+        doc = self.plot.document
+        if doc is None:
+            self._render()
+            return
+        if self._pending:
+            return
+        self._pending = True
+        doc.add_next_tick_callback(self._render)
+
+    def _push_y(self) -> None:
+        """
+        Send only the ``y`` column to the browser, ``x`` never changes.
+        NumPy columns are sent as binary buffers.
+        """
+        self.source.data["y"] = self.y.astype(self.dtype, copy=False)
+
+    def _update_linked(self, y: np.ndarray) -> None:
+        """
+        Replace this signal's contribution to the linked signal by ``y``.
+
+        Parameters
+        ----------
+        y : np.ndarray
+            New samples of this signal.
+        """
+        if self.linked_signal:
+            self.linked_signal.y -= self.y
+            self.linked_signal.y += y
+            self.linked_signal._request_render()
+
     def add_plot(
         self,
         x: np.ndarray,
@@ -89,18 +131,22 @@ class Signal(Protocol):
     def __add__(self, other: Self) -> Signal:
         assert (self.x == other.x).all()
         y = self.y + other.y
-        combined_signal = CombinedSignal(y=y, x=self.x)
+        combined_signal = CombinedSignal(y=y, x=self.x, dtype=self.dtype)
         self.linked_signal = combined_signal
         other.linked_signal = combined_signal
         return combined_signal
 
 
 class CombinedSignal(Signal):
-    def __init__(self, y, x):
+    def __init__(self, y, x, dtype=np.float64):
         self.y = y
         self.x = x
+        self.dtype = dtype
         self.linked_signal = None
-        self.source = ColumnDataSource(data=dict(x=self.x, y=self.y))
+        self._pending = False
+        self.source = ColumnDataSource(
+            data=dict(x=self.x.astype(dtype, copy=False), y=self.y.astype(dtype, copy=False))
+        )
         self.plot = self.add_plot(
             self.x, "time [s]", self.y, "amplitude [V]", "Combined signal", self.source
         )
@@ -114,6 +160,12 @@ class CombinedSignal(Signal):
     def _add_callbacks(self):
         ...
 
+    def _render(self) -> None:
+        # the linked signals have already updated y in place
+        self._pending = False
+        self._push_y()
+
+
 class HarmSignal(Signal):
     """
     Class representing a harmonic signal.
@@ -145,6 +197,7 @@ class HarmSignal(Signal):
         title: str = "Input signal",
         x_axis_label: str = "time [s]",
         y_axis_label: str = "amplitude [V]",
+        dtype: type = np.float64,
     ):
         """
         Initialize a harmonic signal.
@@ -169,13 +222,21 @@ class HarmSignal(Signal):
             Label for the x-axis, by default "time [s]".
         y_axis_label : str, optional
             Label for the y-axis, by default "amplitude [V]".
+        dtype : type, optional
+            Type of the samples sent to the browser, by default np.float64.
+            np.float32 halves the transferred data.
         """
         self.x = np.linspace(0, max_range, no_samples)
+        self._omega_x = 2 * np.pi * self.x  # cached, scaled by freq on update
         self.y = self.generate(f, amplitude, freq, phase)
         self.f = f
+        self.dtype = dtype
         self.linked_signal = None
+        self._pending = False
 
-        self.source = ColumnDataSource(data=dict(x=self.x, y=self.y))
+        self.source = ColumnDataSource(
+            data=dict(x=self.x.astype(dtype, copy=False), y=self.y.astype(dtype, copy=False))
+        )
         self.amplitude = Slider(
             title="amplitude [V]",
             value=amplitude,
@@ -238,7 +299,11 @@ class HarmSignal(Signal):
         np.ndarray
             Generated signal.
         """
-        return amplitude * f(2 * np.pi * freq * self.x + phase)
+        arg = self._omega_x * freq
+        arg += phase
+        y = f(arg, out=arg) if isinstance(f, np.ufunc) else f(arg)
+        y *= amplitude
+        return y
 
     def update(self, attrname, old, new) -> None:
         """
@@ -253,6 +318,13 @@ class HarmSignal(Signal):
         new : Any
             New value of the attribute.
         """
+        self._request_render()
+
+    def _render(self) -> None:
+        """
+        Regenerate the signal from the current slider values and send it.
+        """
+        self._pending = False
         # Get the current slider values
         a = self.amplitude.value
         w = self.phase.value
@@ -260,15 +332,9 @@ class HarmSignal(Signal):
 
         # Generate the new curve
         y = self.generate(self.f, a, k, w)
-
-        self.source.data = dict(x=self.x, y=y)
-
-        if self.linked_signal:
-            self.linked_signal.y -= self.y
-            self.linked_signal.y += y
-            self.linked_signal.source.data = dict(x=self.x, y=self.linked_signal.y)
-
+        self._update_linked(y)
         self.y = y
+        self._push_y()
 
 
 class NoiseSignal(Signal):
@@ -294,6 +360,7 @@ class NoiseSignal(Signal):
         title: str = "Noise signal",
         x_axis_label: str = "time [s]",
         y_axis_label: str = "amplitude [V]",
+        dtype: type = np.float64,
     ):
         """
         Initialize a noise signal.
@@ -314,13 +381,20 @@ class NoiseSignal(Signal):
             Label for the x-axis, by default "time [s]".
         y_axis_label : str, optional
             Label for the y-axis, by default "amplitude [V]".
+        dtype : type, optional
+            Type of the samples sent to the browser, by default np.float64.
+            np.float32 halves the transferred data.
         """
         self.x = np.linspace(0, max_range, no_samples)
         self.y = self.generate(f, amplitude=amplitude)
         self.f = f
+        self.dtype = dtype
         self.linked_signal = None
+        self._pending = False
 
-        self.source = ColumnDataSource(data=dict(x=self.x, y=self.y))
+        self.source = ColumnDataSource(
+            data=dict(x=self.x.astype(dtype, copy=False), y=self.y.astype(dtype, copy=False))
+        )
         self.amplitude = Slider(
             title="amplitude [V]",
             value=amplitude,
@@ -374,14 +448,17 @@ class NoiseSignal(Signal):
         new : Any
             New value of the attribute.
         """
+        self._request_render()
+
+    def _render(self) -> None:
+        """
+        Draw new noise with the current amplitude and send it.
+        """
+        self._pending = False
         # Get the current slider values
         a = self.amplitude.value
         y = self.generate(self.f, a)
-        self.source.data = dict(x=self.x, y=y)
-        if self.linked_signal:
-            self.linked_signal.y -= self.y
-            self.linked_signal.y += y
-            self.linked_signal.source.data = dict(x=self.x, y=self.linked_signal.y)
-
+        self._update_linked(y)
         self.y = y
+        self._push_y()
 
@@ -0,0 +1,666 @@
+"""
+Analytic results for a Poisson source feeding a single port.
+
+``recognize`` reads the parameters of a ``PacketSource`` and a port and
+returns a ``QueueModel`` if the configuration is a textbook queue: Poisson
+arrivals (exponential intervals) and constant or exponential packet sizes.
+``QueueModel.solve`` then gives the mean delay, occupancy and loss without
+simulating::
+
+    source = PacketSource(env, "src", port, Distribution("exponential", scale=1.0),
+                          Distribution("exponential", scale=100))
+    result = solve(source, port)
+    result.mean_delay, result.loss_rate
+
+``PacketSource`` truncates drawn sizes to whole bytes (and zero to one byte),
+so the service time of "exponential" sizes follows that discrete
+distribution. It is used as is, which makes the results exact for unlimited
+queues (Pollaczek-Khinchine) and for constant sizes with a byte capacity
+(M/D/1/K embedded Markov chain). With variable sizes a byte capacity is not a
+packet count: ``mg1_bytes`` solves a chain on the queued bytes numerically,
+an approximation flagged by ``AnalyticResult.approximate``.
+"""
+
+import math
+from functools import partial
+from typing import Any, Optional
+
+import numpy as np
+
+from .core import BYTES_TO_BITS
+from .variates import Distribution, Variate
+
+SIZE_TAIL = 1e-12  # probability mass of exponential sizes left out
+MAX_LEVELS = 300  # byte levels of the mg1_bytes chain
+
+
+def mg1(arrival_rate: float, service: np.ndarray, probs: np.ndarray) -> dict[str, float]:
+    """
+    M/G/1 queue with an unlimited queue, Pollaczek-Khinchine formula.
+
+    Parameters
+    ----------
+    arrival_rate : float
+        Poisson arrival rate.
+    service : np.ndarray
+        Possible service times.
+    probs : np.ndarray
+        Their probabilities.
+
+    Returns
+    -------
+    dict[str, float]
+        Mean packets in the system, loss probability (0), throughput and
+        mean delay. Infinite if the load is 1 or more.
+    """
+    es = float((service * probs).sum())
+    es2 = float((service**2 * probs).sum())
+    rho = arrival_rate * es
+    if rho >= 1:
+        return {
+            "mean_packets": math.inf,
+            "loss_rate": 0.0,
+            "throughput": 1 / es,
+            "mean_delay": math.inf,
+        }
+    delay = es + arrival_rate * es2 / (2 * (1 - rho))
+    return {
+        "mean_packets": arrival_rate * delay,
+        "loss_rate": 0.0,
+        "throughput": arrival_rate,
+        "mean_delay": delay,
+    }
+
+
+def mg1k(
+    arrival_rate: float, service: np.ndarray, probs: np.ndarray, k: int
+) -> dict[str, float]:
+    """
+    M/G/1/K queue, solved through the Markov chain embedded at departures.
+
+    The chain counts the packets left behind by a departing packet, 0 to
+    ``k - 1``. Its stationary distribution ``d`` gives the time-average
+    distribution ``p[j] = d[j] / (d[0] + rho)`` for ``j < k`` and
+    ``p[k] = 1 - 1 / (d[0] + rho)``.
+
+    Parameters
+    ----------
+    arrival_rate : float
+        Poisson arrival rate.
+    service : np.ndarray
+        Possible service times.
+    probs : np.ndarray
+        Their probabilities.
+    k : int
+        Maximum number of packets in the system, including the one in
+        service.
+
+    Returns
+    -------
+    dict[str, float]
+        Mean packets in the system, loss probability, throughput in packets
+        per time unit and mean delay of accepted packets.
+    """
+    rho = arrival_rate * float((service * probs).sum())
+    if k == 1:
+        p_busy = rho / (1 + rho)
+        throughput = arrival_rate * (1 - p_busy)
+        return {
+            "mean_packets": p_busy,
+            "loss_rate": p_busy,
+            "throughput": throughput,
+            "mean_delay": p_busy / throughput,
+        }
+    # a[j]: probability of j arrivals during a service, mixed over sizes
+    j = np.arange(k)
+    log_factorial = np.concatenate(([0.0], np.cumsum(np.log(np.arange(1, k)))))
+    x = arrival_rate * service[:, None]
+    with np.errstate(divide="ignore"):
+        log_pmf = j * np.log(x) - x - log_factorial
+    a = (probs[:, None] * np.exp(log_pmf)).sum(axis=0)
+
+    transition = np.zeros((k, k))
+    for i in range(k):
+        lo = max(i - 1, 0)
+        width = k - 1 - lo
+        transition[i, lo : k - 1] = a[:width]
+        transition[i, k - 1] = max(0.0, 1.0 - a[:width].sum())
+    # stationary distribution: d (P - I) = 0 with sum(d) = 1
+    system = np.vstack(((transition - np.eye(k)).T[:-1], np.ones(k)))
+    rhs = np.zeros(k)
+    rhs[-1] = 1.0
+    d = np.linalg.solve(system, rhs)
+
+    scale = d[0] + rho
+    p = np.append(d / scale, 1 - 1 / scale)
+    mean_packets = float((np.arange(k + 1) * p).sum())
+    throughput = float(arrival_rate * (1 - p[k]))
+    return {
+        "mean_packets": mean_packets,
+        "loss_rate": float(p[k]),
+        "throughput": throughput,
+        "mean_delay": mean_packets / throughput,
+    }
+
+
+def mg1_bytes(
+    arrival_rate: float,
+    sizes: np.ndarray,
+    probs: np.ndarray,
+    transmission_rate: float,
+    capacity: int,
+    max_levels: int = MAX_LEVELS,
+) -> dict[str, float]:
+    """
+    M/G/1 queue with a capacity in queued bytes, solved numerically.
+
+    The chain is embedded at departures and its state is the number of
+    queued bytes ``w``, in units of ``ceil(capacity / max_levels)`` bytes. An
+    arrival is accepted if ``w`` plus its size fits the capacity, also at an
+    idle port. The next packet to transmit is drawn from the size
+    distribution truncated to ``w``, which is the only approximation besides
+    the byte units. During a transmission of ``tau`` the accepted arrivals
+    follow the acceptance kernel ``A``, so the bytes at its end are
+    ``sum_j Poisson(j; arrival_rate tau) A^j``. The same powers give the time
+    spent at every level and the residual transmission time seen by
+    arrivals, hence loss and delay.
+
+    Parameters
+    ----------
+    arrival_rate : float
+        Poisson arrival rate.
+    sizes : np.ndarray
+        Possible packet sizes in bytes.
+    probs : np.ndarray
+        Their probabilities.
+    transmission_rate : float
+        Port rate in bits per time unit.
+    capacity : int
+        Maximum number of queued bytes, not counting the packet in
+        transmission.
+    max_levels : int, optional
+        Maximum number of byte levels, by default ``MAX_LEVELS``. The cost
+        grows with its cube.
+
+    Returns
+    -------
+    dict[str, float]
+        Mean packets in the system, loss probability, throughput in packets
+        per time unit, mean delay and mean transmission time of accepted
+        packets.
+    """
+    unit = max(1, math.ceil(capacity / max_levels))
+    c = capacity // unit
+    n = c + 1
+    units = np.ceil(sizes / unit).astype(np.int64)
+    p = np.bincount(units, weights=probs, minlength=n + 1)[:n]
+    fits = np.cumsum(p)  # fits[k]: probability that a packet fits in k units
+    if fits[c] <= 0:
+        return {
+            "mean_packets": 0.0,
+            "loss_rate": 1.0,
+            "throughput": 0.0,
+            "mean_delay": math.nan,
+            "mean_service": 0.0,
+        }
+    size_bytes = np.bincount(units, weights=probs * sizes, minlength=n + 1)[:n]
+    mean_bytes = np.divide(size_bytes, p, out=np.zeros(n), where=p > 0)
+    tau = BYTES_TO_BITS * mean_bytes / transmission_rate  # by size in units
+
+    # acceptance kernel of one arrival
+    levels = np.arange(n)
+    kernel = np.zeros((n, n))
+    for w in range(n):
+        kernel[w, w:] = p[: n - w]
+        kernel[w, w] += 1 - fits[c - w]
+    # head[w, h]: size in units of the next packet to transmit if w are queued
+    head = np.tril(np.tile(p, (n, 1)))
+    head[0] = p  # idle: the next accepted arrival
+    head /= np.where(levels == 0, fits[c], np.where(fits > 0, fits, 1.0))[:, None]
+
+    x = arrival_rate * tau
+    jumps = int(x.max() + 10 * math.sqrt(x.max()) + 10)
+    j = np.arange(jumps + 2)
+    log_factorial = np.concatenate(([0.0], np.cumsum(np.log(np.arange(1, jumps + 2)))))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pmf = np.exp(j * np.log(x)[:, None] - x[:, None] - log_factorial)
+    pmf[x == 0] = 0.0
+    pmf[x == 0, 0] = 1.0
+    survival = np.clip(1 - np.cumsum(pmf, axis=1), 0.0, None)  # P(N > j)
+
+    # row w, column start level w - h of the transmission
+    h = levels[:, None] - levels[None, :]
+    valid = h >= 0
+    h = np.where(valid, h, 0)
+    weight = np.where(valid, head[levels[:, None], h], 0.0)
+    weight[0] = 0.0
+    step = np.zeros((n, n))  # transitions between departures
+    occupancy = np.zeros((n, n))  # time at each level per transmission
+    residual = np.zeros((n, n))  # remaining transmission time at each level
+    power = np.eye(n)
+    for k in range(jumps + 1):
+        time_k = survival[:, k] / arrival_rate
+        residual_k = tau * time_k - (k + 1) / arrival_rate**2 * survival[:, k + 1]
+        rows = np.stack((weight * pmf[h, k], weight * time_k[h], weight * residual_k[h]))
+        # after an idle period the transmission starts at level 0
+        rows[:, 0, 0] = head[0] @ pmf[:, k], head[0] @ time_k, head[0] @ residual_k
+        step += rows[0] @ power
+        occupancy += rows[1] @ power
+        residual += rows[2] @ power
+        power = power @ kernel
+    total = step.sum(axis=1)
+    step[total == 0, 0] = 1.0  # levels below the smallest size are never left behind
+    step /= step.sum(axis=1, keepdims=True)
+    system = np.vstack(((step - np.eye(n)).T[:-1], np.ones(n)))
+    rhs = np.zeros(n)
+    rhs[-1] = 1.0
+    d = np.linalg.solve(system, rhs)
+
+    time_at = d @ occupancy
+    time_at[0] += d[0] / (arrival_rate * fits[c])  # idle periods
+    cycle = time_at.sum()
+    levels_time = time_at / cycle  # time-average distribution, seen by arrivals
+    accept = fits[c - levels]
+    accepted = float((levels_time * accept).sum())
+    # transmission time of an accepted packet, by level
+    own = np.cumsum(p * tau)[c - levels]
+    service = float((levels_time * own).sum()) / accepted
+    wait = (
+        float((d @ residual * accept).sum()) / cycle
+        + float((levels_time * accept * BYTES_TO_BITS * unit * levels).sum()) / transmission_rate
+    ) / accepted
+    throughput = arrival_rate * accepted
+    return {
+        "mean_packets": throughput * (wait + service),
+        "loss_rate": 1 - accepted,
+        "throughput": throughput,
+        "mean_delay": wait + service,
+        "mean_service": service,
+    }
+
+
+def exponential_scale(variate: Variate) -> Optional[float]:
+    """
+    Scale of an exponential variate.
+
+    Parameters
+    ----------
+    variate : Variate
+        ``Distribution("exponential", ...)`` or ``partial(rng.exponential, ...)``.
+
+    Returns
+    -------
+    Optional[float]
+        The scale, or None if the variate is not exponential.
+    """
+    if isinstance(variate, Distribution):
+        if variate.name != "exponential":
+            return None
+        return float(variate.params.get("scale", 1.0))
+    if isinstance(variate, partial):
+        func = variate.func
+        if getattr(func, "__name__", None) != "exponential" or not isinstance(
+            getattr(func, "__self__", None), np.random.Generator
+        ):
+            return None
+        if variate.args:
+            return float(variate.args[0])
+        return float(variate.keywords.get("scale", 1.0))
+    return None
+
+
+def size_distribution(packet_size: Variate) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    """
+    Distribution of the packet sizes a ``PacketSource`` generates.
+
+    Parameters
+    ----------
+    packet_size : Variate
+        Constant or exponential packet size.
+
+    Returns
+    -------
+    Optional[tuple[np.ndarray, np.ndarray]]
+        Sizes in bytes and their probabilities, or None if the variate is
+        neither constant nor exponential.
+    """
+    if isinstance(packet_size, (int, float)):
+        return np.array([int(packet_size)], dtype=np.float64), np.array([1.0])
+    scale = exponential_scale(packet_size)
+    if scale is None:
+        return None
+    # int(X) = k with probability q^k (1 - q), q = exp(-1 / scale); 0 becomes 1
+    q = math.exp(-1 / scale)
+    top = max(2, math.ceil(scale * -math.log(SIZE_TAIL)))
+    k = np.arange(1, top + 1)
+    probs = q**k * (1 - q)
+    probs[0] += 1 - q
+    return k.astype(np.float64), probs / probs.sum()
+
+
+class QueueModel:
+    """
+    A Poisson source feeding one port.
+
+    Attributes
+    ----------
+    arrival_rate : float
+        Packets per time unit.
+    sizes : np.ndarray
+        Possible packet sizes in bytes.
+    size_probs : np.ndarray
+        Their probabilities.
+    transmission_rate : float
+        Port rate in bits per time unit.
+    capacity : Optional[int]
+        Port capacity in queued bytes, None if unlimited.
+    size_scale : Optional[float]
+        Scale of exponential packet sizes, None for constant sizes.
+    """
+
+    def __init__(
+        self,
+        arrival_rate: float,
+        sizes: np.ndarray,
+        size_probs: np.ndarray,
+        transmission_rate: float,
+        capacity: Optional[int],
+        size_scale: Optional[float] = None,
+    ) -> None:
+        self.arrival_rate = arrival_rate
+        self.sizes = sizes
+        self.size_probs = size_probs
+        self.transmission_rate = transmission_rate
+        self.capacity = capacity or None  # 0 means unlimited, like the ports
+        self.size_scale = size_scale
+
+    @property
+    def constant_size(self) -> bool:
+        return len(self.sizes) == 1
+
+    @property
+    def service(self) -> np.ndarray:
+        """Possible transmission times."""
+        return BYTES_TO_BITS * self.sizes / self.transmission_rate
+
+    @property
+    def mean_size(self) -> float:
+        return float((self.sizes * self.size_probs).sum())
+
+    @property
+    def utilization(self) -> float:
+        """Offered load ``rho``."""
+        return self.arrival_rate * float((self.service * self.size_probs).sum())
+
+    @property
+    def approximate(self) -> bool:
+        """Whether ``solve`` approximates, see ``mg1_bytes``."""
+        return self.capacity is not None and not self.constant_size
+
+    @property
+    def system_size(self) -> Optional[int]:
+        """
+        Maximum number of packets in the system, None if unlimited or if
+        sizes vary: the packets that fit in the queue plus the one in
+        transmission. 0 if a packet is larger than the capacity, the port then
+        drops everything.
+        """
+        if self.capacity is None or not self.constant_size:
+            return None
+        size = int(self.sizes[0])
+        if size > self.capacity:
+            return 0
+        return self.capacity // size + 1
+
+    @property
+    def kendall(self) -> str:
+        """Kendall notation of the model."""
+        service = "D" if self.constant_size else "G"
+        if self.approximate:
+            return f"M/G/1/{self.capacity}B"
+        k = self.system_size
+        return f"M/{service}/1" + ("" if k is None else f"/{k}")
+
+    def solve(self) -> "AnalyticResult":
+        """
+        Solve the model.
+
+        Returns
+        -------
+        AnalyticResult
+            Delay, occupancy and loss.
+        """
+        k = self.system_size
+        es = float((self.service * self.size_probs).sum())
+        if k == 0:
+            # nothing is accepted, there is no delay to measure
+            return AnalyticResult(
+                self.kendall,
+                mean_delay=math.nan,
+                mean_wait=math.nan,
+                mean_packets=0.0,
+                loss_rate=1.0,
+                throughput=0.0,
+                utilization=0.0,
+            )
+        if self.approximate:
+            result = mg1_bytes(
+                self.arrival_rate,
+                self.sizes,
+                self.size_probs,
+                self.transmission_rate,
+                self.capacity,  # type: ignore
+            )
+            # accepted packets are smaller than average
+            es = result["mean_service"]
+        elif k is None:
+            result = mg1(self.arrival_rate, self.service, self.size_probs)
+        else:
+            result = mg1k(self.arrival_rate, self.service, self.size_probs, k)
+        return AnalyticResult(
+            self.kendall,
+            mean_delay=result["mean_delay"],
+            mean_wait=result["mean_delay"] - es,
+            mean_packets=result["mean_packets"],
+            loss_rate=result["loss_rate"],
+            throughput=result["throughput"] * es * self.transmission_rate,
+            utilization=result["throughput"] * es,
+            approximate=self.approximate,
+        )
+
+    def __repr__(self) -> str:
+        """
+        String representation of the queue model.
+
+        Returns
+        -------
+        str
+            String representation of the queue model.
+        """
+        return f"QueueModel({self.kendall}, rho={self.utilization:.4g})"
+
+
+class AnalyticResult:
+    """
+    Steady-state metrics of a ``QueueModel``.
+
+    Attributes
+    ----------
+    model : str
+        Kendall notation of the solved model.
+    mean_delay : float
+        Mean time from creation to delivery of accepted packets, as measured
+        by a ``PacketSink`` right behind the port.
+    mean_wait : float
+        Mean time accepted packets wait before transmission.
+    mean_packets : float
+        Time-average number of packets in the system, see ``OccupancyTap``.
+    loss_rate : float
+        Fraction of packets dropped.
+    throughput : float
+        Delivered bits per time unit.
+    utilization : float
+        Fraction of time the port transmits.
+    approximate : bool
+        Whether the model was solved approximately, see ``mg1_bytes``.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        mean_delay: float,
+        mean_wait: float,
+        mean_packets: float,
+        loss_rate: float,
+        throughput: float,
+        utilization: float,
+        approximate: bool = False,
+    ) -> None:
+        self.model = model
+        self.mean_delay = mean_delay
+        self.mean_wait = mean_wait
+        self.mean_packets = mean_packets
+        self.loss_rate = loss_rate
+        self.throughput = throughput
+        self.utilization = utilization
+        self.approximate = approximate
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the metrics with the names used by the components.
+
+        Returns
+        -------
+        dict[str, float]
+            Delay, wait, occupancy, loss, throughput and utilization.
+        """
+        return {
+            "mean_delay": self.mean_delay,
+            "mean_wait": self.mean_wait,
+            "mean_packets": self.mean_packets,
+            "loss_rate": self.loss_rate,
+            "throughput": self.throughput,
+            "utilization": self.utilization,
+        }
+
+    def __repr__(self) -> str:
+        """
+        String representation of the analytic result.
+
+        Returns
+        -------
+        str
+            String representation of the analytic result.
+        """
+        return (
+            f"AnalyticResult({self.model}, mean_delay={self.mean_delay:.6g}, "
+            f"loss_rate={self.loss_rate:.6g}{', approximate' if self.approximate else ''})"
+        )
+
+
+def recognize(source: Any, port: Any) -> Optional[QueueModel]:
+    """
+    Build the queue model of a source feeding a port, if it is a textbook
+    case.
+
+    Parameters
+    ----------
+    source : Any
+        ``PacketSource``, or any object with ``packet_interval`` and
+        ``packet_size``.
+    port : Any
+        ``SwitchPort`` or ``FastSwitchPort``, or any object with
+        ``capacity`` and ``transmission_rate``.
+
+    Returns
+    -------
+    Optional[QueueModel]
+        The model, or None if the intervals are not exponential or the sizes
+        neither constant nor exponential.
+    """
+    scale = exponential_scale(source.packet_interval)
+    sizes = size_distribution(source.packet_size)
+    if scale is None or sizes is None:
+        return None
+    return QueueModel(
+        1 / scale,
+        sizes[0],
+        sizes[1],
+        port.transmission_rate,
+        port.capacity,
+        exponential_scale(source.packet_size),
+    )
+
+
+def solve(source: Any, port: Any) -> Optional[AnalyticResult]:
+    """
+    Solve a source feeding a port analytically, see ``recognize``.
+
+    Parameters
+    ----------
+    source : Any
+        The packet source.
+    port : Any
+        The port.
+
+    Returns
+    -------
+    Optional[AnalyticResult]
+        The result, or None if the configuration is not recognized.
+    """
+    model = recognize(source, port)
+    return model.solve() if model is not None else None
+
+
+def cross_check(
+    model: QueueModel, until: float = 100000, seed: Optional[int] = 0
+) -> dict[str, tuple[float, float]]:
+    """
+    Compare a model with a simulation of the same configuration.
+
+    The simulation uses the vectorized engine in ``lindley`` with fresh
+    generators, so the variates of the original source are not consumed.
+
+    Parameters
+    ----------
+    model : QueueModel
+        The model to check.
+    until : float, optional
+        Simulation horizon, by default 100000.
+    seed : Optional[int], optional
+        Seed of the simulation, by default 0.
+
+    Returns
+    -------
+    dict[str, tuple[float, float]]
+        Analytic and simulated value of the mean delay, loss rate and
+        throughput.
+    """
+    from .lindley import run_tandem
+
+    seeds = np.random.SeedSequence(seed).spawn(2)
+    interval = Distribution(
+        "exponential", np.random.default_rng(seeds[0]), scale=1 / model.arrival_rate
+    )
+    size: Variate = int(model.sizes[0])
+    if model.size_scale is not None:
+        size = Distribution("exponential", np.random.default_rng(seeds[1]), scale=model.size_scale)
+    result = run_tandem(
+        until,
+        interval,
+        size,
+        num_ports=1,
+        port_capacity=model.capacity,
+        port_transmission_rate=model.transmission_rate,
+    )
+    analytic = model.solve()
+    port = result.ports[0]
+    summary = result.summary()
+    return {
+        "mean_delay": (analytic.mean_delay, summary.get("mean_delay", math.nan)),
+        "loss_rate": (
+            analytic.loss_rate,
+            port.cum_drop_count / port.cum_packet_count if port.cum_packet_count else math.nan,
+        ),
+        "throughput": (analytic.throughput, summary.get("throughput", math.nan)),
+    }
@@ -0,0 +1,376 @@
+"""
+Performance benchmarks of the simulator.
+
+Every scenario is a builder like in ``replicate`` and runs in a fresh worker
+process, so the peak RSS belongs to that scenario alone. The best of
+``repeat`` runs is reported. Run from the ``qos_02`` directory::
+
+    python -m lib.bench --save              # record a baseline
+    python -m lib.bench                     # compare against it
+    python -m lib.bench --scenario mm1 --port-class fast
+    python -m lib.bench --backend kernel    # on kernel.Environment
+
+A metric regresses if it is worse than the baseline by more than the
+threshold: lower packets or events per CPU second, or higher peak RSS or
+live memory blocks per packet. The sinks keep streaming statistics only, so
+the live blocks are what the simulator itself retains, e.g. a leak, and not
+the per-packet values of the sinks. Events are counted in a second, untimed
+run of the scenario that steps the environment, which works on both
+backends and keeps the timed run on their own ``run`` loops. The exit
+status is 1 if anything regressed. Rates vary by 10-20 % between runs on
+shared or virtual machines, use a larger ``--repeat`` or ``--threshold``
+there.
+"""
+
+import argparse
+import json
+import platform
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from time import perf_counter, process_time
+from typing import Any, Callable, Optional
+
+import numpy as np
+import simpy
+
+from . import kernel
+from .core import (
+    FastSwitchPort,
+    PacketFork,
+    PacketSink,
+    PacketSource,
+    Switch,
+    SwitchPort,
+)
+
+DEFAULT_BASELINE = "bench_baseline.json"
+PORT_CLASSES = {"simpy": SwitchPort, "fast": FastSwitchPort}
+BACKENDS = {"simpy": simpy.Environment, "kernel": kernel.Environment}
+# metric name -> +1 if higher is better, -1 if lower is better
+METRICS = {
+    "packets_per_second": 1,
+    "events_per_second": 1,
+    "max_rss": -1,
+    "blocks_per_packet": -1,
+}
+
+
+def mm1(env: simpy.Environment, rng: np.random.Generator, port_class: type) -> dict[str, Any]:
+    """
+    Poisson source into a single port with an unlimited queue, load 0.8.
+    """
+    sink = PacketSink(env, "sink", retention="streaming", keep_packets=False)
+    port = port_class(env, 0, capacity=None, transmission_rate=1000)
+    port.destination = sink
+    source = PacketSource(
+        env, "source", port, partial(rng.exponential, 1.0), partial(rng.exponential, 100)
+    )
+    return {"sources": [source], "sinks": [sink]}
+
+
+def switch4(env: simpy.Environment, rng: np.random.Generator, port_class: type) -> dict[str, Any]:
+    """
+    Four sources into a 4-port switch with small queues, load 0.95 with
+    tail drops.
+    """
+    switch = Switch(env, "switch", 4, 500, 1000, port_class=port_class)
+    sources, sinks = [], []
+    for i, port in enumerate(switch.ports):
+        sink = PacketSink(env, f"sink{i}", retention="streaming", keep_packets=False)
+        port.destination = sink
+        sources.append(
+            PacketSource(
+                env,
+                f"source{i}",
+                port,
+                partial(rng.exponential, 0.8 / 0.95),
+                partial(rng.exponential, 100),
+            )
+        )
+        sinks.append(sink)
+    return {"sources": sources, "sinks": sinks}
+
+
+def fork(env: simpy.Environment, rng: np.random.Generator, port_class: type) -> dict[str, Any]:
+    """
+    One source forked into 8 ports with uneven probabilities.
+    """
+    probs = [0.3, 0.2, 0.15, 0.1, 0.1, 0.05, 0.05, 0.05]
+    packet_fork = PacketFork(env, probs, rng)
+    sinks = []
+    for i in range(len(probs)):
+        port = port_class(env, i, capacity=2000, transmission_rate=1000)
+        port.destination = PacketSink(env, f"sink{i}", retention="streaming", keep_packets=False)
+        packet_fork.destinations[i] = port
+        sinks.append(port.destination)
+    source = PacketSource(
+        env, "source", packet_fork, partial(rng.exponential, 0.25), partial(rng.exponential, 100)
+    )
+    return {"sources": [source], "sinks": sinks}
+
+
+def tandem10(env: simpy.Environment, rng: np.random.Generator, port_class: type) -> dict[str, Any]:
+    """
+    One source through a chain of 10 ports, load 0.8.
+    """
+    switch = Switch(env, "switch", 10, 5000, 1000, port_class=port_class)
+    for port, nxt in zip(switch.ports, switch.ports[1:]):
+        port.destination = nxt
+    sink = PacketSink(env, "sink", retention="streaming", keep_packets=False)
+    switch.ports[-1].destination = sink
+    source = PacketSource(
+        env, "source", switch.ports[0], partial(rng.exponential, 1.0), partial(rng.exponential, 100)
+    )
+    return {"sources": [source], "sinks": [sink]}
+
+
+def agg1000(env: simpy.Environment, rng: np.random.Generator, port_class: type) -> dict[str, Any]:
+    """
+    1000 sources aggregated into one port, total load 0.8.
+    """
+    port = port_class(env, 0, capacity=20000, transmission_rate=1000)
+    sink = PacketSink(env, "sink", retention="streaming", keep_packets=False)
+    port.destination = sink
+    sources = [
+        PacketSource(
+            env, f"source{i}", port, partial(rng.exponential, 1000.0), partial(rng.exponential, 100)
+        )
+        for i in range(1000)
+    ]
+    return {"sources": sources, "sinks": [sink]}
+
+
+# name -> (builder, horizon)
+SCENARIOS: dict[str, tuple[Callable[..., dict[str, Any]], float]] = {
+    "mm1": (mm1, 100000),
+    "switch4": (switch4, 25000),
+    "fork": (fork, 25000),
+    "tandem10": (tandem10, 20000),
+    "agg1000": (agg1000, 50000),
+}
+
+
+def count_events(
+    name: str, port_class: str = "simpy", seed: int = 1, backend: str = "simpy"
+) -> int:
+    """
+    Run a scenario once with ``step`` and count the processed events.
+
+    Parameters
+    ----------
+    name : str
+        Scenario name, a key of ``SCENARIOS``.
+    port_class : str, optional
+        Port implementation, a key of ``PORT_CLASSES``, by default "simpy".
+    seed : int, optional
+        Seed of the scenario's generator, by default 1.
+    backend : str, optional
+        Environment, a key of ``BACKENDS``, by default "simpy".
+
+    Returns
+    -------
+    int
+        Events processed before the horizon, like ``run(until=horizon)``.
+    """
+    build, until = SCENARIOS[name]
+    env = BACKENDS[backend]()
+    build(env, np.random.default_rng(seed), PORT_CLASSES[port_class])
+    events = 0
+    while env.peek() < until:
+        env.step()
+        events += 1
+    return events
+
+
+def run_scenario(
+    name: str, port_class: str = "simpy", seed: int = 1, backend: str = "simpy"
+) -> dict[str, float]:
+    """
+    Run a scenario once in this process and measure it.
+
+    Parameters
+    ----------
+    name : str
+        Scenario name, a key of ``SCENARIOS``.
+    port_class : str, optional
+        Port implementation, a key of ``PORT_CLASSES``, by default "simpy".
+    seed : int, optional
+        Seed of the scenario's generator, by default 1.
+    backend : str, optional
+        Environment, a key of ``BACKENDS``, by default "simpy".
+
+    Returns
+    -------
+    dict[str, float]
+        Generated and received packets, processed events (see
+        ``count_events``), wall and CPU time, packets and events per CPU
+        second, peak RSS in bytes and live memory blocks per generated packet
+        after the run.
+    """
+    build, until = SCENARIOS[name]
+    env = BACKENDS[backend]()
+    blocks = sys.getallocatedblocks()
+    components = build(env, np.random.default_rng(seed), PORT_CLASSES[port_class])
+    start, cpu_start = perf_counter(), process_time()
+    env.run(until=until)
+    wall = perf_counter() - start
+    cpu = process_time() - cpu_start
+    packets = sum(s.packets_sent for s in components["sources"])
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    blocks = sys.getallocatedblocks() - blocks
+    events = count_events(name, port_class, seed, backend)
+    return {
+        "packets": packets,
+        "received": sum(s.packet_count for s in components["sinks"]),
+        "events": events,
+        "wall_time": wall,
+        "cpu_time": cpu,
+        "packets_per_second": packets / cpu,
+        "events_per_second": events / cpu,
+        "max_rss": rss if sys.platform == "darwin" else rss * 1024,
+        "blocks_per_packet": blocks / max(packets, 1),
+    }
+
+
+def run_benchmarks(
+    names: Optional[list[str]] = None,
+    port_class: str = "simpy",
+    repeat: int = 3,
+    backend: str = "simpy",
+) -> dict[str, dict[str, float]]:
+    """
+    Run scenarios in fresh processes and keep the best of ``repeat`` runs.
+
+    Parameters
+    ----------
+    names : Optional[list[str]], optional
+        Scenario names, by default all.
+    port_class : str, optional
+        Port implementation, a key of ``PORT_CLASSES``, by default "simpy".
+    repeat : int, optional
+        Number of runs per scenario, by default 3.
+    backend : str, optional
+        Environment, a key of ``BACKENDS``, by default "simpy".
+
+    Returns
+    -------
+    dict[str, dict[str, float]]
+        Measurements by scenario, each metric at its best over the runs.
+    """
+    results: dict[str, dict[str, float]] = {}
+    for name in names or list(SCENARIOS):
+        runs = []
+        for _ in range(repeat):
+            # a fresh process per run, ru_maxrss only ever grows
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                runs.append(executor.submit(run_scenario, name, port_class, 1, backend).result())
+        best = dict(runs[0])
+        for metric, sign in METRICS.items():
+            values = [r[metric] for r in runs]
+            best[metric] = max(values) if sign > 0 else min(values)
+        best["wall_time"] = min(r["wall_time"] for r in runs)
+        best["cpu_time"] = min(r["cpu_time"] for r in runs)
+        results[name] = best
+    return results
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    threshold: float = 0.1,
+) -> list[str]:
+    """
+    Find metrics that are worse than the baseline by more than ``threshold``.
+
+    Parameters
+    ----------
+    results : dict[str, dict[str, float]]
+        Current measurements by scenario.
+    baseline : dict[str, dict[str, float]]
+        Baseline measurements by scenario.
+    threshold : float, optional
+        Allowed relative deterioration, by default 0.1.
+
+    Returns
+    -------
+    list[str]
+        Descriptions of the regressions.
+    """
+    regressions = []
+    for name, result in results.items():
+        for metric, sign in METRICS.items():
+            old = baseline.get(name, {}).get(metric)
+            if not old:
+                continue
+            change = (result[metric] - old) / abs(old)
+            if sign * change < -threshold:
+                regressions.append(
+                    f"{name}.{metric}: {old:.4g} -> {result[metric]:.4g} ({change:+.1%})"
+                )
+    return regressions
+
+
+def format_results(results: dict[str, dict[str, float]]) -> str:
+    """
+    Format measurements as a table.
+
+    Parameters
+    ----------
+    results : dict[str, dict[str, float]]
+        Measurements by scenario.
+
+    Returns
+    -------
+    str
+        The table.
+    """
+    lines = [
+        f"{'scenario':<10}{'packets':>10}{'pkt/s':>11}{'events/s':>11}{'RSS MiB':>9}{'blocks/pkt':>11}"
+    ]
+    for name, r in results.items():
+        lines.append(
+            f"{name:<10}{r['packets']:>10}{r['packets_per_second']:>11,.0f}"
+            f"{r['events_per_second']:>11,.0f}{r['max_rss'] / 2**20:>9.1f}"
+            f"{r['blocks_per_packet']:>11.3f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS))
+    parser.add_argument("--port-class", default="simpy", choices=list(PORT_CLASSES))
+    parser.add_argument("--backend", default="simpy", choices=list(BACKENDS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--save", action="store_true", help="write the results as the baseline")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scenario, args.port_class, args.repeat, args.backend)
+    # baselines by port class, suffixed with any other backend
+    key = args.port_class if args.backend == "simpy" else f"{args.port_class}/{args.backend}"
+    print(format_results(results))
+    path = Path(args.baseline)
+    if args.save:
+        data = json.loads(path.read_text()) if path.exists() else {}
+        data.setdefault(key, {}).update(results)
+        data["machine"] = {"python": platform.python_version(), "platform": platform.platform()}
+        path.write_text(json.dumps(data, indent=2))
+        print(f"baseline written to {path}")
+        return 0
+    if not path.exists():
+        print(f"no baseline at {path}, run with --save first")
+        return 0
+    baseline = json.loads(path.read_text()).get(key, {})
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,430 @@
+"""
+Run length control: warm-up detection and precision-based stopping.
+
+Instead of guessing ``env.run(until=...)``, a ``RunController`` watches the
+mean delay at sinks and the mean occupancy of ports while the simulation
+runs, and stops it once every metric is estimated precisely enough::
+
+    controller = RunController(env, sinks=[sink], ports=[port], precision=0.05)
+    report = controller.run(max_time=1e6)
+    report.estimates["sink.mean_delay"], report.warmup_time, report.sim_time
+
+Every ``interval`` of simulated time the controller reads how much delay and
+occupancy accumulated since its last look. Means of 5 consecutive intervals
+feed the MSER-5 rule, which finds the end of the warm-up transient. The
+intervals after it are grouped into ``batches`` batch means, and the run
+stops when the Student t confidence interval of every metric is within
+``precision`` of its mean. Interval data are kept in constant memory: when
+``max_intervals`` are reached, neighbouring intervals are merged and the
+interval length doubles.
+
+The estimates exclude the warm-up, unlike the ``summary()`` of the watched
+components, which covers the whole run.
+"""
+
+import math
+from typing import Any, Iterator, Optional, Sequence, Union
+
+import numpy as np
+import simpy
+
+from .core import OccupancyTap, PacketSink
+from .stats import mean_ci, mser_truncation
+
+MSER_BATCH = 5  # intervals per MSER batch
+
+
+class SinkDelay:
+    """
+    Delay accumulated at a sink, read incrementally.
+
+    Works with every retention: the streaming statistics keep a running
+    mean, the other retentions the per-packet delays.
+
+    Attributes
+    ----------
+    sink : PacketSink
+        The watched sink.
+    name : str
+        Metric name, "<sink_id>.mean_delay".
+    """
+
+    def __init__(self, sink: PacketSink) -> None:
+        self.sink = sink
+        self.name = f"{sink.sink_id}.mean_delay"
+        self._count: int = 0
+        self._total: float = 0.0
+
+    def read(self) -> tuple[float, float]:
+        """
+        Packets received and their total delay since the last read.
+
+        Returns
+        -------
+        tuple[float, float]
+            Weight and sum of the observations.
+        """
+        sink = self.sink
+        count = sink.packet_count
+        if count == self._count:
+            return 0.0, 0.0
+        if sink.stats is not None:
+            total = sink.stats.delay.mean * sink.stats.delay.count
+            delta = total - self._total
+            self._total = total
+        else:
+            delta = float(np.sum(sink.delays[self._count : count]))
+        weight = count - self._count
+        self._count = count
+        return float(weight), delta
+
+
+class PortOccupancy:
+    """
+    Time-integrated number of packets in a port, read incrementally through
+    an ``OccupancyTap``.
+
+    Attributes
+    ----------
+    tap : OccupancyTap
+        The tap of the port, an existing one is reused.
+    name : str
+        Metric name, "<label>.mean_packets", by default with the label
+        "port<port_no>".
+    """
+
+    def __init__(self, env: simpy.Environment, port: Any, label: Optional[str] = None) -> None:
+        taps = [t for t in getattr(port, "taps", []) if isinstance(t, OccupancyTap)]
+        self.tap = taps[0] if taps else OccupancyTap(env, port)
+        self.name = f"{label if label is not None else f'port{port.port_no}'}.mean_packets"
+        self._time: float = env.now
+        self._area: float = self._integral()
+
+    def _integral(self) -> float:
+        tap = self.tap
+        return tap.mean_packets * (tap.env.now - tap.start_time)
+
+    def read(self) -> tuple[float, float]:
+        """
+        Time elapsed and packet-time area since the last read.
+
+        Returns
+        -------
+        tuple[float, float]
+            Weight and sum of the observations.
+        """
+        now = self.tap.env.now
+        area = self._integral()
+        weight, delta = now - self._time, area - self._area
+        self._time, self._area = now, area
+        return weight, delta
+
+
+class ControlReport:
+    """
+    Result of a controlled run.
+
+    Attributes
+    ----------
+    converged : bool
+        Whether every metric reached the target precision.
+    start_time : float
+        Simulation time the controller started at.
+    end_time : float
+        Simulation time the run stopped at.
+    warmup_time : float
+        End of the detected warm-up period, NaN if none was detected.
+    estimates : dict[str, tuple[float, float]]
+        Mean and confidence interval half-width of every metric after the
+        warm-up.
+    batches : int
+        Number of batches behind the intervals.
+    interval : float
+        Final interval length.
+    """
+
+    def __init__(
+        self,
+        converged: bool,
+        start_time: float,
+        end_time: float,
+        warmup_time: float,
+        estimates: dict[str, tuple[float, float]],
+        batches: int,
+        interval: float,
+    ) -> None:
+        self.converged = converged
+        self.start_time = start_time
+        self.end_time = end_time
+        self.warmup_time = warmup_time
+        self.estimates = estimates
+        self.batches = batches
+        self.interval = interval
+
+    @property
+    def sim_time(self) -> float:
+        """Simulated time the run needed."""
+        return self.end_time - self.start_time
+
+    def relative_precision(self, metric: str) -> float:
+        """
+        Half-width of a metric's confidence interval relative to its mean.
+
+        Parameters
+        ----------
+        metric : str
+            Metric name, e.g. "sink.mean_delay".
+
+        Returns
+        -------
+        float
+            Relative half-width, NaN if unknown.
+        """
+        mean, half_width = self.estimates.get(metric, (math.nan, math.nan))
+        return half_width / abs(mean) if mean else math.nan
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the run.
+
+        Returns
+        -------
+        dict[str, float]
+            Convergence, simulated and warm-up time, and the mean and
+            half-width of every metric.
+        """
+        result = {
+            "converged": float(self.converged),
+            "sim_time": self.sim_time,
+            "warmup_time": self.warmup_time,
+        }
+        for metric, (mean, half_width) in self.estimates.items():
+            result[metric] = mean
+            result[f"{metric}_half_width"] = half_width
+        return result
+
+    def __repr__(self) -> str:
+        """
+        String representation of the control report.
+
+        Returns
+        -------
+        str
+            String representation of the control report.
+        """
+        return (
+            f"ControlReport(converged={self.converged}, sim_time={self.sim_time:g}, "
+            f"warmup_time={self.warmup_time:g})"
+        )
+
+
+class RunController:
+    """
+    Runs an environment until the watched metrics are estimated to a target
+    relative precision, discarding the warm-up.
+
+    Attributes
+    ----------
+    env : simpy.Environment
+        The simulation environment.
+    metrics : list[Any]
+        Watched metrics, ``SinkDelay`` and ``PortOccupancy`` readers.
+    precision : float
+        Target relative half-width of the confidence intervals.
+    confidence : float
+        Confidence level.
+    interval : float
+        Current interval length.
+    batches : int
+        Number of batch means behind a confidence interval.
+    max_intervals : int
+        Number of intervals kept before they are merged.
+    """
+
+    def __init__(
+        self,
+        env: simpy.Environment,
+        sinks: Sequence[PacketSink] = (),
+        ports: Union[Sequence[Any], dict[str, Any]] = (),
+        precision: float = 0.05,
+        confidence: float = 0.95,
+        interval: float = 10.0,
+        batches: int = 20,
+        max_intervals: int = 2000,
+    ) -> None:
+        """
+        Initialize a controller. Ports get an ``OccupancyTap`` if they have
+        none yet.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            The simulation environment.
+        sinks : Sequence[PacketSink], optional
+            Sinks whose mean delay is watched, by default none.
+        ports : Union[Sequence[Any], dict[str, Any]], optional
+            Ports whose mean number of packets is watched, by default none.
+            Port numbers restart at every ``Switch``, so ports of several
+            switches need labels, given as a dict from label to port.
+        precision : float, optional
+            Target relative half-width, by default 0.05.
+        confidence : float, optional
+            Confidence level, by default 0.95.
+        interval : float, optional
+            Initial interval length; it should see a few packets at every
+            sink, by default 10.0.
+        batches : int, optional
+            Number of batch means, by default 20.
+        max_intervals : int, optional
+            Intervals kept before merging, by default 2000.
+
+        Raises
+        ------
+        ValueError
+            If nothing is watched, ``max_intervals`` is too small or two
+            metrics have the same name.
+        """
+        if not sinks and not ports:
+            raise ValueError("Nothing to watch, pass sinks or ports.")
+        if max_intervals < 4 * MSER_BATCH * batches:
+            raise ValueError("max_intervals must be at least 20 times batches.")
+        labelled = ports.items() if isinstance(ports, dict) else [(None, p) for p in ports]
+        metrics: list[Any] = [SinkDelay(s) for s in sinks] + [
+            PortOccupancy(env, p, label) for label, p in labelled
+        ]
+        names = [m.name for m in metrics]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(
+                f"Duplicate metric names {duplicates}, use unique sink ids and label the ports."
+            )
+        self.env = env
+        self.metrics = metrics
+        self.precision = precision
+        self.confidence = confidence
+        self.interval = interval
+        self.batches = batches
+        self.max_intervals = max_intervals - max_intervals % 2
+        self.start_time: float = env.now
+        self._ends: list[float] = []  # end time of every interval
+        self._weights: list[list[float]] = [[] for _ in self.metrics]
+        self._sums: list[list[float]] = [[] for _ in self.metrics]
+        self._report: Optional[ControlReport] = None
+
+    def _record(self) -> None:
+        self._ends.append(self.env.now)
+        for metric, weights, sums in zip(self.metrics, self._weights, self._sums):
+            weight, total = metric.read()
+            weights.append(weight)
+            sums.append(total)
+        if len(self._ends) == self.max_intervals:
+            # merge neighbours, keeping the end of every pair
+            self._ends = self._ends[1::2]
+            for values in self._weights + self._sums:
+                values[:] = [a + b for a, b in zip(values[::2], values[1::2])]
+            self.interval *= 2
+
+    def evaluate(self) -> ControlReport:
+        """
+        Estimate the metrics from the intervals recorded so far.
+
+        Returns
+        -------
+        ControlReport
+            Warm-up, estimates and whether they are precise enough.
+        """
+        n = len(self._ends)
+        start = None  # first interval after the warm-up
+        nb = n // MSER_BATCH
+        weights = [np.asarray(w) for w in self._weights]
+        sums = [np.asarray(s) for s in self._sums]
+        if nb:
+            start = 0
+            for w, s in zip(weights, sums):
+                bw = w[: nb * MSER_BATCH].reshape(nb, MSER_BATCH).sum(axis=1)
+                bs = s[: nb * MSER_BATCH].reshape(nb, MSER_BATCH).sum(axis=1)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    d = mser_truncation(bs / bw)
+                if d is None:
+                    start = None
+                    break
+                start = max(start, d * MSER_BATCH)
+
+        estimates: dict[str, tuple[float, float]] = {}
+        converged = False
+        if start is not None and n - start >= self.batches:
+            size = (n - start) // self.batches
+            first = n - size * self.batches  # the oldest leftover joins the warm-up
+            converged = True
+            for metric, w, s in zip(self.metrics, weights, sums):
+                bw = w[first:].reshape(self.batches, size).sum(axis=1)
+                bs = s[first:].reshape(self.batches, size).sum(axis=1)
+                if not bw.all():
+                    estimates[metric.name] = (math.nan, math.nan)
+                    converged = False
+                    continue
+                mean, half_width = mean_ci(bs / bw, self.confidence)
+                estimates[metric.name] = (mean, half_width)
+                if not half_width <= self.precision * abs(mean):
+                    converged = False
+        warmup = (
+            math.nan
+            if start is None
+            else (self._ends[start - 1] if start > 0 else self.start_time)
+        )
+        return ControlReport(
+            converged,
+            self.start_time,
+            self.env.now,
+            warmup,
+            estimates,
+            self.batches,
+            self.interval,
+        )
+
+    def _control(self, max_time: float) -> Iterator[simpy.Event]:
+        elapsed = 0.0  # at the last evaluation
+        while self.env.now < max_time:
+            yield self.env.timeout(min(self.interval, max_time - self.env.now))  # type: ignore
+            self._record()
+            # evaluate after every 2 % of growth, the run overshoots at most that much
+            now = self.env.now - self.start_time
+            if now - elapsed >= 0.02 * now:
+                elapsed = now
+                report = self.evaluate()
+                if report.converged:
+                    self._report = report
+                    return
+        self._report = self.evaluate()
+
+    def run(self, max_time: float) -> ControlReport:
+        """
+        Run the environment until the target precision is reached, at most
+        until ``max_time``.
+
+        Parameters
+        ----------
+        max_time : float
+            Simulation time limit.
+
+        Returns
+        -------
+        ControlReport
+            Warm-up, estimates and the simulated time needed.
+        """
+        self.env.run(until=self.env.process(self._control(max_time)))
+        return self._report  # type: ignore
+
+    def __repr__(self) -> str:
+        """
+        String representation of the run controller.
+
+        Returns
+        -------
+        str
+            String representation of the run controller.
+        """
+        return (
+            f"RunController(metrics={[m.name for m in self.metrics]}, "
+            f"precision={self.precision}, interval={self.interval:g})"
+        )
@@ -1,19 +1,57 @@
 import sys
+import zlib
+from abc import ABC, abstractmethod
+from collections import deque
+from heapq import heappop, heappush
 from itertools import accumulate, count
-from typing import Any, Callable, Optional, Protocol, Union
+from typing import Any, Callable, Iterator, Optional, Protocol, Union
 
+import numpy as np
 import simpy
 from loguru import logger
 from numpy.random import default_rng
 
-logger.remove()
-logger.add(
-    sys.stdout,
-    colorize=True,
-    format="<green>{time}</green> | <level>{level}</level> | {message}",
+from .kernel import URGENT
+from .stats import StreamingPacketStats, chi_square_test
+from .trace import (
+    DEPART,
+    DROP,
+    ENQUEUE,
+    FORWARD,
+    GENERATE,
+    RECEIVE,
+    TRANSMIT,
+    TraceRecorder,
 )
+from .variates import Variate, alias_choice, alias_table, variate_stream
+
+_console_logging = False
+
+
+def enable_console_logging() -> None:
+    """
+    Send loguru output to stdout in the format used by the ``debug`` logs.
+
+    Called by components created with ``debug=True``, so importing this
+    module leaves the global logger configuration alone. Only the first call
+    has an effect.
+    """
+    global _console_logging
+    if _console_logging:
+        return
+    logger.remove()
+    logger.add(
+        sys.stdout,
+        colorize=True,
+        format="<green>{time}</green> | <level>{level}</level> | {message}",
+    )
+    _console_logging = True
+
 
 BYTES_TO_BITS = 8
+SINK_RETENTIONS = ("raw", "columnar", "streaming")
+FORK_MODES = ("random", "flow")
+SCHEDULERS = ("priority", "drr", "wfq")
 
 
 class PacketSourceProto(Protocol):
@@ -93,6 +131,9 @@ class PacketProto(Protocol):
     # destination: Union[SwitchPortProto, PacketSinkProto]
     sink_id: Optional[str]
     sink_time: Optional[float]
+    pool: Optional["PacketPool"]
+    dscp: int
+    dst: Any
 
 
 class PacketSource:
@@ -115,6 +156,16 @@ class PacketSource:
         Or can be a float/int value.
     packet_size : int
         The size of the generated packets.
+    pool : Optional[PacketPool]
+        Pool the packets are taken from, if any.
+    block_size : Optional[int]
+        Block size of the fast mode, None if it is off.
+    dscp : int
+        Traffic class (DSCP) of the generated packets.
+    dst : Any
+        Destination node of the generated packets, used by ``topology``.
+    trace : Optional[TraceRecorder]
+        Recorder of the component's events, set by ``TraceRecorder.attach``.
     """
 
     def __init__(
@@ -122,9 +173,13 @@ class PacketSource:
         env: simpy.Environment,
         source_id: str,
         destination: Union[DestinationProto, None] = None,
-        packet_interval: Union[Callable[[], float], float] = 1.0,
-        packet_size: Union[Callable[[], int], int] = 10,
+        packet_interval: Variate = 1.0,
+        packet_size: Variate = 10,
         debug: bool = False,
+        pool: Optional["PacketPool"] = None,
+        block_size: Optional[int] = None,
+        dscp: int = 0,
+        dst: Any = None,
     ):
         """
         Initialize a new packet source.
@@ -141,20 +196,46 @@ class PacketSource:
             The interval between packet generations, by default 1.0.
             Can be a callable function that returns a float value.
             Use functools.partial to pass arguments to the function.
-            Or can be a float/int value.
+            Or can be a float/int value, or a ``Distribution``.
         packet_size : Union[Callable[[], int], int], optional
             The size of the generated packets, by default 10.
             Can be a callable function that returns an int value.
             Use functools.partial to pass arguments to the function.
-            Or can be an int value.
+            Or can be an int value, or a ``Distribution``.
+        pool : Optional[PacketPool], optional
+            Pool to take packets from instead of allocating new ones,
+            by default None.
+        block_size : Optional[int], optional
+            Enable the fast mode: draw intervals and sizes in blocks of this
+            many values and generate all packets in a single process loop,
+            by default None. Intervals and sizes are drawn in separate
+            blocks, so if they share a generator the sample path differs
+            from the default mode.
+        dscp : int, optional
+            Traffic class (DSCP) of the generated packets, by default 0.
+        dst : Any, optional
+            Destination node of the generated packets for routed topologies,
+            by default None.
         """
         self.env = env
-        self.source_id = source_id
+        self.source_id = sys.intern(source_id)
         self.destination = destination
         self.packet_interval = packet_interval
         self.packet_size = packet_size
         self.debug = debug
+        self.pool = pool
+        self.block_size = block_size
+        self.dscp = dscp
+        self.dst = dst
         self.packets_sent: int = 0
+        self.trace: Optional[TraceRecorder] = None  # see TraceRecorder.attach
+        self.trace_id: int = 0
+        if debug:
+            enable_console_logging()
+
+        # callback scheduling without processes, see kernel.Environment
+        self._call_later = getattr(env, "call_later", None)
+        self._blocks: Optional[Iterator[tuple[float, int]]] = None
 
         # start the packet generation process
         self.process = self.env.process(self.start())  # type: ignore
@@ -173,19 +254,60 @@ class PacketSource:
         else:
             yield self.env.timeout(self.packet_interval())  # type: ignore
 
+        self._send(self._draw_size())
+
+    def _draw_size(self) -> int:
+        """
+        Draw the size of the next packet in the default mode.
+
+        Returns
+        -------
+        int
+            Packet size, at least 1 for drawn sizes.
+        """
         if isinstance(self.packet_size, (int, float)):
-            _packet_size = int(self.packet_size)
-        else:
-            _packet_size = int(self.packet_size()) or 1  # handle zero
+            return int(self.packet_size)
+        return int(self.packet_size()) or 1  # handle zero
 
-        if self.destination:
-            packet = Packet(self.env, _packet_size, self.source_id)
-            self.destination.process_packet(packet)
-            self.packets_sent += 1
-            if self.debug:
-                logger.info(f"Source {self.source_id}. Generated: {packet}.")
-        else:
+    def _send(self, size: int) -> None:
+        """
+        Create a packet and hand it to the destination.
+
+        Parameters
+        ----------
+        size : int
+            Packet size.
+
+        Raises
+        ------
+        ValueError
+            If no destination is specified for packet source.
+        """
+        if not self.destination:
             raise ValueError("No destination specified for packet source.")
+        if self.pool is not None:
+            packet = self.pool.acquire(self.env, size, self.source_id)
+        else:
+            packet = Packet(self.env, size, self.source_id)
+        packet.dscp = self.dscp
+        packet.dst = self.dst
+        if self.trace is not None:
+            self.trace.record(self.env.now, GENERATE, self.trace_id, packet.id, packet.size)
+        self.destination.process_packet(packet)
+        self.packets_sent += 1
+        if self.debug:
+            logger.info(f"Source {self.source_id}. Generated: {packet}.")
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the generated traffic.
+
+        Returns
+        -------
+        dict[str, float]
+            Number of generated packets.
+        """
+        return {"packets": self.packets_sent}
 
     def start(self) -> simpy.Process:
         """
@@ -196,18 +318,111 @@ class PacketSource:
         simpy.Process
             The packet generation process.
         """
-        while True:
-            yield self.env.process(self.generate_packet())  # type: ignore
+        if self._call_later is not None:
+            # callbacks in the same order as the events below
+            if self.block_size:
+                intervals = variate_stream(self.packet_interval, self.block_size)  # type: ignore
+                sizes = variate_stream(self.packet_size, self.block_size, size=True)  # type: ignore
+                self._blocks = zip(intervals, sizes)
+                self._next_block()
+            else:
+                self._call_later(0, self._begin_packet, priority=URGENT)
+            return
+        if self.block_size:
+            yield from self._generate_blocks()  # type: ignore
+        else:
+            while True:
+                yield self.env.process(self.generate_packet())  # type: ignore
+
+    def _generate_blocks(self) -> simpy.Event:
+        """
+        Fast mode loop: prefetched variates and no per-packet sub-process.
+
+        Returns
+        -------
+        simpy.Event
+            Timeouts between packet generations.
+        """
+        intervals = variate_stream(self.packet_interval, self.block_size)  # type: ignore
+        sizes = variate_stream(self.packet_size, self.block_size, size=True)  # type: ignore
+        timeout = self.env.timeout
+        for interval, size in zip(intervals, sizes):
+            yield timeout(interval)  # type: ignore
+            self._send(size)
+
+    def _begin_packet(self, _: Any = None) -> None:
+        """
+        Callback mode: start of a ``generate_packet`` process.
+        """
+        if isinstance(self.packet_interval, (int, float)):
+            interval = self.packet_interval
+        else:
+            interval = self.packet_interval()
+        self._call_later(interval, self._generated)  # type: ignore
+
+    def _generated(self, _: Any = None) -> None:
+        """
+        Callback mode: end of the interval of a ``generate_packet`` process.
+        """
+        self._send(self._draw_size())
+        # the finished process resumes the loop, which starts the next one
+        self._call_later(0, self._restart)  # type: ignore
+
+    def _restart(self, _: Any = None) -> None:
+        self._call_later(0, self._begin_packet, priority=URGENT)  # type: ignore
+
+    def _next_block(self, size: Optional[int] = None) -> None:
+        """
+        Callback mode of ``_generate_blocks``: send a packet, if any, and
+        schedule the next one.
+
+        Parameters
+        ----------
+        size : Optional[int], optional
+            Size of the packet to send, None at the start.
+        """
+        if size is not None:
+            self._send(size)
+        pair = next(self._blocks, None)  # type: ignore
+        if pair is not None:
+            self._call_later(pair[0], self._next_block, pair[1])  # type: ignore
+
+
+def next_packet_id(env: simpy.Environment) -> int:
+    """
+    Return the next packet identifier of an environment.
+
+    Every environment numbers its packets from 0, so identifiers do not depend
+    on other simulations run in the same interpreter. The counter is kept on
+    the environment itself and goes away with it.
+
+    Parameters
+    ----------
+    env : simpy.Environment
+        The simulation environment.
+
+    Returns
+    -------
+    int
+        Packet identifier.
+    """
+    try:
+        return next(env._packet_ids)  # type: ignore
+    except AttributeError:
+        env._packet_ids = count(1)  # type: ignore
+        return 0
 
 
 class Packet:
     """
     Packet class to represent a data packet.
 
+    Packets use ``__slots__``, so they have no per-instance ``__dict__``.
+
     Attributes
     ----------
     id : int
-        Unique identifier for this packet.
+        Identifier of the packet, unique within its environment.
     size : int
         Size of the packet.
     creation_time : float
@@ -218,11 +433,33 @@ class Packet:
         Identifier of the sink where the packet was received.
     sink_time : Optional[float]
         Time at which the packet was received at the sink.
+    pool : Optional[PacketPool]
+        Pool the packet is returned to once it is released.
+    dscp : int
+        Traffic class (DSCP) used by class-aware ports, 0 by default.
+    dst : Any
+        Destination node in a routed topology, None by default.
     """
 
-    cnt: "count[int]" = count()
+    __slots__ = (
+        "id",
+        "size",
+        "creation_time",
+        "source",
+        "sink_id",
+        "sink_time",
+        "pool",
+        "dscp",
+        "dst",
+    )
 
-    def __init__(self, env: simpy.Environment, size: int, source: str) -> None:
+    def __init__(
+        self,
+        env: simpy.Environment,
+        size: int,
+        source: str,
+        pool: Optional["PacketPool"] = None,
+    ) -> None:
         """
         Packet class to represent a data packet.
 
@@ -234,15 +471,18 @@ class Packet:
             Size of the packet.
         source : str
             Source identifier.
-        destination : str
-            Destination identifier.
+        pool : Optional[PacketPool], optional
+            Pool the packet belongs to, by default None.
         """
-        self.id = int(next(Packet.cnt))
+        self.id = next_packet_id(env)
         self.size = size
         self.creation_time: float = env.now
         self.source = source
         self.sink_id: Optional[str] = None
         self.sink_time: Optional[float] = None
+        self.pool = pool
+        self.dscp: int = 0
+        self.dst: Any = None
 
     def __repr__(self) -> str:
         """
@@ -256,16 +496,103 @@ class Packet:
         return f"Packet(id={self.id:6}, size={self.size:6.2f}, source={self.source})"
 
 
-class SwitchPort:
+class PacketPool:
+    """
+    Free list of packets for reuse.
+
+    Packets are handed back by the components that discard them: a
+    ``PacketSink`` that does not keep its packets, a ``SwitchPort`` that drops
+    a packet and a ``PacketFork`` without a destination. A released packet
+    must not be referenced anywhere else, because it is reinitialized on the
+    next ``acquire``.
+
+    Attributes
+    ----------
+    max_size : Optional[int]
+        Maximum number of free packets kept, unbounded if None.
+    created : int
+        Number of packets allocated by the pool.
+    reused : int
+        Number of packets served from the free list.
+    """
+
+    def __init__(self, max_size: Optional[int] = None) -> None:
+        """
+        Initialize an empty packet pool.
+
+        Parameters
+        ----------
+        max_size : Optional[int], optional
+            Maximum number of free packets kept, by default None (unbounded).
+        """
+        self.max_size = max_size
+        self.created: int = 0
+        self.reused: int = 0
+        self._free: list[Packet] = []
+
+    def acquire(self, env: simpy.Environment, size: int, source: str) -> Packet:
+        """
+        Get a packet, reusing a released one if available.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            The simulation environment.
+        size : int
+            Size of the packet.
+        source : str
+            Source identifier.
+
+        Returns
+        -------
+        Packet
+            Freshly initialized packet.
+        """
+        if self._free:
+            packet = self._free.pop()
+            packet.__init__(env, size, source, self)  # type: ignore
+            self.reused += 1
+            return packet
+        self.created += 1
+        return Packet(env, size, source, self)
+
+    def release(self, packet: Packet) -> None:
+        """
+        Return a packet to the pool.
+
+        Parameters
+        ----------
+        packet : Packet
+            Packet that is no longer referenced by the simulation.
+        """
+        if self.max_size is None or len(self._free) < self.max_size:
+            self._free.append(packet)
+
+    def __len__(self) -> int:
+        return len(self._free)
+
+    def __repr__(self) -> str:
+        """
+        String representation of the packet pool.
+
+        Returns
+        -------
+        str
+            String representation of the packet pool.
+        """
+        return f"PacketPool(free={len(self._free)}, created={self.created}, reused={self.reused})"
+
+
+class BasePort:
     def __init__(
         self,
         env: simpy.Environment,
         port_no: int,
-        capacity: int = 10,
+        capacity: Union[int, list[int], None] = 10,
         transmission_rate: float = 1,
     ) -> None:
         """
-        Switch port to queue and transmit packets.
+        Counters and ``summary`` shared by the switch ports.
 
         Parameters
         ----------
@@ -273,9 +600,8 @@ class SwitchPort:
             The simulation environment.
         port_no : int
             Port number.
-        capacity : int
-            Maximum number of bytes that can be queued. This is how many packets
-            can be in the queue/system at any given time.
+        capacity : Union[int, list[int], None]
+            Maximum number of bytes that can be queued, see the subclass.
         transmission_rate : float
             Rate at which packets are transmitted.
         """
@@ -283,7 +609,6 @@ class SwitchPort:
         self.port_no = port_no
         self.capacity = capacity
         self.transmission_rate = transmission_rate
-        self.queue: simpy.Store = simpy.Store(env)
         self.destination: Optional[DestinationProto] = None
         self.cum_drop_count: int = 0  # total number of dropped packets
         self.byte_count: int = 0  # current number of bytes in queue
@@ -291,6 +616,191 @@ class SwitchPort:
         self.packet_count: int = 0  # current number of packets in queue
         self.cum_packet_count: int = 0  # total number of packets processed
         self.processing: bool = False
+        self.taps: list[OccupancyTap] = []  # notified on every change
+        self.trace: Optional[TraceRecorder] = None  # see TraceRecorder.attach
+        self.trace_id: int = 0
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the port counters.
+
+        Returns
+        -------
+        dict[str, float]
+            Packet, byte and drop counts and the loss rate.
+        """
+        return {
+            "packets": self.cum_packet_count,
+            "bytes": self.cum_byte_count,
+            "drops": self.cum_drop_count,
+            "loss_rate": self.cum_drop_count / self.cum_packet_count
+            if self.cum_packet_count
+            else 0.0,
+        }
+
+    def __repr__(self) -> str:
+        """
+        String representation of the port.
+
+        Returns
+        -------
+        str
+            String representation of the port.
+        """
+        return f"{type(self).__name__}(capacity={self.capacity}, transmission_rate={self.transmission_rate}, destination={self.destination})"
+
+
+class CallbackPort(BasePort, ABC):
+    def __init__(
+        self,
+        env: simpy.Environment,
+        port_no: int,
+        capacity: Union[int, list[int], None] = 10,
+        transmission_rate: float = 1,
+    ) -> None:
+        """
+        Port that transmits with one timeout callback per packet, the
+        transmission path of ``FastSwitchPort`` and ``MultiClassSwitchPort``.
+
+        When a transmission completes, the packet is handed over and, if
+        ``packet_count`` is not zero, ``_dequeue`` starts the next one at the
+        same instant.
+
+        Ties follow ``SwitchPort``, which frees the bytes of a packet only
+        when its ``Store.get`` fires, after every arrival already scheduled
+        at that instant: a packet that starts its transmission at ``t``
+        still counts against the capacity for arrivals at ``t``, see
+        ``_full``.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            The simulation environment.
+        port_no : int
+            Port number.
+        capacity : Union[int, list[int], None]
+            Maximum number of bytes that can be queued, see the subclass.
+        transmission_rate : float
+            Rate at which packets are transmitted.
+        """
+        super().__init__(env, port_no, capacity, transmission_rate)
+        self._packet: Optional[PacketProto] = None  # packet being transmitted
+        self._started_at: float = -float("inf")  # start of its transmission
+        # callback scheduling without timeout events, see kernel.Environment
+        self._call_later = getattr(env, "call_later", None)
+
+    def _transmit(self, packet: PacketProto) -> None:
+        """
+        Start transmitting a packet.
+
+        Parameters
+        ----------
+        packet : PacketProto
+            The packet to transmit.
+        """
+        self.processing = True
+        self._packet = packet
+        self._started_at = self.env.now
+        if self.trace is not None:
+            self.trace.record(self.env.now, TRANSMIT, self.trace_id, packet.id, packet.size)
+        delay = BYTES_TO_BITS * packet.size / self.transmission_rate
+        if self._call_later is not None:
+            self._call_later(delay, self._transmitted)
+        else:
+            self.env.timeout(delay).callbacks.append(self._transmitted)  # type: ignore
+
+    def _transmitted(self, event: Optional[simpy.Event]) -> None:
+        """
+        Hand the transmitted packet over and start the next one, if any.
+
+        Parameters
+        ----------
+        event : Optional[simpy.Event]
+            The finished transmission timeout, None on ``kernel.Environment``.
+
+        Raises
+        ------
+        ValueError
+            If no destination is specified for switch port.
+        """
+        packet = self._packet
+        self._packet = None
+        if self.trace is not None:
+            self.trace.record(self.env.now, DEPART, self.trace_id, packet.id, packet.size)
+        if self.destination:
+            self.destination.process_packet(packet)  # type: ignore
+        else:
+            raise ValueError("No destination specified for switch port.")
+        if self.packet_count:
+            # the next packet starts at the same instant
+            self._dequeue()
+        else:
+            self.processing = False
+        for tap in self.taps:
+            tap.update()
+
+    def _full(self, queued: int, capacity: Optional[int] = None, c: Optional[int] = None) -> bool:
+        """
+        Whether queued bytes exceed the capacity, counting a packet that
+        started its transmission at this instant as still queued.
+
+        Parameters
+        ----------
+        queued : int
+            Queued bytes including the arriving packet.
+        capacity : Optional[int], optional
+            Capacity, by default ``capacity`` of the port.
+        c : Optional[int], optional
+            Class the bytes belong to, by default any.
+
+        Returns
+        -------
+        bool
+            Whether the arriving packet is dropped.
+        """
+        started = self._packet
+        if (
+            self._started_at == self.env.now
+            and started is not None
+            and (c is None or self.classify(started) == c)  # type: ignore
+        ):
+            queued += started.size
+        return queued > (self.capacity if capacity is None else capacity)  # type: ignore
+
+    @abstractmethod
+    def _dequeue(self) -> None:
+        """
+        Move the next waiting packet to transmission.
+        """
+
+
+class SwitchPort(BasePort):
+    def __init__(
+        self,
+        env: simpy.Environment,
+        port_no: int,
+        capacity: int = 10,
+        transmission_rate: float = 1,
+    ) -> None:
+        """
+        Switch port to queue and transmit packets.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            The simulation environment.
+        port_no : int
+            Port number.
+        capacity : int
+            Maximum number of bytes that can be queued. This is how many packets
+            can be in the queue/system at any given time.
+        transmission_rate : float
+            Rate at which packets are transmitted.
+        """
+        super().__init__(env, port_no, capacity, transmission_rate)
+        # the lighter store of kernel.Environment, if available
+        store = getattr(env, "store", None)
+        self.queue: simpy.Store = store() if store is not None else simpy.Store(env)
 
         # start the packet processing process
         self.process = self.env.process(self.start())  # type: ignore
@@ -317,6 +827,8 @@ class SwitchPort:
 
         # wait for transmission to complete
         yield self.env.timeout(BYTES_TO_BITS * packet.size / self.transmission_rate)
+        if self.trace is not None:
+            self.trace.record(self.env.now, DEPART, self.trace_id, packet.id, packet.size)
         # hand over packet to destination
         if self.destination:
             self.destination.process_packet(packet)
@@ -338,8 +850,14 @@ class SwitchPort:
             self.processing = True
             self.byte_count -= packet.size
             self.packet_count -= 1
+            if self.trace is not None:
+                self.trace.record(self.env.now, TRANSMIT, self.trace_id, packet.id, packet.size)
+            for tap in self.taps:
+                tap.update()
             yield self.env.process(self.transmit(packet))  # type: ignore
             self.processing = False
+            for tap in self.taps:
+                tap.update()
 
     def process_packet(self, packet: PacketProto) -> Optional[simpy.Event]:
         """
@@ -364,15 +882,27 @@ class SwitchPort:
         if self.capacity is None:
             self.byte_count = _byte_count
             self.packet_count = _packet_count
+            if self.trace is not None:
+                self.trace.record(self.env.now, ENQUEUE, self.trace_id, packet.id, packet.size)
+            for tap in self.taps:
+                tap.update()
             return self.queue.put(packet)
 
         if self.capacity and _byte_count > self.capacity:
             # dropped packet here
             self.cum_drop_count += 1
+            if self.trace is not None:
+                self.trace.record(self.env.now, DROP, self.trace_id, packet.id, packet.size)
+            if packet.pool is not None:
+                packet.pool.release(packet)
             return None
         else:
             self.byte_count = _byte_count
             self.packet_count = _packet_count
+            if self.trace is not None:
+                self.trace.record(self.env.now, ENQUEUE, self.trace_id, packet.id, packet.size)
+            for tap in self.taps:
+                tap.update()
             return self.queue.put(packet)
 
     def __repr__(self) -> str:
@@ -387,48 +917,405 @@ class SwitchPort:
         return f"SwitchPort(capacity={self.capacity}, transmission_rate={self.transmission_rate}, destination={self.destination})"
 
 
-class Switch:
+class FastSwitchPort(CallbackPort):
     def __init__(
         self,
         env: simpy.Environment,
-        switch_id: str,
-        num_ports: int,
-        port_capacity: int,
-        port_transmission_rate: float,
+        port_no: int,
+        capacity: int = 10,
+        transmission_rate: float = 1,
     ) -> None:
         """
-        Network switch containing multiple ports.
-        Only meant as a collection of ports.
+        Switch port with the same behaviour and counters as ``SwitchPort``,
+        including drops at simultaneous arrivals and departures (see
+        ``CallbackPort``), without a ``simpy.Store`` and without a process
+        per packet.
+
+        Waiting packets are kept in a ``collections.deque``. Each transmission
+        is a single timeout whose callback hands the packet over and starts
+        the next one, so the port only needs to be woken up when a packet
+        arrives at an idle port.
 
         Parameters
         ----------
         env : simpy.Environment
             The simulation environment.
-        switch_id : str
-            Identifier for this switch.
-        num_ports : int
-            Number of ports in the switch.
-        port_capacity : int
-            Capacity of each port.
-        port_transmission_rate : float
-            Transmission rate of each port.
+        port_no : int
+            Port number.
+        capacity : int
+            Maximum number of bytes that can be queued.
+        transmission_rate : float
+            Rate at which packets are transmitted.
         """
-        self.env = env
-        self.id = switch_id
-        self.port_cnt = count()
-        self.ports: list[SwitchPort] = [
-            SwitchPort(
-                env,
-                port_no=next(self.port_cnt),
-                capacity=port_capacity,
-                transmission_rate=port_transmission_rate,
-            )
-            for _ in range(num_ports)
-        ]
+        super().__init__(env, port_no, capacity, transmission_rate)
+        self.queue: deque[PacketProto] = deque()
 
-    def __repr__(self) -> str:
+    def _dequeue(self) -> None:
         """
-        String representation of the switch.
+        Move the head of the queue to transmission.
+        """
+        packet = self.queue.popleft()
+        self.byte_count -= packet.size
+        self.packet_count -= 1
+        self._transmit(packet)
+
+    def process_packet(self, packet: PacketProto) -> Optional[simpy.Event]:
+        """
+        Process a packet by adding it to the queue if there is enough capacity.
+        If the packet size exceeds the remaining capacity, the packet is dropped.
+
+        Parameters
+        ----------
+        packet : PacketProto
+            The packet to be processed.
+
+        Returns
+        -------
+        Optional[simpy.Event]
+            Always None, queueing does not create an event.
+        """
+        self.cum_packet_count += 1
+        self.cum_byte_count += packet.size
+
+        if self.capacity and self._full(self.byte_count + packet.size):
+            # dropped packet here
+            self.cum_drop_count += 1
+            if self.trace is not None:
+                self.trace.record(self.env.now, DROP, self.trace_id, packet.id, packet.size)
+            if packet.pool is not None:
+                packet.pool.release(packet)
+            return None
+
+        if self.trace is not None:
+            self.trace.record(self.env.now, ENQUEUE, self.trace_id, packet.id, packet.size)
+        if not self.processing:
+            self._transmit(packet)
+        else:
+            self.queue.append(packet)
+            self.byte_count += packet.size
+            self.packet_count += 1
+        for tap in self.taps:
+            tap.update()
+        return None
+
+    def __repr__(self) -> str:
+        """
+        String representation of the switch port.
+
+        Returns
+        -------
+        str
+            String representation of the switch port.
+        """
+        return f"FastSwitchPort(capacity={self.capacity}, transmission_rate={self.transmission_rate}, destination={self.destination})"
+
+
+class MultiClassSwitchPort(CallbackPort):
+    def __init__(
+        self,
+        env: simpy.Environment,
+        port_no: int,
+        capacity: Union[int, list[int], None] = 10,
+        transmission_rate: float = 1,
+        classes: int = 2,
+        scheduler: str = "priority",
+        weights: Optional[list[float]] = None,
+        quantum: int = 1500,
+        class_map: Optional[dict[int, int]] = None,
+    ) -> None:
+        """
+        Switch port with one queue per traffic class, in the style of
+        ``FastSwitchPort``.
+
+        Packets are classified by their ``dscp`` and every class has its own
+        byte capacity and counters. The next packet to transmit is chosen by
+        one of the schedulers in ``SCHEDULERS``:
+
+        - "priority": strict priority, class 0 first. Non-empty classes are
+          kept in a bit mask, so the choice is O(1).
+        - "drr": deficit round robin with a quantum of ``weight * quantum``
+          bytes per round. Only backlogged classes are kept in the round, so
+          the choice is O(1) amortized if the quantum is at least the
+          maximum packet size.
+        - "wfq": self-clocked weighted fair queuing. Heads of the classes
+          are kept in a heap by virtual finish time, O(log classes).
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            The simulation environment.
+        port_no : int
+            Port number.
+        capacity : Union[int, list[int], None]
+            Maximum number of bytes that can be queued per class, or one
+            value per class.
+        transmission_rate : float
+            Rate at which packets are transmitted.
+        classes : int, optional
+            Number of traffic classes, by default 2.
+        scheduler : str, optional
+            One of "priority", "drr" or "wfq", by default "priority".
+        weights : Optional[list[float]], optional
+            Weight of each class for "drr" and "wfq", by default all 1.
+        quantum : int, optional
+            Bytes per round of a class with weight 1 for "drr",
+            by default 1500.
+        class_map : Optional[dict[int, int]], optional
+            Class of each DSCP value, by default the DSCP itself. Unmapped
+            values go to the last class.
+        """
+        if scheduler not in SCHEDULERS:
+            raise ValueError(
+                f"Unknown scheduler {scheduler!r}, expected one of {SCHEDULERS}."
+            )
+        capacities = capacity if isinstance(capacity, list) else [capacity] * classes
+        weights = weights if weights is not None else [1.0] * classes
+        if len(capacities) != classes or len(weights) != classes:
+            raise ValueError("Expected one capacity and weight per class.")
+        super().__init__(env, port_no, capacity, transmission_rate)
+        self.classes = classes
+        self.scheduler = scheduler
+        self.weights = weights
+        self.class_map = class_map
+        self.capacities = capacities
+        self.queues: list[deque[PacketProto]] = [deque() for _ in range(classes)]
+        self.class_byte_counts: list[int] = [0] * classes
+        self.class_packet_counts: list[int] = [0] * classes  # processed
+        self.class_drop_counts: list[int] = [0] * classes
+
+        # scheduler state
+        self._active_mask: int = 0  # priority: bit c set if class c waits
+        self._round: deque[int] = deque()  # drr: backlogged classes
+        self._deficits: list[float] = [0.0] * classes
+        self._quanta: list[float] = [w * quantum for w in weights]
+        self._credited: bool = False  # drr: head of the round got its quantum
+        self._heap: list[tuple[float, int]] = []  # wfq: (head finish, class)
+        self._finish: list[deque[float]] = [deque() for _ in range(classes)]
+        self._last_finish: list[float] = [0.0] * classes
+        self._virtual_time: float = 0.0
+        self._push, self._pop = {
+            "priority": (self._push_priority, self._pop_priority),
+            "drr": (self._push_drr, self._pop_drr),
+            "wfq": (self._push_wfq, self._pop_wfq),
+        }[scheduler]
+
+    def classify(self, packet: PacketProto) -> int:
+        """
+        Traffic class of a packet.
+
+        Parameters
+        ----------
+        packet : PacketProto
+            The packet.
+
+        Returns
+        -------
+        int
+            Class index.
+        """
+        dscp = packet.dscp
+        if self.class_map is not None:
+            return self.class_map.get(dscp, self.classes - 1)
+        return dscp if 0 <= dscp < self.classes else self.classes - 1
+
+    def _push_priority(self, packet: PacketProto, c: int) -> None:
+        self.queues[c].append(packet)
+        self._active_mask |= 1 << c
+
+    def _pop_priority(self) -> PacketProto:
+        mask = self._active_mask
+        c = (mask & -mask).bit_length() - 1  # lowest set bit
+        queue = self.queues[c]
+        packet = queue.popleft()
+        if not queue:
+            self._active_mask = mask & ~(1 << c)
+        return packet
+
+    def _push_drr(self, packet: PacketProto, c: int) -> None:
+        queue = self.queues[c]
+        if not queue:
+            self._round.append(c)
+        queue.append(packet)
+
+    def _pop_drr(self) -> PacketProto:
+        round_ = self._round
+        deficits = self._deficits
+        while True:
+            c = round_[0]
+            if not self._credited:
+                deficits[c] += self._quanta[c]
+                self._credited = True
+            queue = self.queues[c]
+            size = queue[0].size
+            if size <= deficits[c]:
+                deficits[c] -= size
+                packet = queue.popleft()
+                if not queue:
+                    deficits[c] = 0.0
+                    round_.popleft()
+                    self._credited = False
+                return packet
+            round_.rotate(-1)
+            self._credited = False
+
+    def _push_wfq(self, packet: PacketProto, c: int) -> None:
+        queue = self.queues[c]
+        start = max(self._virtual_time, self._last_finish[c])
+        finish = start + packet.size / self.weights[c]
+        self._last_finish[c] = finish
+        if not queue:
+            heappush(self._heap, (finish, c))
+        queue.append(packet)
+        self._finish[c].append(finish)
+
+    def _pop_wfq(self) -> PacketProto:
+        finish, c = heappop(self._heap)
+        self._virtual_time = finish
+        queue = self.queues[c]
+        packet = queue.popleft()
+        self._finish[c].popleft()
+        if queue:
+            heappush(self._heap, (self._finish[c][0], c))
+        return packet
+
+    def _dequeue(self) -> None:
+        """
+        Move the packet chosen by the scheduler to transmission.
+        """
+        packet = self._pop()
+        self.byte_count -= packet.size
+        self.packet_count -= 1
+        self.class_byte_counts[self.classify(packet)] -= packet.size
+        self._transmit(packet)
+
+    def process_packet(self, packet: PacketProto) -> Optional[simpy.Event]:
+        """
+        Process a packet by adding it to the queue of its class if there is
+        enough capacity there. Otherwise the packet is dropped.
+
+        Parameters
+        ----------
+        packet : PacketProto
+            The packet to be processed.
+
+        Returns
+        -------
+        Optional[simpy.Event]
+            Always None, queueing does not create an event.
+        """
+        c = self.classify(packet)
+        size = packet.size
+        self.cum_packet_count += 1
+        self.cum_byte_count += size
+        self.class_packet_counts[c] += 1
+
+        capacity = self.capacities[c]
+        if capacity and self._full(self.class_byte_counts[c] + size, capacity, c):
+            # dropped packet here
+            self.cum_drop_count += 1
+            if self.trace is not None:
+                self.trace.record(self.env.now, DROP, self.trace_id, packet.id, packet.size)
+            self.class_drop_counts[c] += 1
+            if packet.pool is not None:
+                packet.pool.release(packet)
+            return None
+
+        if self.trace is not None:
+            self.trace.record(self.env.now, ENQUEUE, self.trace_id, packet.id, packet.size)
+        if not self.processing:
+            if self.scheduler == "wfq":
+                # keep the virtual clock running for packets that never wait
+                self._push_wfq(packet, c)
+                packet = self._pop_wfq()
+            self._transmit(packet)
+        else:
+            self._push(packet, c)
+            self.byte_count += size
+            self.packet_count += 1
+            self.class_byte_counts[c] += size
+        for tap in self.taps:
+            tap.update()
+        return None
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the port counters.
+
+        Returns
+        -------
+        dict[str, float]
+            Packet, byte and drop counts and the loss rate, in total and per
+            class.
+        """
+        result = super().summary()
+        for c in range(self.classes):
+            packets = self.class_packet_counts[c]
+            result[f"class_{c}_packets"] = packets
+            result[f"class_{c}_drops"] = self.class_drop_counts[c]
+            result[f"class_{c}_loss_rate"] = (
+                self.class_drop_counts[c] / packets if packets else 0.0
+            )
+        return result
+
+    def __repr__(self) -> str:
+        """
+        String representation of the switch port.
+
+        Returns
+        -------
+        str
+            String representation of the switch port.
+        """
+        return f"MultiClassSwitchPort(scheduler={self.scheduler}, classes={self.classes}, capacity={self.capacity}, transmission_rate={self.transmission_rate}, destination={self.destination})"
+
+
+class Switch:
+    def __init__(
+        self,
+        env: simpy.Environment,
+        switch_id: str,
+        num_ports: int,
+        port_capacity: int,
+        port_transmission_rate: float,
+        port_class: type = SwitchPort,
+    ) -> None:
+        """
+        Network switch containing multiple ports.
+        Only meant as a collection of ports.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            The simulation environment.
+        switch_id : str
+            Identifier for this switch.
+        num_ports : int
+            Number of ports in the switch.
+        port_capacity : int
+            Capacity of each port.
+        port_transmission_rate : float
+            Transmission rate of each port.
+        port_class : type, optional
+            Port implementation, ``SwitchPort`` or ``FastSwitchPort``,
+            by default ``SwitchPort``. Class-aware ports can be configured
+            with ``partial(MultiClassSwitchPort, classes=4, scheduler="drr")``.
+        """
+        self.env = env
+        self.id = switch_id
+        self.port_cnt = count()
+        self.ports: list[SwitchPort] = [
+            port_class(
+                env,
+                port_no=next(self.port_cnt),
+                capacity=port_capacity,
+                transmission_rate=port_transmission_rate,
+            )
+            for _ in range(num_ports)
+        ]
+
+    def __repr__(self) -> str:
+        """
+        String representation of the switch.
 
         Returns
         -------
@@ -474,6 +1361,25 @@ class NetworkTap:
                 self.packet_count.append(self.port.packet_count)
             self.byte_count.append(self.port.byte_count)
 
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the sampled occupancy.
+
+        Returns
+        -------
+        dict[str, float]
+            Mean and maximum sampled packet and byte counts.
+        """
+        if not self.packet_count:
+            return {"samples": 0}
+        return {
+            "samples": len(self.packet_count),
+            "mean_packets": float(np.mean(self.packet_count)),
+            "max_packets": max(self.packet_count),
+            "mean_bytes": float(np.mean(self.byte_count)),
+            "max_bytes": max(self.byte_count),
+        }
+
     def __repr__(self) -> str:
         """
         String representation of the network tap.
@@ -486,6 +1392,483 @@ class NetworkTap:
         return f"NetworkTap(Last 10 packet counts={self.packet_count[-10:]}, last 10 byte counts={self.byte_count[-10:]})"
 
 
+class OccupancyTap:
+    """
+    Event-driven occupancy statistics of a switch port.
+
+    The port calls ``update`` whenever its queue or transmission state
+    changes, so the time-weighted averages and the occupancy distribution are
+    exact and no polling process is needed. Occupancy counts the packets in
+    the system, i.e. queued plus the one in transmission, like
+    ``NetworkTap``; bytes count the queued bytes.
+
+    Attributes
+    ----------
+    env : simpy.Environment
+        The simulation environment.
+    port : Union[SwitchPort, FastSwitchPort]
+        The tapped port.
+    start_time : float
+        Time at which the tap was attached.
+    max_packets : int
+        Maximum number of packets in the system.
+    max_bytes : int
+        Maximum number of queued bytes.
+    resolution : Optional[float]
+        Bin width of the downsampled series, None if it is off.
+    """
+
+    def __init__(
+        self,
+        env: simpy.Environment,
+        port: Union[SwitchPort, FastSwitchPort],
+        resolution: Optional[float] = None,
+        series_length: int = 4096,
+    ) -> None:
+        """
+        Attach a new occupancy tap to a port.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            The simulation environment.
+        port : Union[SwitchPort, FastSwitchPort]
+            The switch port to be tapped.
+        resolution : Optional[float], optional
+            Bin width of a downsampled series of time-averaged occupancy, by
+            default None (no series).
+        series_length : int, optional
+            Number of most recent bins kept in the series ring buffer,
+            by default 4096.
+        """
+        self.env = env
+        self.port = port
+        self.start_time: float = env.now
+        self.resolution = resolution
+        self._time: float = env.now  # time of the last change
+        self._packets: int = port.packet_count + port.processing
+        self._bytes: int = port.byte_count
+        self.max_packets: int = self._packets
+        self.max_bytes: int = self._bytes
+        self._packet_area: float = 0.0
+        self._byte_area: float = 0.0
+        self._time_at: list[float] = [0.0] * (self._packets + 1)  # by packets
+        if resolution is not None:
+            self._series_packets = np.zeros(series_length)
+            self._series_bytes = np.zeros(series_length)
+            self._bin = int(env.now // resolution)  # current, unfinished bin
+            self._bin_packet_area = 0.0
+            self._bin_byte_area = 0.0
+            self._first_bin = self._bin
+        port.taps.append(self)
+
+    def update(self) -> None:
+        """
+        Account for the time since the last change and read the new state of
+        the port. Called by the port.
+        """
+        self._advance(self.env.now)
+        port = self.port
+        self._packets = packets = port.packet_count + port.processing
+        self._bytes = port.byte_count
+        if packets > self.max_packets:
+            self.max_packets = packets
+            self._time_at.extend([0.0] * (packets + 1 - len(self._time_at)))
+        if self._bytes > self.max_bytes:
+            self.max_bytes = self._bytes
+
+    def _advance(self, now: float) -> None:
+        """
+        Integrate the current state up to ``now``.
+
+        Parameters
+        ----------
+        now : float
+            Current simulation time.
+        """
+        dt = now - self._time
+        if dt <= 0:
+            return
+        self._packet_area += self._packets * dt
+        self._byte_area += self._bytes * dt
+        self._time_at[self._packets] += dt
+        if self.resolution is not None:
+            self._advance_series(now)
+        self._time = now
+
+    def _advance_series(self, now: float) -> None:
+        """
+        Integrate the current state into the series bins up to ``now``,
+        closing every bin passed on the way.
+
+        Parameters
+        ----------
+        now : float
+            Current simulation time.
+        """
+        r = self.resolution
+        packets, size = self._packets, self._bytes
+        last = int(now // r)
+        if last == self._bin:
+            self._bin_packet_area += packets * (now - self._time)
+            self._bin_byte_area += size * (now - self._time)
+            return
+        n = len(self._series_packets)
+        end = (self._bin + 1) * r
+        slot = self._bin % n
+        self._series_packets[slot] = (self._bin_packet_area + packets * (end - self._time)) / r
+        self._series_bytes[slot] = (self._bin_byte_area + size * (end - self._time)) / r
+        if last > self._bin + 1:
+            # bins without a change hold the current state, only the last n are kept
+            full = np.arange(max(self._bin + 1, last - n), last) % n
+            self._series_packets[full] = packets
+            self._series_bytes[full] = size
+        self._bin = last
+        self._bin_packet_area = packets * (now - last * r)
+        self._bin_byte_area = size * (now - last * r)
+
+    @property
+    def mean_packets(self) -> float:
+        """Time-weighted mean number of packets in the system."""
+        self._advance(self.env.now)
+        elapsed = self.env.now - self.start_time
+        return self._packet_area / elapsed if elapsed > 0 else float(self._packets)
+
+    @property
+    def mean_bytes(self) -> float:
+        """Time-weighted mean number of queued bytes."""
+        self._advance(self.env.now)
+        elapsed = self.env.now - self.start_time
+        return self._byte_area / elapsed if elapsed > 0 else float(self._bytes)
+
+    def distribution(self) -> np.ndarray:
+        """
+        Fraction of time spent with ``k`` packets in the system.
+
+        Returns
+        -------
+        np.ndarray
+            Probability of each occupancy ``k = 0 .. max_packets``.
+        """
+        self._advance(self.env.now)
+        times = np.asarray(self._time_at)
+        total = times.sum()
+        return times / total if total > 0 else times
+
+    def series(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Downsampled series of the finished bins still in the ring buffer.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, np.ndarray]
+            Bin start times, time-averaged packets in the system and
+            time-averaged queued bytes per bin.
+
+        Raises
+        ------
+        ValueError
+            If the tap was created without a resolution.
+        """
+        if self.resolution is None:
+            raise ValueError("Occupancy tap has no series, set a resolution.")
+        self._advance(self.env.now)
+        n = len(self._series_packets)
+        bins = np.arange(max(self._first_bin, self._bin - n), self._bin)
+        return (
+            bins * self.resolution,
+            self._series_packets[bins % n],
+            self._series_bytes[bins % n],
+        )
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the occupancy.
+
+        Returns
+        -------
+        dict[str, float]
+            Time-weighted mean and maximum packets in the system and queued
+            bytes, and the fraction of time the port was busy.
+        """
+        return {
+            "mean_packets": self.mean_packets,
+            "max_packets": self.max_packets,
+            "mean_bytes": self.mean_bytes,
+            "max_bytes": self.max_bytes,
+            "utilization": 1.0 - float(self.distribution()[0])
+            if self.env.now > self.start_time
+            else float(self._packets > 0),
+        }
+
+    def __repr__(self) -> str:
+        """
+        String representation of the occupancy tap.
+
+        Returns
+        -------
+        str
+            String representation of the occupancy tap.
+        """
+        return f"OccupancyTap(mean_packets={self.mean_packets:.3f}, max_packets={self.max_packets}, max_bytes={self.max_bytes})"
+
+
+PACKET_RECORD_DTYPE = np.dtype(
+    [
+        ("id", np.int64),
+        ("size", np.int64),
+        ("source", np.int32),
+        ("creation_time", np.float64),
+        ("arrival_time", np.float64),
+    ]
+)
+
+
+def summarize_packets(
+    creation_time: np.ndarray, arrival_time: np.ndarray, total_bytes: int
+) -> dict[str, float]:
+    """
+    Vectorized delay, jitter and throughput summary of received packets.
+
+    Parameters
+    ----------
+    creation_time : np.ndarray
+        Times at which the packets were created.
+    arrival_time : np.ndarray
+        Times at which the packets arrived at the sink, in arrival order.
+    total_bytes : int
+        Total number of bytes received.
+
+    Returns
+    -------
+    dict[str, float]
+        Packet and byte counts, delay statistics, mean jitter (mean absolute
+        difference of consecutive delays), the RFC 3550 jitter estimate (see
+        ``stats.JitterEstimator``), mean inter-arrival time and throughput in
+        bits per simulation time unit.
+    """
+    n = len(arrival_time)
+    if n == 0:
+        return {"packets": 0, "bytes": 0}
+    delays = arrival_time - creation_time
+    differences = np.abs(np.diff(delays))
+    # J += (|D| - J) / 16 from J = 0, unrolled into decaying weights
+    weights = (15 / 16) ** np.arange(n - 2, -1, -1) / 16
+    p50, p95, p99 = np.percentile(delays, [50, 95, 99])
+    span = float(arrival_time[-1] - arrival_time[0])
+    return {
+        "packets": n,
+        "bytes": int(total_bytes),
+        "mean_delay": float(delays.mean()),
+        "std_delay": float(delays.std()),
+        "min_delay": float(delays.min()),
+        "max_delay": float(delays.max()),
+        "p50_delay": float(p50),
+        "p95_delay": float(p95),
+        "p99_delay": float(p99),
+        "jitter": float(differences.mean()) if n > 1 else 0.0,
+        "rfc3550_jitter": float(differences @ weights),
+        "mean_interarrival": span / (n - 1) if n > 1 else 0.0,
+        "throughput": BYTES_TO_BITS * total_bytes / span if span > 0 else 0.0,
+    }
+
+
+class PacketLog:
+    """
+    Columnar log of received packets backed by a growable NumPy structured
+    array.
+
+    Storage grows in whole chunks, so appending is amortized O(1) and no
+    per-packet Python objects are kept. Columns are exposed as zero-copy views
+    into the underlying buffer. Views taken before the log grows keep pointing
+    at the old buffer, so take them again after further appends.
+
+    Attributes
+    ----------
+    chunk_size : int
+        Number of records the buffer grows by at minimum.
+    sources : list[str]
+        Source identifiers, indexed by the ``source`` column.
+    """
+
+    def __init__(self, chunk_size: int = 65536) -> None:
+        """
+        Initialize an empty packet log.
+
+        Parameters
+        ----------
+        chunk_size : int, optional
+            Number of records the buffer grows by at minimum, by default 65536.
+        """
+        self.chunk_size = chunk_size
+        self.sources: list[str] = []
+        self._source_index: dict[str, int] = {}
+        self._buffer = np.empty(chunk_size, dtype=PACKET_RECORD_DTYPE)
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _reserve(self, extra: int) -> None:
+        """
+        Make room for at least ``extra`` more records.
+
+        Parameters
+        ----------
+        extra : int
+            Number of records to be appended.
+        """
+        needed = self._length + extra
+        if needed <= len(self._buffer):
+            return
+        # grow geometrically, rounded up to whole chunks
+        chunks = -(-max(needed, 2 * len(self._buffer)) // self.chunk_size)
+        buffer = np.empty(chunks * self.chunk_size, dtype=PACKET_RECORD_DTYPE)
+        buffer[: self._length] = self._buffer[: self._length]
+        self._buffer = buffer
+
+    def source_index(self, source: str) -> int:
+        """
+        Map a source identifier to its integer index, registering it if needed.
+
+        Parameters
+        ----------
+        source : str
+            Source identifier.
+
+        Returns
+        -------
+        int
+            Index of the source in ``sources``.
+        """
+        index = self._source_index.get(source)
+        if index is None:
+            index = self._source_index[source] = len(self.sources)
+            self.sources.append(source)
+        return index
+
+    def append(self, packet: "PacketProto", arrival_time: float) -> None:
+        """
+        Append a single received packet.
+
+        Parameters
+        ----------
+        packet : PacketProto
+            The received packet.
+        arrival_time : float
+            Time at which the packet arrived at the sink.
+        """
+        if self._length == len(self._buffer):
+            self._reserve(1)
+        self._buffer[self._length] = (
+            packet.id,
+            packet.size,
+            self.source_index(packet.source),
+            packet.creation_time,
+            arrival_time,
+        )
+        self._length += 1
+
+    def extend(
+        self,
+        id: np.ndarray,
+        size: np.ndarray,
+        source: Union[np.ndarray, int],
+        creation_time: np.ndarray,
+        arrival_time: np.ndarray,
+    ) -> None:
+        """
+        Append a block of records given as columns.
+
+        Parameters
+        ----------
+        id : np.ndarray
+            Packet identifiers.
+        size : np.ndarray
+            Packet sizes in bytes.
+        source : Union[np.ndarray, int]
+            Source indices (see ``source_index``), or a single index for all.
+        creation_time : np.ndarray
+            Packet creation times.
+        arrival_time : np.ndarray
+            Packet arrival times at the sink.
+        """
+        n = len(arrival_time)
+        self._reserve(n)
+        block = self._buffer[self._length : self._length + n]
+        block["id"] = id
+        block["size"] = size
+        block["source"] = source
+        block["creation_time"] = creation_time
+        block["arrival_time"] = arrival_time
+        self._length += n
+
+    def clear(self) -> None:
+        """
+        Forget all records, keeping the buffer and the source indices.
+        """
+        self._length = 0
+
+    @property
+    def records(self) -> np.ndarray:
+        """Structured array view of all logged records."""
+        return self._buffer[: self._length]
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.records["id"]
+
+    @property
+    def sizes(self) -> np.ndarray:
+        return self.records["size"]
+
+    @property
+    def source_indices(self) -> np.ndarray:
+        return self.records["source"]
+
+    @property
+    def creation_times(self) -> np.ndarray:
+        return self.records["creation_time"]
+
+    @property
+    def arrivals(self) -> np.ndarray:
+        return self.records["arrival_time"]
+
+    @property
+    def delays(self) -> np.ndarray:
+        """Packet delays. Computed, so this is a new array, not a view."""
+        return self.arrivals - self.creation_times
+
+    @property
+    def interarrivals(self) -> np.ndarray:
+        """Inter-arrival times, the first one measured from time 0."""
+        return np.diff(self.arrivals, prepend=0.0)
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the logged packets, see ``summarize_packets``.
+
+        Returns
+        -------
+        dict[str, float]
+            Delay, jitter and throughput statistics.
+        """
+        return summarize_packets(
+            self.creation_times, self.arrivals, int(self.sizes.sum())
+        )
+
+    def __repr__(self) -> str:
+        """
+        String representation of the packet log.
+
+        Returns
+        -------
+        str
+            String representation of the packet log.
+        """
+        return f"PacketLog(records={self._length}, sources={len(self.sources)})"
+
+
 class PacketSink:
     """
     An endpoint for packets to be received and logged.
@@ -496,11 +1879,32 @@ class PacketSink:
         The simulation environment.
     sink_id : str
         Identifier for this packet sink.
-    logged_packets : list[Dict[str, float]]
-        A list of dictionaries. Each dictionary contains details about a packet.
+    logged_packets : list[PacketProto]
+        Received packets, if ``keep_packets`` is set.
+    retention : str
+        How per-packet statistics are kept. ``"raw"`` keeps Python lists in
+        ``delays``, ``arrivals`` and ``interarrivals``. ``"columnar"`` keeps a
+        ``PacketLog`` in ``log`` and exposes the same names as NumPy arrays.
+        ``"streaming"`` keeps only running statistics in ``stats``, in
+        constant memory, and no per-packet values.
+    log : Optional[PacketLog]
+        Columnar packet log, only with the ``"columnar"`` retention.
+    stats : Optional[StreamingPacketStats]
+        Running statistics, only with the ``"streaming"`` retention.
+    trace : Optional[TraceRecorder]
+        Recorder of the component's events, set by ``TraceRecorder.attach``.
+    exporter : Optional[Any]
+        Receives every packet, set by ``export.SinkExporter``.
     """
 
-    def __init__(self, env: simpy.Environment, sink_id: str, debug: bool = False):
+    def __init__(
+        self,
+        env: simpy.Environment,
+        sink_id: str,
+        debug: bool = False,
+        retention: str = "raw",
+        keep_packets: bool = True,
+    ):
         """
         Initialize a new packet sink.
 
@@ -510,15 +1914,62 @@ class PacketSink:
             The simulation environment.
         sink_id : str
             Identifier for this packet sink.
+        debug : bool, optional
+            Log every received packet, by default False.
+        retention : str, optional
+            One of "raw", "columnar" or "streaming", by default "raw".
+        keep_packets : bool, optional
+            Keep the received packet objects in ``logged_packets``,
+            by default True.
         """
+        if retention not in SINK_RETENTIONS:
+            raise ValueError(
+                f"Unknown retention {retention!r}, expected one of {SINK_RETENTIONS}."
+            )
         self.env = env
         self.sink_id = sink_id
+        self.retention = retention
+        self.keep_packets = keep_packets
         self.logged_packets: list[PacketProto] = []
-        self.delays: list[float] = []
-        self.arrivals: list[float] = []
-        self.interarrivals: list[float] = []
+        self.log: Optional[PacketLog] = (
+            PacketLog() if retention == "columnar" else None
+        )
+        self.stats: Optional[StreamingPacketStats] = (
+            StreamingPacketStats() if retention == "streaming" else None
+        )
+        self._delays: list[float] = []
+        self._arrivals: list[float] = []
+        self._interarrivals: list[float] = []
         self.last_arrival_time: float = 0
+        self.packet_count: int = 0  # total number of received packets
+        self.byte_count: int = 0  # total number of received bytes
         self.debug = debug
+        self.trace: Optional[TraceRecorder] = None  # see TraceRecorder.attach
+        self.trace_id: int = 0
+        self.exporter: Optional[Any] = None  # see export.SinkExporter
+        if debug:
+            enable_console_logging()
+
+    def _check_retained(self) -> None:
+        if self.stats is not None:
+            raise ValueError(
+                "Per-packet values are not kept with the streaming retention, use summary() or stats."
+            )
+
+    @property
+    def delays(self) -> Union[list[float], np.ndarray]:
+        self._check_retained()
+        return self._delays if self.log is None else self.log.delays
+
+    @property
+    def arrivals(self) -> Union[list[float], np.ndarray]:
+        self._check_retained()
+        return self._arrivals if self.log is None else self.log.arrivals
+
+    @property
+    def interarrivals(self) -> Union[list[float], np.ndarray]:
+        self._check_retained()
+        return self._interarrivals if self.log is None else self.log.interarrivals
 
     def process_packet(self, packet: PacketProto) -> Optional[simpy.Event]:
         """
@@ -532,17 +1983,50 @@ class PacketSink:
         arrival_time = self.env.now
         packet.sink_id = self.sink_id
         packet.sink_time = arrival_time
-        self.logged_packets.append(packet)
-        self.delays.append(arrival_time - packet.creation_time)
-        self.arrivals.append(arrival_time)
-        self.interarrivals.append(arrival_time - self.last_arrival_time)
+        self.packet_count += 1
+        self.byte_count += packet.size
+        if self.trace is not None:
+            self.trace.record(self.env.now, RECEIVE, self.trace_id, packet.id, packet.size)
+        if self.exporter is not None:
+            self.exporter.append(packet, arrival_time)
+        if self.keep_packets:
+            self.logged_packets.append(packet)
+        if self.stats is not None:
+            self.stats.add(packet.creation_time, arrival_time, packet.size)
+        elif self.log is not None:
+            self.log.append(packet, arrival_time)
+        else:
+            self._delays.append(arrival_time - packet.creation_time)
+            self._arrivals.append(arrival_time)
+            self._interarrivals.append(arrival_time - self.last_arrival_time)
         self.last_arrival_time = arrival_time
         if self.debug:
             logger.info(
                 f"{self}. Arrival time {arrival_time:6.2f}. Processed: {packet}"
             )
+        if not self.keep_packets and packet.pool is not None:
+            packet.pool.release(packet)
         return None
 
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize received packets, see ``summarize_packets``. With the
+        streaming retention the delay percentiles are approximate, see
+        ``StreamingPacketStats``.
+
+        Returns
+        -------
+        dict[str, float]
+            Delay, jitter and throughput statistics.
+        """
+        if self.stats is not None:
+            return self.stats.summary(BYTES_TO_BITS)
+        if self.log is not None:
+            return self.log.summary()
+        arrivals = np.asarray(self._arrivals)
+        delays = np.asarray(self._delays)
+        return summarize_packets(arrivals - delays, arrivals, self.byte_count)
+
     def __repr__(self) -> str:
         """
         String representation of the packet sink.
@@ -552,13 +2036,20 @@ class PacketSink:
         str
             String representation of the packet sink.
         """
-        return f"PacketSink(sink_id={self.sink_id}, logged_packets={len(self.logged_packets):6})"
+        return f"PacketSink(sink_id={self.sink_id}, logged_packets={self.packet_count:6})"
 
 
 class PacketFork:
     """
     Class to fork packets to different destinations based on the specified probabilities.
 
+    In the default ``"random"`` mode every packet picks a branch
+    independently. Branches are drawn with an alias table from batches of
+    uniforms, so a packet costs O(1) regardless of the number of branches. In
+    the ``"flow"`` mode all packets of a flow take the same branch, like ECMP:
+    the branch is picked once per flow from a CRC-32 hash of its key, with
+    the configured probabilities as the split of flows.
+
     Attributes
     ----------
     env : simpy.Environment
@@ -571,9 +2062,25 @@ class PacketFork:
         List of destinations for the packets.
     rng : numpy.random.Generator
         Random number generator.
+    mode : str
+        Either "random" or "flow".
+    counts : list[int]
+        Number of packets sent to each branch.
+    drop_count : int
+        Number of packets dropped because their branch has no destination.
+    trace : Optional[TraceRecorder]
+        Recorder of the component's events, set by ``TraceRecorder.attach``.
     """
 
-    def __init__(self, env: simpy.Environment, probs: list[float]):
+    def __init__(
+        self,
+        env: simpy.Environment,
+        probs: list[float],
+        rng: Optional[np.random.Generator] = None,
+        mode: str = "random",
+        flow_key: Optional[Callable[[PacketProto], Any]] = None,
+        batch_size: int = 4096,
+    ):
         """
         Forks packets to different destinations based on the specified
         probabilities.
@@ -584,29 +2091,158 @@ class PacketFork:
             The simulation environment.
         probs : list[float]
             List of probabilities for each destination.
+        rng : Optional[np.random.Generator], optional
+            Random number generator, by default a new unseeded one.
+        mode : str, optional
+            "random" for independent per-packet choices or "flow" to pin
+            flows to branches, by default "random".
+        flow_key : Optional[Callable[[PacketProto], Any]], optional
+            Flow of a packet in the "flow" mode, by default the packet source.
+        batch_size : int, optional
+            Number of uniforms drawn at once in the "random" mode,
+            by default 4096.
+
+        Raises
+        ------
+        ValueError
+            If a probability is negative, the probabilities do not sum to 1,
+            or the mode is unknown.
         """
+        if mode not in FORK_MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {FORK_MODES}.")
+        if any(p < 0 for p in probs):
+            raise ValueError("Probabilities must not be negative.")
         self.env = env
         self.probs = probs
         self.cum_probs = list(accumulate(probs))
-        if not int(self.cum_probs[-1]) == 1:
+        if abs(self.cum_probs[-1] - 1) > 1e-9:
             raise ValueError("Probabilities must sum to 1.")
         self.destinations: list[Union[DestinationProto, None]] = [None for _ in probs]
-        self.rng = default_rng()
+        self.rng = rng if rng is not None else default_rng()
+        self.mode = mode
+        self.flow_key = flow_key
+        self.batch_size = batch_size
+        self.counts: list[int] = [0] * len(probs)
+        self.drop_count: int = 0
+        self._alias = alias_table(probs)
+        self._branches = self._draw_branches()
+        self._flows: dict[Any, int] = {}  # branch of every flow seen
+        self.trace: Optional[TraceRecorder] = None  # see TraceRecorder.attach
+        self.trace_id: int = 0
+
+    def _draw_branches(self) -> Iterator[int]:
+        """
+        Iterate over random branches drawn in batches.
+
+        Yields
+        ------
+        int
+            The next branch.
+        """
+        while True:
+            uniforms = self.rng.random(self.batch_size)
+            yield from alias_choice(*self._alias, uniforms).tolist()
+
+    def flow_branch(self, key: Any) -> int:
+        """
+        Branch of a flow, the same in every run and process.
+
+        Parameters
+        ----------
+        key : Any
+            Flow key, hashed through its string form.
+
+        Returns
+        -------
+        int
+            The branch index.
+        """
+        branch = self._flows.get(key)
+        if branch is None:
+            u = zlib.crc32(str(key).encode()) / 2**32
+            branch = int(alias_choice(*self._alias, np.array([u]))[0])
+            self._flows[key] = branch
+        return branch
 
     def process_packet(self, packet: PacketProto) -> Optional[simpy.Event]:
         """
         Process a packet and send it to the appropriate destination.
 
+        Packets whose branch has no destination are dropped.
+
         Parameters
         ----------
         packet : Packet
             The incoming packet.
         """
-        for i, p in enumerate(self.cum_probs):
-            r = self.rng.random()
-            if r < p:
-                if self.destinations[i] is not None:
-                    return self.destinations[i].process_packet(packet)  # type: ignore
-            # else:
-            #     raise ValueError("No destination specified for packet fork.")
+        if self.mode == "random":
+            branch = next(self._branches)
+        else:
+            key = packet.source if self.flow_key is None else self.flow_key(packet)
+            branch = self.flow_branch(key)
+        self.counts[branch] += 1
+        destination = self.destinations[branch]
+        if destination is not None:
+            if self.trace is not None:
+                self.trace.record(self.env.now, FORWARD, self.trace_id, packet.id, packet.size)
+            return destination.process_packet(packet)
+        self.drop_count += 1
+        if self.trace is not None:
+            self.trace.record(self.env.now, DROP, self.trace_id, packet.id, packet.size)
+        if packet.pool is not None:
+            packet.pool.release(packet)
         return None
+
+    @property
+    def split(self) -> np.ndarray:
+        """Fraction of packets sent to each branch."""
+        counts = np.asarray(self.counts, dtype=np.float64)
+        total = counts.sum()
+        return counts / total if total else counts
+
+    def split_test(self) -> tuple[float, float]:
+        """
+        Chi-square test of the observed split against ``probs``.
+
+        Only meaningful in the "random" mode, in the "flow" mode packets of a
+        flow are not independent.
+
+        Returns
+        -------
+        tuple[float, float]
+            The statistic and its approximate p-value.
+        """
+        return chi_square_test(self.counts, self.probs)
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the split.
+
+        Returns
+        -------
+        dict[str, float]
+            Packet and drop counts, the largest deviation of the split from
+            ``probs`` and the packet count of each branch.
+        """
+        total = sum(self.counts)
+        result: dict[str, float] = {
+            "packets": total,
+            "drops": self.drop_count,
+            "max_split_error": float(np.abs(self.split - self.probs).max())
+            if total
+            else 0.0,
+        }
+        for i, c in enumerate(self.counts):
+            result[f"branch_{i}"] = c
+        return result
+
+    def __repr__(self) -> str:
+        """
+        String representation of the packet fork.
+
+        Returns
+        -------
+        str
+            String representation of the packet fork.
+        """
+        return f"PacketFork(mode={self.mode}, branches={len(self.probs)}, packets={sum(self.counts)})"
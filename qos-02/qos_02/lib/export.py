@@ -0,0 +1,448 @@
+"""
+Streaming export of sink records and port samples to Arrow IPC or Parquet.
+
+Records are buffered in bounded NumPy arrays and written as record batches
+while the simulation runs, so memory stays constant and no per-packet Python
+lists are built::
+
+    exporter = SinkExporter(sink, "sink.arrow")
+    sampler = PortSampler(env, "ports.parquet", switch.ports, interval=1.0)
+    env.run(until=100000)
+    exporter.close()
+    sampler.close()
+
+    table = read_table("sink.arrow")  # memory-mapped, zero-copy
+    delays = table["arrival_time"].to_numpy() - table["creation_time"].to_numpy()
+
+Sink records have the columns of ``PacketLog`` with the source as a string.
+Port samples hold the instantaneous and cumulative counters of every port
+and, for ports with an ``OccupancyTap``, the time-average number of packets
+over the sampling interval. ``export_log`` writes a whole ``PacketLog`` at
+once.
+
+Needs ``pyarrow``, installed with the ``export`` extra.
+"""
+
+import math
+import os
+from typing import Any, Iterator, Optional, Sequence, Union
+
+import numpy as np
+import simpy
+
+from .core import OccupancyTap, PacketLog, PacketProto, PacketSink
+
+EXPORT_FORMATS = ("ipc", "parquet")
+PORT_SAMPLE_DTYPE = np.dtype(
+    [
+        ("time", np.float64),
+        ("port", np.int32),
+        ("packets", np.int64),  # in the system, queued plus in transmission
+        ("bytes", np.int64),  # queued
+        ("cum_packets", np.int64),
+        ("cum_bytes", np.int64),
+        ("cum_drops", np.int64),
+        ("mean_packets", np.float64),  # over the interval, NaN without a tap
+    ]
+)
+
+
+def _pyarrow() -> Any:
+    """
+    Import pyarrow on first use.
+
+    Returns
+    -------
+    Any
+        The ``pyarrow`` module.
+
+    Raises
+    ------
+    ImportError
+        If pyarrow is not installed.
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "Exporting needs pyarrow, install the 'export' extra: pip install 'qos-02[export]'."
+        ) from None
+    return pyarrow
+
+
+class BatchWriter:
+    """
+    Writes record batches to an Arrow IPC or Parquet file, opened with the
+    schema of the first batch.
+
+    Attributes
+    ----------
+    path : str
+        Output file.
+    format : str
+        "ipc" or "parquet".
+    rows : int
+        Number of rows written.
+    batches : int
+        Number of batches written.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], format: str = "ipc") -> None:
+        """
+        Initialize a writer. The file is created with the first batch.
+
+        Parameters
+        ----------
+        path : Union[str, os.PathLike]
+            Output file.
+        format : str, optional
+            "ipc" (Arrow IPC file, memory-mappable) or "parquet",
+            by default "ipc".
+        """
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown format {format!r}, expected one of {EXPORT_FORMATS}.")
+        self.pa = _pyarrow()
+        self.path = os.fspath(path)
+        self.format = format
+        self.rows: int = 0
+        self.batches: int = 0
+        self._writer: Any = None
+        self._sink: Any = None
+
+    def write(self, columns: dict[str, Any]) -> None:
+        """
+        Write one batch.
+
+        Parameters
+        ----------
+        columns : dict[str, Any]
+            Column name to NumPy array or Arrow array, all of the same length.
+        """
+        pa = self.pa
+        batch = pa.RecordBatch.from_pydict(columns)
+        if self._writer is None:
+            if self.format == "parquet":
+                import pyarrow.parquet as pq
+
+                self._writer = pq.ParquetWriter(self.path, batch.schema)
+            else:
+                self._sink = pa.OSFile(self.path, "wb")
+                self._writer = pa.ipc.new_file(self._sink, batch.schema)
+        self._writer.write_batch(batch)
+        self.rows += batch.num_rows
+        self.batches += 1
+
+    def close(self) -> None:
+        """
+        Close the file.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def __repr__(self) -> str:
+        """
+        String representation of the batch writer.
+
+        Returns
+        -------
+        str
+            String representation of the batch writer.
+        """
+        return f"BatchWriter(path={self.path}, format={self.format}, rows={self.rows})"
+
+
+def _log_columns(log: PacketLog) -> dict[str, Any]:
+    """
+    Columns of a packet log, with the source indices replaced by names.
+    """
+    pa = _pyarrow()
+    records = log.records
+    sources = pa.DictionaryArray.from_arrays(
+        pa.array(records["source"]), pa.array(log.sources, pa.string())
+    )
+    return {
+        "id": records["id"],
+        "size": records["size"],
+        "source": sources.dictionary_decode(),
+        "creation_time": records["creation_time"],
+        "arrival_time": records["arrival_time"],
+    }
+
+
+class SinkExporter:
+    """
+    Streams the packets received by a sink to a file.
+
+    The sink hands every packet to ``append``, which buffers it in a
+    ``PacketLog`` of ``batch_size`` records; a full buffer is written as one
+    record batch.
+
+    Attributes
+    ----------
+    sink : PacketSink
+        The exported sink.
+    writer : BatchWriter
+        The file writer.
+    batch_size : int
+        Records per batch.
+    """
+
+    def __init__(
+        self,
+        sink: PacketSink,
+        path: Union[str, os.PathLike],
+        format: str = "ipc",
+        batch_size: int = 65536,
+    ) -> None:
+        """
+        Attach an exporter to a sink.
+
+        Parameters
+        ----------
+        sink : PacketSink
+            The sink, any retention.
+        path : Union[str, os.PathLike]
+            Output file.
+        format : str, optional
+            "ipc" or "parquet", by default "ipc".
+        batch_size : int, optional
+            Records per batch, bounds the buffer, by default 65536.
+        """
+        self.sink = sink
+        self.writer = BatchWriter(path, format)
+        self.batch_size = batch_size
+        self._log = PacketLog(chunk_size=batch_size)
+        sink.exporter = self
+
+    def append(self, packet: PacketProto, arrival_time: float) -> None:
+        """
+        Buffer a received packet. Called by the sink.
+
+        Parameters
+        ----------
+        packet : PacketProto
+            The received packet.
+        arrival_time : float
+            Arrival time at the sink.
+        """
+        self._log.append(packet, arrival_time)
+        if len(self._log) == self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write the buffered records as a batch.
+        """
+        if len(self._log):
+            self.writer.write(_log_columns(self._log))
+            self._log.clear()
+
+    def close(self) -> None:
+        """
+        Flush, close the file and detach from the sink.
+        """
+        self.flush()
+        self.writer.close()
+        if self.sink.exporter is self:
+            self.sink.exporter = None
+
+    def __repr__(self) -> str:
+        """
+        String representation of the sink exporter.
+
+        Returns
+        -------
+        str
+            String representation of the sink exporter.
+        """
+        return f"SinkExporter(sink={self.sink.sink_id}, path={self.writer.path}, rows={self.writer.rows})"
+
+
+class PortSampler:
+    """
+    Samples the counters of ports at a fixed interval and streams them to a
+    file.
+
+    Attributes
+    ----------
+    env : simpy.Environment
+        The simulation environment.
+    ports : list[Any]
+        The sampled ports.
+    interval : float
+        Sampling interval.
+    writer : BatchWriter
+        The file writer.
+    """
+
+    def __init__(
+        self,
+        env: simpy.Environment,
+        path: Union[str, os.PathLike],
+        ports: Sequence[Any],
+        interval: float = 1.0,
+        format: str = "ipc",
+        batch_size: int = 65536,
+    ) -> None:
+        """
+        Initialize a sampler and start its process.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            The simulation environment.
+        path : Union[str, os.PathLike]
+            Output file.
+        ports : Sequence[Any]
+            Ports to sample, ``port`` column is their index in this list.
+        interval : float, optional
+            Sampling interval, by default 1.0.
+        format : str, optional
+            "ipc" or "parquet", by default "ipc".
+        batch_size : int, optional
+            Rows per batch, bounds the buffer, by default 65536.
+        """
+        self.env = env
+        self.ports = list(ports)
+        self.interval = interval
+        self.writer = BatchWriter(path, format)
+        self.batch_size = max(batch_size, len(self.ports))
+        self._buffer = np.zeros(self.batch_size, dtype=PORT_SAMPLE_DTYPE)
+        self._length = 0
+        self._taps: list[Optional[OccupancyTap]] = []
+        self._areas: list[float] = []
+        for port in self.ports:
+            taps = [t for t in getattr(port, "taps", []) if isinstance(t, OccupancyTap)]
+            self._taps.append(taps[0] if taps else None)
+            self._areas.append(self._area(taps[0]) if taps else 0.0)
+        self._last = env.now
+        self._closed = False
+        self.process = env.process(self.start())  # type: ignore
+
+    @staticmethod
+    def _area(tap: OccupancyTap) -> float:
+        return tap.mean_packets * (tap.env.now - tap.start_time)
+
+    def start(self) -> Iterator[simpy.Event]:
+        """
+        Sample every ``interval``.
+        """
+        while not self._closed:
+            yield self.env.timeout(self.interval)  # type: ignore
+            if not self._closed:
+                self.sample()
+
+    def sample(self) -> None:
+        """
+        Append one row per port.
+        """
+        if self._length + len(self.ports) > self.batch_size:
+            self.flush()
+        now = self.env.now
+        elapsed = now - self._last
+        for i, port in enumerate(self.ports):
+            tap = self._taps[i]
+            mean = math.nan
+            if tap is not None:
+                area = self._area(tap)
+                mean = (area - self._areas[i]) / elapsed if elapsed > 0 else math.nan
+                self._areas[i] = area
+            self._buffer[self._length] = (
+                now,
+                i,
+                port.packet_count + port.processing,
+                port.byte_count,
+                port.cum_packet_count,
+                port.cum_byte_count,
+                port.cum_drop_count,
+                mean,
+            )
+            self._length += 1
+        self._last = now
+
+    def flush(self) -> None:
+        """
+        Write the buffered rows as a batch.
+        """
+        if self._length:
+            rows = self._buffer[: self._length]
+            self.writer.write({name: np.ascontiguousarray(rows[name]) for name in rows.dtype.names})
+            self._length = 0
+
+    def close(self) -> None:
+        """
+        Flush and close the file, and stop sampling.
+        """
+        self.flush()
+        self.writer.close()
+        self._closed = True
+
+    def __repr__(self) -> str:
+        """
+        String representation of the port sampler.
+
+        Returns
+        -------
+        str
+            String representation of the port sampler.
+        """
+        return f"PortSampler(ports={len(self.ports)}, interval={self.interval}, rows={self.writer.rows})"
+
+
+def export_log(
+    log: PacketLog,
+    path: Union[str, os.PathLike],
+    format: str = "ipc",
+    batch_size: int = 1 << 20,
+) -> None:
+    """
+    Write a whole columnar packet log, e.g. ``sink.log`` after a run.
+
+    Parameters
+    ----------
+    log : PacketLog
+        The log.
+    path : Union[str, os.PathLike]
+        Output file.
+    format : str, optional
+        "ipc" or "parquet", by default "ipc".
+    batch_size : int, optional
+        Records per batch, by default 1048576.
+    """
+    writer = BatchWriter(path, format)
+    columns = _log_columns(log)
+    try:
+        for start in range(0, len(log), batch_size):
+            writer.write({k: v[start : start + batch_size] for k, v in columns.items()})
+    finally:
+        writer.close()
+
+
+def read_table(path: Union[str, os.PathLike]) -> Any:
+    """
+    Read an exported file without copying: IPC files are memory-mapped,
+    Parquet files read through a memory map.
+
+    Parameters
+    ----------
+    path : Union[str, os.PathLike]
+        File written by this module.
+
+    Returns
+    -------
+    Any
+        A ``pyarrow.Table``.
+    """
+    pa = _pyarrow()
+    path = os.fspath(path)
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic == b"PAR1":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path, memory_map=True)
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
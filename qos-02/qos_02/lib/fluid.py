@@ -0,0 +1,575 @@
+"""
+Fluid-flow approximation for high-rate links.
+
+Sources are piecewise-constant rate processes instead of packet generators,
+and ports are fluid queues: between two rate changes the backlog grows or
+drains linearly, so backlog, overflow and delay are integrated in closed
+form. Events only occur when a rate changes or a queue becomes empty or
+full, so the cost scales with the number of rate changes, not packets::
+
+    env = simpy.Environment()
+    sink = FluidSink(env, "sink")
+    port = FluidPort(env, 0, capacity=10**6, transmission_rate=10**9)
+    port.destination = sink
+    for i in range(20):
+        OnOffSource(env, f"source{i}", port, peak_rate=10**8,
+                    on_time=partial(rng.exponential, 0.01),
+                    off_time=partial(rng.exponential, 0.02))
+    env.run(until=100)
+    port.summary()
+
+Rates are in bits per time unit and capacities in bytes, like
+``SwitchPort``. Fluid leaving a port feeds the next one, so ports can be
+chained into tandems. Delays are those of FIFO fluid, backlog over
+transmission rate, weighted by the accepted volume.
+"""
+
+import math
+from typing import Any, Iterator, Optional, Sequence, Union
+
+import numpy as np
+import simpy
+
+from .core import BYTES_TO_BITS
+from .variates import Variate
+
+
+def _draw(variate: Variate) -> float:
+    return float(variate) if isinstance(variate, (int, float)) else float(variate())
+
+
+class FluidSink:
+    """
+    Receives fluid and integrates the received volume.
+
+    Attributes
+    ----------
+    env : simpy.Environment
+        The simulation environment.
+    sink_id : str
+        Identifier of the sink.
+    rate : float
+        Current input rate in bits per time unit.
+    bits : float
+        Received volume in bits.
+    """
+
+    def __init__(self, env: simpy.Environment, sink_id: str) -> None:
+        self.env = env
+        self.sink_id = sink_id
+        self.rate: float = 0.0
+        self.bits: float = 0.0
+        self.rate_changes: int = 0
+        self._inputs: dict[int, float] = {}
+        self._time: float = env.now
+        self._start: float = env.now
+
+    def set_rate(self, upstream: Any, rate: float) -> None:
+        """
+        Change the rate an upstream component feeds in.
+
+        Parameters
+        ----------
+        upstream : Any
+            The feeding source or port.
+        rate : float
+            Its new rate in bits per time unit.
+        """
+        now = self.env.now
+        self.bits += self.rate * (now - self._time)
+        self._time = now
+        self._inputs[id(upstream)] = rate
+        self.rate = sum(self._inputs.values())
+        self.rate_changes += 1
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the received fluid.
+
+        Returns
+        -------
+        dict[str, float]
+            Received bytes and mean throughput in bits per time unit.
+        """
+        now = self.env.now
+        bits = self.bits + self.rate * (now - self._time)
+        elapsed = now - self._start
+        return {
+            "bytes": bits / BYTES_TO_BITS,
+            "throughput": bits / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def __repr__(self) -> str:
+        """
+        String representation of the fluid sink.
+
+        Returns
+        -------
+        str
+            String representation of the fluid sink.
+        """
+        return f"FluidSink(sink_id={self.sink_id}, rate={self.rate:g})"
+
+
+class FluidPort:
+    """
+    Fluid queue with a byte capacity, drained at the transmission rate.
+
+    Attributes
+    ----------
+    env : simpy.Environment
+        The simulation environment.
+    port_no : int
+        Port number.
+    capacity : Optional[int]
+        Buffer size in bytes, None or 0 for an unlimited buffer.
+    transmission_rate : float
+        Drain rate in bits per time unit.
+    destination : Any
+        Next ``FluidPort`` or ``FluidSink``.
+    backlog : float
+        Buffered volume in bits at the last update.
+    input_rate : float
+        Current input rate in bits per time unit.
+    output_rate : float
+        Current output rate in bits per time unit.
+    offered_bits : float
+        Volume offered so far.
+    lost_bits : float
+        Volume lost to overflow so far.
+    max_backlog : float
+        Largest backlog in bits.
+    rate_changes : int
+        Number of input rate changes processed.
+    """
+
+    def __init__(
+        self,
+        env: simpy.Environment,
+        port_no: int,
+        capacity: Optional[int] = 10,
+        transmission_rate: float = 1,
+    ) -> None:
+        """
+        Initialize an empty fluid port.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            The simulation environment.
+        port_no : int
+            Port number.
+        capacity : Optional[int], optional
+            Buffer size in bytes, by default 10. None or 0 for unlimited.
+        transmission_rate : float, optional
+            Drain rate in bits per time unit, by default 1.
+        """
+        self.env = env
+        self.port_no = port_no
+        self.capacity = capacity
+        self.transmission_rate = transmission_rate
+        self.destination: Any = None
+        self.backlog: float = 0.0
+        self.input_rate: float = 0.0
+        self.output_rate: float = 0.0
+        self.offered_bits: float = 0.0
+        self.lost_bits: float = 0.0
+        self.max_backlog: float = 0.0
+        self.rate_changes: int = 0
+        self._limit = BYTES_TO_BITS * capacity if capacity else math.inf
+        self._inputs: dict[int, float] = {}
+        self._time: float = env.now
+        self._start: float = env.now
+        self._area: float = 0.0  # integral of the backlog
+        self._delay_area: float = 0.0  # integral of delay times accepted rate
+        self._version: int = 0  # invalidates scheduled transitions
+
+    @property
+    def full(self) -> bool:
+        """Whether the buffer is full."""
+        return self.backlog >= self._limit
+
+    def _advance(self, now: float) -> None:
+        """
+        Integrate the linear backlog up to ``now``.
+
+        Parameters
+        ----------
+        now : float
+            Current simulation time.
+        """
+        dt = now - self._time
+        if dt <= 0:
+            return
+        c = self.transmission_rate
+        r = self.input_rate
+        x0 = self.backlog
+        if self.full and r >= c:
+            slope = 0.0
+            accepted = c
+            self.lost_bits += (r - c) * dt
+        elif x0 <= 0 and r <= c:
+            slope = 0.0
+            accepted = r
+        else:
+            slope = r - c
+            accepted = r
+        area = x0 * dt + slope * dt * dt / 2
+        self._area += area
+        self._delay_area += area / c * accepted
+        self.offered_bits += r * dt
+        self.backlog = min(max(x0 + slope * dt, 0.0), self._limit)
+        if self.backlog > self.max_backlog:
+            self.max_backlog = self.backlog
+        self._time = now
+
+    def set_rate(self, upstream: Any, rate: float) -> None:
+        """
+        Change the rate an upstream component feeds in.
+
+        Parameters
+        ----------
+        upstream : Any
+            The feeding source or port.
+        rate : float
+            Its new rate in bits per time unit.
+        """
+        self._advance(self.env.now)
+        self._inputs[id(upstream)] = rate
+        self.input_rate = sum(self._inputs.values())
+        self.rate_changes += 1
+        self._update()
+
+    def _update(self) -> None:
+        """
+        Set the output rate for the current state and schedule the next
+        empty or full transition.
+        """
+        c = self.transmission_rate
+        r = self.input_rate
+        self._version += 1
+        if self.backlog <= 0 and r <= c:
+            output = r
+            until = math.inf
+        elif self.full and r >= c:
+            output = c
+            until = math.inf
+        else:
+            output = c
+            if r > c:
+                until = (self._limit - self.backlog) / (r - c)
+            elif r < c:
+                until = self.backlog / (c - r)
+            else:
+                until = math.inf
+        if output != self.output_rate:
+            self.output_rate = output
+            if self.destination is None:
+                raise ValueError("No destination specified for fluid port.")
+            self.destination.set_rate(self, output)
+        if until < math.inf:
+            version = self._version
+            self.env.timeout(until).callbacks.append(  # type: ignore
+                lambda _: self._transition(version)
+            )
+
+    def _transition(self, version: int) -> None:
+        """
+        The queue became empty or full.
+
+        Parameters
+        ----------
+        version : int
+            Version the transition was scheduled for, stale ones are ignored.
+        """
+        if version != self._version:
+            return
+        self._advance(self.env.now)
+        # snap rounding errors to the boundary that was reached
+        if self.input_rate > self.transmission_rate:
+            self.backlog = self._limit
+        else:
+            self.backlog = 0.0
+        self._update()
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the port.
+
+        Returns
+        -------
+        dict[str, float]
+            Offered and lost bytes, loss rate, mean and maximum backlog in
+            bytes, mean delay of the accepted fluid, utilization and the
+            number of rate changes.
+        """
+        self._advance(self.env.now)
+        elapsed = self.env.now - self._start
+        accepted = self.offered_bits - self.lost_bits
+        carried = accepted - self.backlog  # transmitted so far
+        return {
+            "bytes": self.offered_bits / BYTES_TO_BITS,
+            "drops": self.lost_bits / BYTES_TO_BITS,
+            "loss_rate": self.lost_bits / self.offered_bits if self.offered_bits else 0.0,
+            "mean_bytes": self._area / elapsed / BYTES_TO_BITS if elapsed > 0 else 0.0,
+            "max_bytes": self.max_backlog / BYTES_TO_BITS,
+            "mean_delay": self._delay_area / accepted if accepted > 0 else 0.0,
+            "utilization": carried / (self.transmission_rate * elapsed) if elapsed > 0 else 0.0,
+            "rate_changes": self.rate_changes,
+        }
+
+    def __repr__(self) -> str:
+        """
+        String representation of the fluid port.
+
+        Returns
+        -------
+        str
+            String representation of the fluid port.
+        """
+        return (
+            f"FluidPort(capacity={self.capacity}, transmission_rate={self.transmission_rate}, "
+            f"backlog={self.backlog / BYTES_TO_BITS:g})"
+        )
+
+
+class OnOffSource:
+    """
+    Fluid source alternating between sending at its peak rate and silence.
+
+    Attributes
+    ----------
+    env : simpy.Environment
+        The simulation environment.
+    source_id : str
+        Identifier of the source.
+    destination : Any
+        ``FluidPort`` or ``FluidSink`` fed by the source.
+    peak_rate : float
+        Rate while on, in bits per time unit.
+    on_time : Variate
+        Duration of on periods.
+    off_time : Variate
+        Duration of off periods.
+    rate : float
+        Current rate.
+    """
+
+    def __init__(
+        self,
+        env: simpy.Environment,
+        source_id: str,
+        destination: Any,
+        peak_rate: float,
+        on_time: Variate,
+        off_time: Variate,
+        start_on: bool = True,
+    ) -> None:
+        """
+        Initialize an on/off source and start it.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            The simulation environment.
+        source_id : str
+            Identifier of the source.
+        destination : Any
+            ``FluidPort`` or ``FluidSink`` fed by the source.
+        peak_rate : float
+            Rate while on, in bits per time unit.
+        on_time : Variate
+            Duration of on periods, e.g. ``partial(rng.exponential, 0.01)``.
+        off_time : Variate
+            Duration of off periods.
+        start_on : bool, optional
+            Start with an on period, by default True.
+        """
+        self.env = env
+        self.source_id = source_id
+        self.destination = destination
+        self.peak_rate = peak_rate
+        self.on_time = on_time
+        self.off_time = off_time
+        self.rate: float = 0.0
+        self.start_on = start_on
+        self.process = env.process(self.start())  # type: ignore
+
+    @property
+    def mean_rate(self) -> float:
+        """Long-run mean rate, for numeric on and off times only."""
+        if isinstance(self.on_time, (int, float)) and isinstance(self.off_time, (int, float)):
+            return self.peak_rate * self.on_time / (self.on_time + self.off_time)
+        return math.nan
+
+    def start(self) -> Iterator[simpy.Event]:
+        """
+        Alternate between on and off periods.
+        """
+        on = self.start_on
+        while True:
+            self.rate = self.peak_rate if on else 0.0
+            self.destination.set_rate(self, self.rate)
+            yield self.env.timeout(_draw(self.on_time if on else self.off_time))  # type: ignore
+            on = not on
+
+    def __repr__(self) -> str:
+        """
+        String representation of the on/off source.
+
+        Returns
+        -------
+        str
+            String representation of the on/off source.
+        """
+        return f"OnOffSource(source_id={self.source_id}, peak_rate={self.peak_rate:g})"
+
+
+class MMPPSource:
+    """
+    Markov-modulated fluid source: a continuous-time Markov chain whose
+    state sets the rate.
+
+    Attributes
+    ----------
+    env : simpy.Environment
+        The simulation environment.
+    source_id : str
+        Identifier of the source.
+    destination : Any
+        ``FluidPort`` or ``FluidSink`` fed by the source.
+    rates : np.ndarray
+        Rate of every state, in bits per time unit.
+    generator : np.ndarray
+        Generator matrix of the chain, rows summing to 0.
+    state : int
+        Current state.
+    """
+
+    def __init__(
+        self,
+        env: simpy.Environment,
+        source_id: str,
+        destination: Any,
+        rates: Sequence[float],
+        generator: Union[Sequence[Sequence[float]], np.ndarray],
+        rng: Optional[np.random.Generator] = None,
+        initial: int = 0,
+    ) -> None:
+        """
+        Initialize an MMPP source and start it.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            The simulation environment.
+        source_id : str
+            Identifier of the source.
+        destination : Any
+            ``FluidPort`` or ``FluidSink`` fed by the source.
+        rates : Sequence[float]
+            Rate of every state, in bits per time unit.
+        generator : Union[Sequence[Sequence[float]], np.ndarray]
+            Generator matrix, off-diagonal transition rates and rows
+            summing to 0.
+        rng : Optional[np.random.Generator], optional
+            Generator of holding times and jumps, by default unseeded.
+        initial : int, optional
+            Initial state, by default 0.
+        """
+        self.env = env
+        self.source_id = source_id
+        self.destination = destination
+        self.rates = np.asarray(rates, dtype=np.float64)
+        self.generator = np.asarray(generator, dtype=np.float64)
+        n = len(self.rates)
+        if self.generator.shape != (n, n) or not np.allclose(self.generator.sum(axis=1), 0):
+            raise ValueError("Expected a square generator matrix with rows summing to 0.")
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.state = initial
+        self._exit = -np.diag(self.generator)
+        jumps = self.generator / np.where(self._exit > 0, self._exit, 1.0)[:, None]
+        np.fill_diagonal(jumps, 0.0)
+        self._jumps = jumps
+        self.process = env.process(self.start())  # type: ignore
+
+    @property
+    def stationary(self) -> np.ndarray:
+        """Stationary distribution of the chain."""
+        n = len(self.rates)
+        system = np.vstack((self.generator.T[:-1], np.ones(n)))
+        rhs = np.zeros(n)
+        rhs[-1] = 1.0
+        return np.linalg.solve(system, rhs)
+
+    @property
+    def mean_rate(self) -> float:
+        """Long-run mean rate."""
+        return float(self.stationary @ self.rates)
+
+    def start(self) -> Iterator[simpy.Event]:
+        """
+        Jump between states, announcing every rate change.
+        """
+        while True:
+            self.destination.set_rate(self, float(self.rates[self.state]))
+            exit_rate = self._exit[self.state]
+            if exit_rate <= 0:
+                return  # absorbing state
+            yield self.env.timeout(self.rng.exponential(1 / exit_rate))  # type: ignore
+            self.state = int(self.rng.choice(len(self.rates), p=self._jumps[self.state]))
+
+    def __repr__(self) -> str:
+        """
+        String representation of the MMPP source.
+
+        Returns
+        -------
+        str
+            String representation of the MMPP source.
+        """
+        return f"MMPPSource(source_id={self.source_id}, states={len(self.rates)}, state={self.state})"
+
+
+def fluid_tandem(
+    env: simpy.Environment,
+    num_ports: int,
+    capacity: Union[Optional[int], Sequence[Optional[int]]],
+    transmission_rate: Union[float, Sequence[float]],
+    sink_id: str = "sink",
+) -> tuple[list[FluidPort], FluidSink]:
+    """
+    Chain of fluid ports ending in a sink, like ``lindley.run_tandem``'s
+    topology.
+
+    Parameters
+    ----------
+    env : simpy.Environment
+        The simulation environment.
+    num_ports : int
+        Number of ports.
+    capacity : Union[Optional[int], Sequence[Optional[int]]]
+        Capacity of every port in bytes, or one per port.
+    transmission_rate : Union[float, Sequence[float]]
+        Rate of every port, or one per port.
+    sink_id : str, optional
+        Identifier of the sink, by default "sink".
+
+    Returns
+    -------
+    tuple[list[FluidPort], FluidSink]
+        The ports, first one to feed, and the sink.
+    """
+    capacities = list(capacity) if isinstance(capacity, Sequence) else [capacity] * num_ports
+    rates = (
+        list(transmission_rate)
+        if isinstance(transmission_rate, Sequence)
+        else [transmission_rate] * num_ports
+    )
+    if len(capacities) != num_ports or len(rates) != num_ports:
+        raise ValueError("Expected one capacity and transmission rate per port.")
+    ports = [FluidPort(env, i, c, r) for i, (c, r) in enumerate(zip(capacities, rates))]
+    sink = FluidSink(env, sink_id)
+    for port, nxt in zip(ports, ports[1:] + [sink]):
+        port.destination = nxt
+    return ports, sink
@@ -0,0 +1,634 @@
+"""
+Lightweight event kernel, a faster drop-in for ``simpy.Environment``.
+
+The components of this package only use timeouts, generator processes and
+stores. This kernel implements exactly that slice on a plain binary heap of
+``(time, priority, eid, callback, argument)`` entries, with slotted events
+and without simpy's priority enum and ``StopSimulation`` events::
+
+    env = kernel.Environment()
+    sink = PacketSink(env, "sink")
+    port = FastSwitchPort(env, 0, capacity=None, transmission_rate=1000)
+    ...
+    env.run(until=100000)
+
+Components detect the kernel and switch to callbacks: ``PacketSource`` and
+``FastSwitchPort`` schedule plain function calls with ``call_later``
+instead of creating timeouts and per-packet processes, and ``SwitchPort``
+uses the kernel's ``Store``. Calls are scheduled with the priorities and
+in the order the events would have been, so scenarios run unchanged on
+either backend and give identical results.
+
+``schedule``, ``active_process`` and the event attributes follow simpy's
+protocol, so simpy's own events and resources work on this environment
+too. ``call_later`` entries bypass ``schedule`` and hold a plain callable,
+code inspecting the schedule uses ``entry_callback``. Not supported:
+interrupts, conditions (``all_of``/``any_of``) and real-time runs. An
+exception escaping a process fails the process like in simpy and is raised
+from ``run`` unless another process waits for it.
+"""
+
+from collections import deque
+from heapq import heappop, heappush
+from itertools import count
+from typing import Any, Callable, Generator, Optional, Union
+
+from simpy.core import EmptySchedule
+from simpy.events import PENDING
+
+URGENT = 0
+NORMAL = 1
+Infinity = float("inf")
+
+
+class Event:
+    """
+    Event with simpy's attributes: ``callbacks`` is None once processed,
+    ``_value`` is ``PENDING`` until triggered.
+
+    Attributes
+    ----------
+    env : Environment
+        The environment.
+    callbacks : Optional[list[Callable[[Any], None]]]
+        Called with the event when it is processed.
+    """
+
+    __slots__ = ("env", "callbacks", "_value", "_ok", "_defused")
+
+    def __init__(self, env: "Environment") -> None:
+        self.env = env
+        self.callbacks: Optional[list[Callable[[Any], None]]] = []
+        self._value: Any = PENDING
+
+    @property
+    def triggered(self) -> bool:
+        """Whether the event has been triggered and is scheduled or processed."""
+        return self._value is not PENDING
+
+    @property
+    def processed(self) -> bool:
+        """Whether the callbacks of the event have been called."""
+        return self.callbacks is None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the event succeeded."""
+        return self._ok
+
+    @property
+    def defused(self) -> bool:
+        """Whether a failure of the event has been handled."""
+        return hasattr(self, "_defused")
+
+    @property
+    def value(self) -> Any:
+        """Value of the triggered event."""
+        if self._value is PENDING:
+            raise AttributeError(f"Value of {self} is not yet available.")
+        return self._value
+
+    def succeed(self, value: Any = None) -> "Event":
+        """
+        Trigger the event successfully.
+
+        Parameters
+        ----------
+        value : Any, optional
+            Value of the event, by default None.
+
+        Returns
+        -------
+        Event
+            The event.
+        """
+        if self._value is not PENDING:
+            raise RuntimeError(f"{self} has already been triggered.")
+        self._ok = True
+        self._value = value
+        self.env.schedule(self)
+        return self
+
+    def fail(self, exception: BaseException) -> "Event":
+        """
+        Trigger the event with a failure.
+
+        Parameters
+        ----------
+        exception : BaseException
+            Raised into the processes waiting for the event.
+
+        Returns
+        -------
+        Event
+            The event.
+        """
+        if self._value is not PENDING:
+            raise RuntimeError(f"{self} has already been triggered.")
+        if not isinstance(exception, BaseException):
+            raise ValueError(f"{exception} is not an exception.")
+        self._ok = False
+        self._value = exception
+        self.env.schedule(self)
+        return self
+
+    def __repr__(self) -> str:
+        """
+        String representation of the event.
+
+        Returns
+        -------
+        str
+            String representation of the event.
+        """
+        return f"<{type(self).__name__}() object at {id(self):#x}>"
+
+
+class Timeout(Event):
+    """
+    Event processed after a delay, scheduled on creation.
+    """
+
+    __slots__ = ("_delay",)
+
+    def __init__(self, env: "Environment", delay: float, value: Any = None) -> None:
+        if delay < 0:
+            raise ValueError(f"Negative delay {delay}")
+        self.env = env
+        self.callbacks = []
+        self._value = value
+        self._ok = True
+        self._delay = delay
+        heappush(env._queue, (env._now + delay, NORMAL, next(env._eid), env._fire, self))
+
+
+class Process(Event):
+    """
+    Generator process, itself an event triggered when the generator returns.
+
+    Attributes
+    ----------
+    target : Optional[Event]
+        Event the process is waiting for.
+    """
+
+    __slots__ = ("_generator", "_resume_callback", "target")
+
+    def __init__(self, env: "Environment", generator: Generator) -> None:
+        if not hasattr(generator, "throw"):
+            raise ValueError(f"{generator} is not a generator.")
+        self.env = env
+        self.callbacks = []
+        self._value = PENDING
+        self._generator = generator
+        self._resume_callback = self._resume
+        # start at the current time, before the events scheduled so far
+        start = Event(env)
+        start._ok = True
+        start._value = None
+        start.callbacks.append(self._resume_callback)  # type: ignore
+        heappush(env._queue, (env._now, URGENT, next(env._eid), env._fire, start))
+        self.target: Optional[Event] = start
+
+    @property
+    def is_alive(self) -> bool:
+        """Whether the generator has not returned yet."""
+        return self._value is PENDING
+
+    def _resume(self, event: Any) -> None:
+        """
+        Send the value of a processed event into the generator and wait for
+        the next event it yields.
+
+        Parameters
+        ----------
+        event : Any
+            The processed event, of this kernel or of simpy.
+        """
+        env = self.env
+        env._active_proc = self
+        generator = self._generator
+        while True:
+            try:
+                if event._ok:
+                    event = generator.send(event._value)
+                else:
+                    event._defused = True
+                    event = generator.throw(event._value)
+            except StopIteration as stop:
+                event = None
+                self._ok = True
+                self._value = stop.value
+                env.schedule(self)
+                break
+            except BaseException as error:
+                event = None
+                self._ok = False
+                self._value = error
+                env.schedule(self)
+                break
+            try:
+                callbacks = event.callbacks
+            except AttributeError:
+                error = RuntimeError(f"Invalid yield value {event!r}")
+                event = None
+                self._ok = False
+                self._value = error
+                env.schedule(self)
+                break
+            if callbacks is not None:
+                # not processed yet, otherwise continue at once with its value
+                callbacks.append(self._resume_callback)
+                break
+        self.target = event
+        env._active_proc = None
+
+    def __repr__(self) -> str:
+        """
+        String representation of the process.
+
+        Returns
+        -------
+        str
+            String representation of the process.
+        """
+        name = getattr(self._generator, "__name__", type(self._generator).__name__)
+        return f"<Process({name}) object at {id(self):#x}>"
+
+
+class StorePut(Event):
+    """
+    Request to put an item into a ``Store``.
+    """
+
+    __slots__ = ("item",)
+
+    def __init__(self, store: "Store", item: Any) -> None:
+        self.env = store.env
+        self.callbacks = [store._trigger_get]
+        self._value = PENDING
+        self.item = item
+        store._put_queue.append(self)
+        store._trigger_put()
+
+
+class StoreGet(Event):
+    """
+    Request to get an item from a ``Store``.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, store: "Store") -> None:
+        self.env = store.env
+        self.callbacks = [store._trigger_put]
+        self._value = PENDING
+        store._get_queue.append(self)
+        store._trigger_get()
+
+
+class Store:
+    """
+    FIFO store with the semantics and event order of ``simpy.Store``.
+
+    Attributes
+    ----------
+    env : Environment
+        The environment.
+    capacity : float
+        Maximum number of items.
+    items : deque
+        Stored items.
+    """
+
+    def __init__(self, env: "Environment", capacity: float = Infinity) -> None:
+        """
+        Initialize an empty store.
+
+        Parameters
+        ----------
+        env : Environment
+            The environment.
+        capacity : float, optional
+            Maximum number of items, by default unlimited.
+        """
+        if capacity <= 0:
+            raise ValueError('"capacity" must be > 0.')
+        self.env = env
+        self.capacity = capacity
+        self.items: deque = deque()
+        self._put_queue: deque[StorePut] = deque()
+        self._get_queue: deque[StoreGet] = deque()
+
+    def put(self, item: Any) -> StorePut:
+        """
+        Put an item, succeeds once there is room.
+
+        Parameters
+        ----------
+        item : Any
+            The item.
+
+        Returns
+        -------
+        StorePut
+            The request.
+        """
+        return StorePut(self, item)
+
+    def get(self) -> StoreGet:
+        """
+        Get the oldest item, succeeds with it once there is one.
+
+        Returns
+        -------
+        StoreGet
+            The request.
+        """
+        return StoreGet(self)
+
+    def _trigger_put(self, _: Any = None) -> None:
+        # like simpy, only the oldest request is served per trigger
+        if self._put_queue and len(self.items) < self.capacity:
+            event = self._put_queue.popleft()
+            self.items.append(event.item)
+            event.succeed()
+
+    def _trigger_get(self, _: Any = None) -> None:
+        if self._get_queue and self.items:
+            self._get_queue.popleft().succeed(self.items.popleft())
+
+    def __repr__(self) -> str:
+        """
+        String representation of the store.
+
+        Returns
+        -------
+        str
+            String representation of the store.
+        """
+        return f"Store(capacity={self.capacity}, items={len(self.items)})"
+
+
+def entry_callback(entry: tuple) -> Optional[Callable[[Any], None]]:
+    """
+    First function called when a schedule entry is processed, for entries
+    of this kernel and of ``simpy.Environment``. Used by ``Profiler`` to
+    attribute events to components.
+
+    Parameters
+    ----------
+    entry : tuple
+        Head of ``env._queue``: ``(time, priority, eid, event)`` for simpy,
+        ``(time, priority, eid, callback, argument)`` for this kernel.
+
+    Returns
+    -------
+    Optional[Callable[[Any], None]]
+        The first callback of the event, the ``call_later`` callback, or
+        None for an event without callbacks.
+    """
+    if len(entry) == 4:
+        callbacks = entry[3].callbacks
+        return callbacks[0] if callbacks else None
+    callback, arg = entry[3], entry[4]
+    if getattr(callback, "__func__", None) is Environment._process_event:
+        callbacks = arg.callbacks
+        return callbacks[0] if callbacks else None
+    return callback
+
+
+class Environment:
+    """
+    Discrete-event environment with simpy's interface for timeouts,
+    processes and stores.
+
+    Attributes
+    ----------
+    now : float
+        Current simulation time.
+    active_process : Optional[Process]
+        Process being resumed, None between events.
+    """
+
+    def __init__(self, initial_time: float = 0) -> None:
+        """
+        Initialize an empty environment.
+
+        Parameters
+        ----------
+        initial_time : float, optional
+            Start time, by default 0.
+        """
+        self._now = initial_time
+        # (time, priority, eid, callback, argument), events are processed by _fire
+        self._queue: list[tuple[float, int, int, Callable[[Any], None], Any]] = []
+        self._eid = count()
+        self._active_proc: Optional[Process] = None
+        self._fire = self._process_event
+
+    @property
+    def now(self) -> float:
+        """Current simulation time."""
+        return self._now
+
+    @property
+    def active_process(self) -> Optional[Process]:
+        """Process being resumed, None between events."""
+        return self._active_proc
+
+    def schedule(self, event: Any, priority: int = NORMAL, delay: float = 0) -> None:
+        """
+        Schedule a triggered event.
+
+        Parameters
+        ----------
+        event : Any
+            The event, of this kernel or of simpy.
+        priority : int, optional
+            ``URGENT`` (0) or ``NORMAL`` (1), by default ``NORMAL``.
+        delay : float, optional
+            Delay from now, by default 0.
+        """
+        heappush(self._queue, (self._now + delay, priority, next(self._eid), self._fire, event))
+
+    def call_later(
+        self,
+        delay: float,
+        callback: Callable[[Any], None],
+        arg: Any = None,
+        priority: int = NORMAL,
+    ) -> None:
+        """
+        Call a function after a delay, without creating an event.
+
+        The call is ordered like a timeout created at the same moment, so a
+        component using it behaves exactly like one appending ``callback``
+        to ``timeout(delay).callbacks``.
+
+        Parameters
+        ----------
+        delay : float
+            Delay from now.
+        callback : Callable[[Any], None]
+            The function.
+        arg : Any, optional
+            Its argument, by default None.
+        priority : int, optional
+            ``NORMAL`` like a timeout, or ``URGENT`` like the start of a
+            process, by default ``NORMAL``.
+        """
+        heappush(self._queue, (self._now + delay, priority, next(self._eid), callback, arg))
+
+    def _process_event(self, event: Any) -> None:
+        """
+        Call the callbacks of a scheduled event.
+
+        Parameters
+        ----------
+        event : Any
+            The event, of this kernel or of simpy.
+        """
+        callbacks, event.callbacks = event.callbacks, None
+        for callback in callbacks:
+            callback(event)
+        if not event._ok and not hasattr(event, "_defused"):
+            raise event._value
+
+    def peek(self) -> float:
+        """
+        Time of the next event.
+
+        Returns
+        -------
+        float
+            The time, infinity if nothing is scheduled.
+        """
+        return self._queue[0][0] if self._queue else Infinity
+
+    def event(self) -> Event:
+        """
+        Create an untriggered event.
+
+        Returns
+        -------
+        Event
+            The event.
+        """
+        return Event(self)
+
+    def timeout(self, delay: float = 0, value: Any = None) -> Timeout:
+        """
+        Create a timeout.
+
+        Parameters
+        ----------
+        delay : float, optional
+            Delay, by default 0.
+        value : Any, optional
+            Value of the timeout, by default None.
+
+        Returns
+        -------
+        Timeout
+            The scheduled timeout.
+        """
+        return Timeout(self, delay, value)
+
+    def store(self, capacity: float = Infinity) -> Store:
+        """
+        Create a store, used by ``SwitchPort`` instead of ``simpy.Store``.
+
+        Parameters
+        ----------
+        capacity : float, optional
+            Maximum number of items, by default unlimited.
+
+        Returns
+        -------
+        Store
+            The store.
+        """
+        return Store(self, capacity)
+
+    def process(self, generator: Generator) -> Process:
+        """
+        Start a process.
+
+        Parameters
+        ----------
+        generator : Generator
+            Generator yielding events.
+
+        Returns
+        -------
+        Process
+            The process.
+        """
+        return Process(self, generator)
+
+    def step(self) -> None:
+        """
+        Process the next event.
+
+        Raises
+        ------
+        EmptySchedule
+            If nothing is scheduled.
+        """
+        try:
+            self._now, _, _, callback, arg = heappop(self._queue)
+        except IndexError:
+            raise EmptySchedule from None
+        callback(arg)
+
+    def run(self, until: Union[float, Event, None] = None) -> Optional[Any]:
+        """
+        Process events until a time, until an event is processed or until
+        nothing is scheduled.
+
+        Parameters
+        ----------
+        until : Union[float, Event, None], optional
+            Horizon, event or None, by default None. Like in simpy, events at
+            the horizon itself are left for the next run and ``now`` is the
+            horizon afterwards.
+
+        Returns
+        -------
+        Optional[Any]
+            Value of the ``until`` event, else None.
+        """
+        if isinstance(until, Event) or hasattr(until, "callbacks"):
+            while until.callbacks is not None:  # type: ignore
+                if not self._queue:
+                    raise RuntimeError(
+                        f'No scheduled events left but "until" event was not triggered: {until}'
+                    )
+                self.step()
+            return until.value  # type: ignore
+        if until is None:
+            at = Infinity
+        else:
+            at = until if isinstance(until, int) else float(until)
+            if at <= self._now:
+                raise ValueError(f"until ({at}) must be greater than the current simulation time")
+        queue = self._queue
+        # inlined step
+        while queue and queue[0][0] < at:
+            self._now, _, _, callback, arg = heappop(queue)
+            callback(arg)
+        if until is not None:
+            self._now = at
+        return None
+
+    def __repr__(self) -> str:
+        """
+        String representation of the environment.
+
+        Returns
+        -------
+        str
+            String representation of the environment.
+        """
+        return f"Environment(now={self._now}, scheduled={len(self._queue)})"
@@ -0,0 +1,404 @@
+"""
+Vectorized engine for a single ``PacketSource`` feeding a chain of
+``SwitchPort``s that ends in a ``PacketSink``.
+
+FIFO ports follow the Lindley recursion: a packet starts transmission at
+``max(arrival, previous departure)``. Without drops the recursion unrolls to a
+cumulative maximum, so whole blocks of packets are computed with NumPy. Drops
+depend on the bytes waiting at each arrival, so a block ends at its first drop
+and the next one starts right after it. Where drops are dense, the rest of the
+busy period is processed packet by packet instead.
+"""
+
+from collections import deque
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+from .core import BYTES_TO_BITS, PacketLog
+from .variates import Variate, draw_source
+
+MIN_WINDOW = 64
+MAX_WINDOW = 1 << 20
+SCALAR_THRESHOLD = 32  # drops closer than this are handled packet by packet
+
+
+class PortStats:
+    """
+    Counters of a port computed by the vectorized engine, named like the
+    ``SwitchPort`` attributes.
+
+    Attributes
+    ----------
+    port_no : int
+        Position of the port in the chain.
+    capacity : Optional[int]
+        Maximum number of queued bytes.
+    transmission_rate : float
+        Rate at which packets are transmitted.
+    cum_packet_count : int
+        Total number of packets that arrived at the port.
+    cum_byte_count : int
+        Total number of bytes that arrived at the port.
+    cum_drop_count : int
+        Total number of dropped packets.
+    """
+
+    def __init__(
+        self,
+        port_no: int,
+        capacity: Optional[int],
+        transmission_rate: float,
+        cum_packet_count: int,
+        cum_byte_count: int,
+        cum_drop_count: int,
+    ) -> None:
+        self.port_no = port_no
+        self.capacity = capacity
+        self.transmission_rate = transmission_rate
+        self.cum_packet_count = cum_packet_count
+        self.cum_byte_count = cum_byte_count
+        self.cum_drop_count = cum_drop_count
+
+    def __repr__(self) -> str:
+        """
+        String representation of the port statistics.
+
+        Returns
+        -------
+        str
+            String representation of the port statistics.
+        """
+        return (
+            f"PortStats(port_no={self.port_no}, cum_packet_count={self.cum_packet_count}, "
+            f"cum_drop_count={self.cum_drop_count})"
+        )
+
+
+class TandemResult:
+    """
+    Result of a vectorized tandem run.
+
+    Attributes
+    ----------
+    until : float
+        Simulation horizon.
+    packets_sent : int
+        Number of packets generated by the source.
+    ports : list[PortStats]
+        Counters of each port in the chain.
+    sink : PacketLog
+        Packets that reached the sink, in arrival order.
+    """
+
+    def __init__(
+        self, until: float, packets_sent: int, ports: list[PortStats], sink: PacketLog
+    ) -> None:
+        self.until = until
+        self.packets_sent = packets_sent
+        self.ports = ports
+        self.sink = sink
+
+    @property
+    def delays(self) -> np.ndarray:
+        return self.sink.delays
+
+    @property
+    def arrivals(self) -> np.ndarray:
+        return self.sink.arrivals
+
+    @property
+    def interarrivals(self) -> np.ndarray:
+        return self.sink.interarrivals
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the packets received at the sink.
+
+        Returns
+        -------
+        dict[str, float]
+            Delay, jitter and throughput statistics.
+        """
+        return self.sink.summary()
+
+    def __repr__(self) -> str:
+        """
+        String representation of the result.
+
+        Returns
+        -------
+        str
+            String representation of the result.
+        """
+        return f"TandemResult(packets_sent={self.packets_sent}, ports={len(self.ports)}, received={len(self.sink)})"
+
+
+def port_pass(
+    arrivals: np.ndarray,
+    sizes: np.ndarray,
+    transmission_rate: float,
+    capacity: Optional[int],
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Push packets through a FIFO ``SwitchPort``.
+
+    As in ``SwitchPort``, ``capacity`` bounds the bytes waiting in the queue,
+    not counting the packet being transmitted, and a capacity of None or 0
+    means an unlimited queue. A packet whose transmission starts exactly at the
+    arrival time of another one still counts as waiting, like in ``SwitchPort``
+    where its bytes are freed only after the arrivals at that instant.
+
+    Parameters
+    ----------
+    arrivals : np.ndarray
+        Non-decreasing arrival times.
+    sizes : np.ndarray
+        Packet sizes in bytes.
+    transmission_rate : float
+        Rate at which packets are transmitted, in bits per time unit.
+    capacity : Optional[int]
+        Maximum number of queued bytes.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Indices of the accepted packets and their departure times.
+    """
+    n = len(arrivals)
+    service = BYTES_TO_BITS * sizes / transmission_rate
+    if not capacity:
+        return np.arange(n), _departures(arrivals, service, -np.inf)
+
+    accepted = np.empty(n, dtype=np.int64)
+    starts = np.empty(n, dtype=np.float64)
+    departures = np.empty(n, dtype=np.float64)
+    m = 0  # number of accepted packets
+    free_at = -np.inf  # departure time of the last accepted packet
+    window = 1024
+    i = 0
+    while i < n:
+        j = min(n, i + window)
+        a = arrivals[i:j]
+        s = service[i:j]
+        d = _departures(a, s, free_at)
+        st = d - s
+
+        # packets accepted earlier that may still wait when this block starts
+        t = int(np.searchsorted(starts[:m], a[0], side="left"))
+        queued_starts = np.concatenate((starts[t:m], st))
+        queued_sizes = np.concatenate((sizes[accepted[t:m]], sizes[i:j]))
+        cum = np.concatenate(([0], np.cumsum(queued_sizes)))
+        pos = np.arange(m - t, m - t + (j - i))
+        first_waiting = np.minimum(
+            np.searchsorted(queued_starts, a, side="left"), pos
+        )
+        waiting = cum[pos] - cum[first_waiting]
+        over = np.flatnonzero(waiting + sizes[i:j] > capacity)
+
+        k = j - i if len(over) == 0 else int(over[0])
+        accepted[m : m + k] = np.arange(i, i + k)
+        starts[m : m + k] = st[:k]
+        departures[m : m + k] = d[:k]
+        m += k
+        if k:
+            free_at = d[k - 1]
+        if len(over) == 0:
+            i = j
+            window = min(MAX_WINDOW, 2 * window)
+        elif k >= SCALAR_THRESHOLD:
+            i += k + 1  # packet i + k is dropped
+            window = max(MIN_WINDOW, 2 * (k + 1))
+        else:
+            # drops are dense, finish the busy period packet by packet
+            i, m, free_at = _scalar_run(
+                arrivals, sizes, service, capacity, i + k, accepted, starts, departures, m, free_at
+            )
+    return accepted[:m], departures[:m]
+
+
+def _departures(arrivals: np.ndarray, service: np.ndarray, free_at: float) -> np.ndarray:
+    """
+    Unrolled Lindley recursion assuming that no packet is dropped.
+
+    ``d[k] = max(a[k], d[k-1]) + s[k]`` equals
+    ``S[k] + max(free_at, max_{j<=k}(a[j] - S[j-1]))`` with ``S`` the
+    cumulative service time.
+
+    Parameters
+    ----------
+    arrivals : np.ndarray
+        Non-decreasing arrival times.
+    service : np.ndarray
+        Transmission times.
+    free_at : float
+        Time at which the port finishes its current work.
+
+    Returns
+    -------
+    np.ndarray
+        Departure times.
+    """
+    cum = np.cumsum(service)
+    slack = np.maximum.accumulate(arrivals - (cum - service))
+    return cum + np.maximum(slack, free_at)
+
+
+def _scalar_run(
+    arrivals: np.ndarray,
+    sizes: np.ndarray,
+    service: np.ndarray,
+    capacity: int,
+    i: int,
+    accepted: np.ndarray,
+    starts: np.ndarray,
+    departures: np.ndarray,
+    m: int,
+    free_at: float,
+) -> tuple[int, int, float]:
+    """
+    Process packets one by one from ``i`` until the port goes idle after a
+    stretch without drops. Appends to ``accepted``, ``starts`` and
+    ``departures`` in place.
+
+    Returns
+    -------
+    tuple[int, int, float]
+        Next packet index, number of accepted packets and port free time.
+    """
+    t = int(np.searchsorted(starts[:m], arrivals[i], side="left"))
+    queue = deque(zip(starts[t:m].tolist(), sizes[accepted[t:m]].tolist()))
+    queued = sum(size for _, size in queue)
+    n = len(arrivals)
+    k = i
+    last_drop = i
+    chunk = MIN_WINDOW
+    while k < n:
+        # convert in growing slices, a busy period may span the rest of the run
+        j = min(n, k + chunk)
+        chunk *= 2
+        kept: list[int] = []
+        kept_starts: list[float] = []
+        kept_departures: list[float] = []
+        idle = False
+        for k, a, size, s in zip(
+            range(k, j),
+            arrivals[k:j].tolist(),
+            sizes[k:j].tolist(),
+            service[k:j].tolist(),
+        ):
+            if a >= free_at and k - last_drop > 4 * SCALAR_THRESHOLD:
+                idle = True
+                break
+            while queue and queue[0][0] < a:
+                queued -= queue.popleft()[1]
+            if queued + size > capacity:
+                last_drop = k
+                continue
+            start = a if a > free_at else free_at
+            free_at = start + s
+            queue.append((start, size))  # waiting until just after start
+            queued += size
+            kept.append(k)
+            kept_starts.append(start)
+            kept_departures.append(free_at)
+        accepted[m : m + len(kept)] = kept
+        starts[m : m + len(kept)] = kept_starts
+        departures[m : m + len(kept)] = kept_departures
+        m += len(kept)
+        if idle:
+            return k, m, free_at
+        k = j
+    return k, m, free_at
+
+
+def run_tandem(
+    until: float,
+    packet_interval: Variate = 1.0,
+    packet_size: Variate = 10,
+    num_ports: int = 1,
+    port_capacity: Union[Optional[int], Sequence[Optional[int]]] = 10,
+    port_transmission_rate: Union[float, Sequence[float]] = 1,
+    source_id: str = "source",
+    match_simpy: bool = True,
+) -> TandemResult:
+    """
+    Run ``PacketSource`` -> ``num_ports`` x ``SwitchPort`` -> ``PacketSink``
+    with array recursions instead of simpy events.
+
+    The parameters mirror ``PacketSource`` and ``Switch``. With the same seeded
+    generators the result matches ``env.run(until=until)`` on the equivalent
+    simpy topology, with ``SwitchPort`` or ``FastSwitchPort``, up to
+    floating-point rounding of departure times. Ties between an arrival and
+    the start of a transmission follow ``port_pass``.
+
+    Parameters
+    ----------
+    until : float
+        Simulation horizon.
+    packet_interval : Variate, optional
+        Interval between packets, by default 1.0.
+    packet_size : Variate, optional
+        Size of the packets, by default 10.
+    num_ports : int, optional
+        Number of ports in the chain, by default 1.
+    port_capacity : Union[Optional[int], Sequence[Optional[int]]], optional
+        Capacity of every port, or one per port, by default 10.
+    port_transmission_rate : Union[float, Sequence[float]], optional
+        Transmission rate of every port, or one per port, by default 1.
+    source_id : str, optional
+        Source identifier recorded in the sink log, by default "source".
+    match_simpy : bool, optional
+        Keep the draw order of ``PacketSource`` when interval and size share
+        a generator, see ``draw_source``. By default True.
+
+    Returns
+    -------
+    TandemResult
+        Port counters and the sink log.
+    """
+    capacities = (
+        list(port_capacity)
+        if isinstance(port_capacity, Sequence)
+        else [port_capacity] * num_ports
+    )
+    rates = (
+        list(port_transmission_rate)
+        if isinstance(port_transmission_rate, Sequence)
+        else [port_transmission_rate] * num_ports
+    )
+    if len(capacities) != num_ports or len(rates) != num_ports:
+        raise ValueError("Expected one capacity and transmission rate per port.")
+
+    creation_times, sizes = draw_source(
+        packet_interval, packet_size, until, match_simpy=match_simpy
+    )
+    index = np.arange(len(creation_times))
+    arrivals = creation_times
+    ports: list[PortStats] = []
+    for port_no, (capacity, rate) in enumerate(zip(capacities, rates)):
+        port_sizes = sizes[index]
+        kept, departures = port_pass(arrivals, port_sizes, rate, capacity)
+        ports.append(
+            PortStats(
+                port_no,
+                capacity,
+                rate,
+                cum_packet_count=len(arrivals),
+                cum_byte_count=int(port_sizes.sum()),
+                cum_drop_count=len(arrivals) - len(kept),
+            )
+        )
+        delivered = departures < until
+        index = index[kept[delivered]]
+        arrivals = departures[delivered]
+
+    sink = PacketLog(chunk_size=max(len(index), 1))
+    sink.extend(
+        index,
+        sizes[index],
+        sink.source_index(source_id),
+        creation_times[index],
+        arrivals,
+    )
+    return TandemResult(until, len(creation_times), ports, sink)
@@ -0,0 +1,716 @@
+"""
+Conservative parallel simulation of a routed ``Network`` across partitions.
+
+The graph nodes are split into partitions, and every partition runs in its
+own process with its own ``simpy.Environment``. A packet leaving a partition
+over a boundary link is announced to the coordinator as soon as its
+transmission starts, timestamped with its departure time, and delivered to
+the neighbouring partition at exactly that time::
+
+    parts = partition_nodes(graph, 4)
+    sources = [SourceSpec((0, 0), (49, 49), packet_interval=Distribution("exponential", 1, scale=2))]
+    result = run_partitioned(graph, parts, sources, until=1000)
+    result.sinks[(49, 49)]
+
+Synchronization uses windows bounded by the lookahead of the boundary
+links, ``8 * min_packet_size / rate``: a transmission starting at ``t`` ends
+no earlier than ``t + lookahead``. Each window ends ``lookahead`` after the
+earliest pending event of all partitions, so every partition runs it without
+waiting for messages, and idle stretches are skipped. The smallest packet
+size is derived from the sources: constant sizes and the lower bound of
+uniform, integer and triangular ``Distribution``s give long windows, other
+variates only guarantee one byte. The run then needs a window per byte
+time and is usually slower than ``run_sequential``.
+
+Every source must draw from its own generator, e.g. a ``Distribution``
+seeded per source, and ports behave like ``FastSwitchPort``. With that the
+result is identical to ``run_sequential`` on the same specs, up to the
+order of events at exactly the same time. An exception in a partition is
+sent back with its traceback and re-raised by ``run_partitioned``, after all
+workers are terminated.
+"""
+
+import copy
+import inspect
+import multiprocessing
+import traceback
+from heapq import heappop, heappush
+from time import perf_counter
+from typing import Any, Hashable, Optional
+
+import networkx as nx
+import simpy
+
+from .core import BYTES_TO_BITS, FastSwitchPort, Packet, PacketProto, PacketSource
+from .topology import Network
+from .variates import Distribution, Variate
+
+LOWER_BOUNDS = {"uniform": "low", "integers": "low", "triangular": "left"}
+
+
+class _Schedule:
+    """
+    The simpy internals the partitioned run relies on, kept in one place.
+
+    ``schedule_at`` pushes a callback at an absolute time:
+    ``env.schedule(event, delay=time - now)`` could round ``now + (time -
+    now)`` to a different float than the announced time, which would break
+    the identity with ``run_sequential``. ``discard_spent_stops`` removes
+    the stop event simpy 4 re-queues at the horizon after ``run(until)``,
+    with priority -1 and no callbacks, so that it does not end the next
+    window early.
+
+    Attributes
+    ----------
+    env : simpy.Environment
+        The simulation environment.
+    """
+
+    def __init__(self, env: simpy.Environment) -> None:
+        self.env = env
+
+    def schedule_at(self, time: float, callback: Any) -> None:
+        """
+        Call ``callback(event)`` at exactly ``time``, ordered like a timeout.
+
+        Parameters
+        ----------
+        time : float
+            Absolute simulation time, not before now.
+        callback : Any
+            The callback.
+        """
+        env = self.env
+        event = simpy.Event(env)
+        event._ok = True  # type: ignore
+        event._value = None  # type: ignore
+        event.callbacks.append(callback)  # type: ignore
+        heappush(env._queue, (time, simpy.core.NORMAL, next(env._eid), event))  # type: ignore
+
+    def discard_spent_stops(self) -> None:
+        """
+        Drop spent stop events from the head of the schedule.
+        """
+        queue = self.env._queue  # type: ignore
+        while queue and queue[0][1] < 0 and not queue[0][3].callbacks:
+            heappop(queue)
+
+    def __repr__(self) -> str:
+        """
+        String representation of the schedule helper.
+
+        Returns
+        -------
+        str
+            String representation of the schedule helper.
+        """
+        return f"_Schedule(env={self.env})"
+
+
+class _RemoteTraceback(Exception):
+    """Traceback of a failed worker, the cause of the re-raised exception."""
+
+    def __init__(self, tb: str) -> None:
+        self.tb = tb
+
+    def __str__(self) -> str:
+        return self.tb
+
+
+class _Failure:
+    """
+    Exception of a worker with its formatted traceback.
+
+    Attributes
+    ----------
+    error : BaseException
+        The exception, or a ``RuntimeError`` with its repr if it does not
+        pickle.
+    tb : str
+        The formatted traceback.
+    """
+
+    def __init__(self, error: BaseException, tb: str) -> None:
+        self.error = error
+        self.tb = tb
+
+    def __repr__(self) -> str:
+        """
+        String representation of the failure.
+
+        Returns
+        -------
+        str
+            String representation of the failure.
+        """
+        return f"_Failure(error={self.error!r})"
+
+
+def _receive(conn: Any) -> Any:
+    """
+    Receive a message from a worker, re-raising its exception.
+
+    Parameters
+    ----------
+    conn : Any
+        The coordinator's end of the pipe.
+
+    Returns
+    -------
+    Any
+        The message.
+
+    Raises
+    ------
+    BaseException
+        The worker's exception, caused by its ``_RemoteTraceback``.
+    """
+    message = conn.recv()
+    if isinstance(message, _Failure):
+        raise message.error from _RemoteTraceback(message.tb)
+    return message
+
+
+class SourceSpec:
+    """
+    A source of a partitioned network, see ``Network.add_source``.
+
+    Attributes
+    ----------
+    node : Hashable
+        Node the packets enter the network at.
+    dst : Hashable
+        Destination node.
+    source_id : Optional[str]
+        Identifier, by default "<node>-><dst>".
+    kwargs : dict[str, Any]
+        Further ``PacketSource`` parameters. Variates must be picklable and
+        must not share generators with other sources.
+    """
+
+    def __init__(
+        self, node: Hashable, dst: Hashable, source_id: Optional[str] = None, **kwargs: Any
+    ) -> None:
+        self.node = node
+        self.dst = dst
+        self.source_id = source_id
+        self.kwargs = kwargs
+
+    def add_to(self, network: Network) -> None:
+        """
+        Add the source to a network.
+
+        Parameters
+        ----------
+        network : Network
+            The network.
+        """
+        network.add_source(self.node, self.dst, self.source_id, **self.kwargs)
+
+    def __repr__(self) -> str:
+        """
+        String representation of the source spec.
+
+        Returns
+        -------
+        str
+            String representation of the source spec.
+        """
+        return f"SourceSpec(node={self.node}, dst={self.dst})"
+
+
+class RemoteRouter:
+    """
+    Stand-in for the router of a node in another partition. Collects the
+    packets announced by ``BoundaryPort``s.
+
+    Attributes
+    ----------
+    node : Hashable
+        The remote node.
+    outbox : list[tuple]
+        Announced packets as ``(time, node, id, size, creation_time, source,
+        dscp, dst)``.
+    """
+
+    def __init__(self, node: Hashable, outbox: list[tuple]) -> None:
+        self.node = node
+        self.outbox = outbox
+
+    def announce(self, time: float, packet: PacketProto) -> None:
+        """
+        Send a packet arriving at ``time``.
+
+        Parameters
+        ----------
+        time : float
+            Arrival time at the remote router.
+        packet : PacketProto
+            The packet.
+        """
+        self.outbox.append(
+            (
+                time,
+                self.node,
+                packet.id,
+                packet.size,
+                packet.creation_time,
+                packet.source,
+                packet.dscp,
+                packet.dst,
+            )
+        )
+
+    def process_packet(self, packet: PacketProto) -> Optional[simpy.Event]:
+        # already announced when its transmission started
+        if packet.pool is not None:
+            packet.pool.release(packet)
+        return None
+
+    def __repr__(self) -> str:
+        """
+        String representation of the remote router.
+
+        Returns
+        -------
+        str
+            String representation of the remote router.
+        """
+        return f"RemoteRouter(node={self.node})"
+
+
+class BoundaryPort(FastSwitchPort):
+    """
+    ``FastSwitchPort`` on a link to another partition. Packets are announced
+    to the remote router when their transmission starts.
+    """
+
+    def _transmit(self, packet: PacketProto) -> None:
+        super()._transmit(packet)
+        # the same expression simpy uses for the departure timeout
+        self.destination.announce(  # type: ignore
+            self.env.now + BYTES_TO_BITS * packet.size / self.transmission_rate, packet
+        )
+
+
+class PartitionNetwork(Network):
+    """
+    The part of a ``Network`` that belongs to one partition. Ports towards
+    nodes of other partitions are ``BoundaryPort``s.
+
+    Attributes
+    ----------
+    parts : dict[Hashable, int]
+        Partition of every node.
+    part : int
+        This partition.
+    outbox : list[tuple]
+        Packets announced to other partitions since the last exchange.
+    """
+
+    def __init__(
+        self,
+        env: simpy.Environment,
+        graph: nx.Graph,
+        parts: dict[Hashable, int],
+        part: int,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(env, graph, port_class=FastSwitchPort, **kwargs)
+        self.parts = parts
+        self.part = part
+        self.outbox: list[tuple] = []
+        self.schedule = _Schedule(env)
+
+    def create_port(self, u: Hashable, v: Hashable) -> Any:
+        if self.parts[v] == self.part:
+            return super().create_port(u, v)
+        data = self.graph.edges[u, v]
+        port = BoundaryPort(
+            self.env,
+            port_no=len(self.router(u).ports),
+            capacity=data.get(self.capacity_attr, self.default_capacity),
+            transmission_rate=data.get(self.rate_attr, self.default_rate),
+        )
+        port.destination = RemoteRouter(v, self.outbox)  # type: ignore
+        return port
+
+    def deliver(self, message: tuple) -> None:
+        """
+        Schedule the arrival of a packet announced by another partition.
+
+        Parameters
+        ----------
+        message : tuple
+            Message from ``RemoteRouter.announce``.
+        """
+        time, node, packet_id, size, creation_time, source, dscp, dst = message
+        packet = Packet(self.env, size, source)
+        packet.id = packet_id
+        packet.creation_time = creation_time
+        packet.dscp = dscp
+        packet.dst = dst
+        router = self.router(node)
+        self.schedule.schedule_at(time, lambda _: router.process_packet(packet))
+
+
+class ParallelResult:
+    """
+    Summaries of a partitioned or sequential run.
+
+    Attributes
+    ----------
+    sinks : dict[Hashable, dict[str, float]]
+        Summary of every sink by node.
+    ports : dict[tuple[Hashable, Hashable], dict[str, float]]
+        Summary of every port by ``(node, neighbour)``.
+    sent : dict[str, int]
+        Packets sent by every source.
+    windows : int
+        Synchronization windows, 0 for a sequential run.
+    messages : int
+        Packets exchanged between partitions.
+    wall_time : float
+        Wall time of the run, in seconds.
+    """
+
+    def __init__(
+        self,
+        sinks: dict[Hashable, dict[str, float]],
+        ports: dict[tuple[Hashable, Hashable], dict[str, float]],
+        sent: dict[str, int],
+        windows: int = 0,
+        messages: int = 0,
+        wall_time: float = 0.0,
+    ) -> None:
+        self.sinks = sinks
+        self.ports = ports
+        self.sent = sent
+        self.windows = windows
+        self.messages = messages
+        self.wall_time = wall_time
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the run like ``Network.summary``.
+
+        Returns
+        -------
+        dict[str, float]
+            Numbers of ports and sinks, packets sent, delivered and dropped,
+            windows and messages.
+        """
+        return {
+            "ports": len(self.ports),
+            "sinks": len(self.sinks),
+            "sent": sum(self.sent.values()),
+            "delivered": sum(s["packets"] for s in self.sinks.values()),
+            "drops": sum(p["drops"] for p in self.ports.values()),
+            "windows": self.windows,
+            "messages": self.messages,
+        }
+
+    def __repr__(self) -> str:
+        """
+        String representation of the parallel result.
+
+        Returns
+        -------
+        str
+            String representation of the parallel result.
+        """
+        return f"ParallelResult(sinks={len(self.sinks)}, ports={len(self.ports)}, windows={self.windows})"
+
+
+def _collect(network: Network) -> tuple[dict, dict, dict]:
+    return (
+        {node: sink.summary() for node, sink in network.sinks.items()},
+        {link: port.summary() for link, port in network.ports.items()},
+        {source.source_id: source.packets_sent for source in network.sources},
+    )
+
+
+def partition_nodes(graph: nx.Graph, parts: int) -> dict[Hashable, int]:
+    """
+    Split the nodes into contiguous partitions of nearly equal size, in
+    breadth-first order, which keeps few links between partitions on
+    grid-like graphs.
+
+    Parameters
+    ----------
+    graph : nx.Graph
+        The network graph.
+    parts : int
+        Number of partitions.
+
+    Returns
+    -------
+    dict[Hashable, int]
+        Partition of every node.
+    """
+    order: list[Hashable] = []
+    seen: set[Hashable] = set()
+    undirected = graph.to_undirected(as_view=True) if graph.is_directed() else graph
+    for start in graph.nodes:
+        if start not in seen:
+            component = list(nx.bfs_tree(undirected, start))
+            seen.update(component)
+            order.extend(component)
+    size = -(-len(order) // parts)
+    return {node: i // size for i, node in enumerate(order)}
+
+
+def size_bound(packet_size: Variate) -> int:
+    """
+    Smallest size a ``PacketSource`` can generate with a size variate.
+
+    Parameters
+    ----------
+    packet_size : Variate
+        Constant or variate of the source.
+
+    Returns
+    -------
+    int
+        The bound in bytes: the constant itself, the truncated lower bound of
+        a bounded ``Distribution``, else 1 (drawn sizes are at least 1).
+    """
+    if isinstance(packet_size, (int, float)):
+        return int(packet_size)
+    if isinstance(packet_size, Distribution) and packet_size.name in LOWER_BOUNDS:
+        low = packet_size.params.get(LOWER_BOUNDS[packet_size.name])
+        if isinstance(low, (int, float)):
+            return max(int(low), 1)
+    return 1
+
+
+def smallest_packet_size(sources: list[SourceSpec]) -> int:
+    """
+    Smallest packet size any of the sources can generate.
+
+    Parameters
+    ----------
+    sources : list[SourceSpec]
+        The sources.
+
+    Returns
+    -------
+    int
+        Minimum of ``size_bound`` over the sources, 1 without sources.
+    """
+    default = inspect.signature(PacketSource).parameters["packet_size"].default
+    bounds = [size_bound(spec.kwargs.get("packet_size", default)) for spec in sources]
+    return min(bounds) if bounds else 1
+
+
+def lookahead(
+    graph: nx.Graph,
+    parts: dict[Hashable, int],
+    min_packet_size: int = 1,
+    rate_attr: str = "rate",
+    default_rate: float = 1,
+) -> float:
+    """
+    Shortest transmission time over the links between partitions.
+
+    Parameters
+    ----------
+    graph : nx.Graph
+        The network graph.
+    parts : dict[Hashable, int]
+        Partition of every node.
+    min_packet_size : int, optional
+        Smallest packet size in bytes, by default 1.
+    rate_attr : str, optional
+        Edge attribute with the transmission rate, by default "rate".
+    default_rate : float, optional
+        Rate of edges without the attribute, by default 1.
+
+    Returns
+    -------
+    float
+        The lookahead, infinite if no link crosses partitions.
+    """
+    rates = [
+        data.get(rate_attr, default_rate)
+        for u, v, data in graph.edges(data=True)
+        if parts[u] != parts[v]
+    ]
+    return BYTES_TO_BITS * min_packet_size / max(rates) if rates else float("inf")
+
+
+def _worker(
+    conn: Any,
+    graph: nx.Graph,
+    parts: dict[Hashable, int],
+    part: int,
+    sources: list[SourceSpec],
+    network_kwargs: dict[str, Any],
+) -> None:
+    """
+    Run one partition, window by window, as instructed by the coordinator.
+    An exception is sent back as a ``_Failure``.
+    """
+    try:
+        env = simpy.Environment()
+        network = PartitionNetwork(env, graph, parts, part, **network_kwargs)
+        for spec in sources:
+            if parts[spec.node] == part:
+                spec.add_to(network)
+        conn.send(env.peek())
+        while True:
+            end, inbox = conn.recv()
+            if end is None:
+                conn.send(_collect(network))
+                break
+            for message in inbox:
+                network.deliver(message)
+            env.run(until=end)
+            network.schedule.discard_spent_stops()
+            conn.send((network.outbox, env.peek()))
+            network.outbox.clear()
+    except EOFError:
+        pass  # the coordinator gave up
+    except Exception as error:
+        tb = traceback.format_exc()
+        try:
+            conn.send(_Failure(error, tb))
+        except Exception:
+            conn.send(_Failure(RuntimeError(repr(error)), tb))
+    finally:
+        conn.close()
+
+
+def run_partitioned(
+    graph: nx.Graph,
+    parts: dict[Hashable, int],
+    sources: list[SourceSpec],
+    until: float,
+    min_packet_size: Optional[int] = None,
+    **network_kwargs: Any,
+) -> ParallelResult:
+    """
+    Run a network with one process per partition.
+
+    Parameters
+    ----------
+    graph : nx.Graph
+        The network graph.
+    parts : dict[Hashable, int]
+        Partition of every node, e.g. from ``partition_nodes``.
+    sources : list[SourceSpec]
+        The sources.
+    until : float
+        Simulation horizon.
+    min_packet_size : Optional[int], optional
+        Smallest packet size in bytes, sets the lookahead, by default
+        derived from the sources with ``smallest_packet_size``. Larger values
+        give fewer windows but must hold for every packet.
+    **network_kwargs : Any
+        Further ``Network`` parameters except ``port_class``.
+
+    Returns
+    -------
+    ParallelResult
+        Summaries of all sinks and ports.
+
+    Raises
+    ------
+    Exception
+        The first exception of a partition, with the worker's traceback as
+        its cause.
+    """
+    start = perf_counter()
+    if min_packet_size is None:
+        min_packet_size = smallest_packet_size(sources)
+    window = lookahead(
+        graph,
+        parts,
+        min_packet_size,
+        network_kwargs.get("rate_attr", "rate"),
+        network_kwargs.get("default_rate", 1),
+    )
+    if window <= 0:
+        raise ValueError("Zero lookahead, packets of size 0 cannot be partitioned.")
+    n = max(parts.values()) + 1
+    pipes, workers = [], []
+    for part in range(n):
+        parent, child = multiprocessing.Pipe()
+        worker = multiprocessing.Process(
+            target=_worker, args=(child, graph, parts, part, sources, network_kwargs)
+        )
+        worker.start()
+        child.close()  # a crashed worker then shows up as EOFError
+        pipes.append(parent)
+        workers.append(worker)
+    try:
+        peeks = [_receive(conn) for conn in pipes]
+        inboxes: list[list[tuple]] = [[] for _ in range(n)]
+        windows = messages = 0
+        now = 0.0
+        while now < until:
+            earliest = min(peeks + [m[0] for inbox in inboxes for m in inbox])
+            now = min(until, max(earliest + window, now))
+            if now == float("inf"):
+                break
+            for conn, inbox in zip(pipes, inboxes):
+                conn.send((now, inbox))
+            inboxes = [[] for _ in range(n)]
+            for i, conn in enumerate(pipes):
+                outbox, peeks[i] = _receive(conn)
+                messages += len(outbox)
+                for message in outbox:
+                    inboxes[parts[message[1]]].append(message)
+            windows += 1
+        sinks: dict = {}
+        ports: dict = {}
+        sent: dict = {}
+        for conn in pipes:
+            conn.send((None, None))
+            s, p, src = _receive(conn)
+            sinks.update(s)
+            ports.update(p)
+            sent.update(src)
+    except BaseException:
+        # the other workers would wait for their next window forever
+        for conn in pipes:
+            conn.close()
+        for worker in workers:
+            worker.terminate()
+        raise
+    finally:
+        for worker in workers:
+            worker.join()
+    return ParallelResult(sinks, ports, sent, windows, messages, perf_counter() - start)
+
+
+def run_sequential(
+    graph: nx.Graph, sources: list[SourceSpec], until: float, **network_kwargs: Any
+) -> ParallelResult:
+    """
+    Run the same specs in a single environment, for comparison.
+
+    Parameters
+    ----------
+    graph : nx.Graph
+        The network graph.
+    sources : list[SourceSpec]
+        The sources.
+    until : float
+        Simulation horizon.
+    **network_kwargs : Any
+        Further ``Network`` parameters except ``port_class``.
+
+    Returns
+    -------
+    ParallelResult
+        Summaries of all sinks and ports.
+    """
+    start = perf_counter()
+    env = simpy.Environment()
+    network = Network(env, graph, port_class=FastSwitchPort, **network_kwargs)
+    # like the workers, draw from copies and leave the specs' generators untouched
+    for spec in copy.deepcopy(sources):
+        spec.add_to(network)
+    env.run(until=until)
+    return ParallelResult(*_collect(network), wall_time=perf_counter() - start)
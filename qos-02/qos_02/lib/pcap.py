@@ -0,0 +1,441 @@
+"""
+Trace-driven packet sources replaying pcap and pcapng captures.
+
+Captures are read incrementally in fixed-size chunks with ``struct``, so
+memory does not grow with the length of the capture and hours of traffic
+can be pushed through the simulated ports::
+
+    source = TraceSource(
+        env, "voip", port, "../../support/armstrong.pcap", rtp=True, loops=None
+    )
+    env.run(until=3600)
+
+A ``TraceSource`` is a ``PacketSource`` whose intervals and sizes come from
+the capture: the gaps between frame timestamps, multiplied by
+``time_scale``, and the frame lengths on the wire. Frames can be filtered
+by UDP port and to RTP. Ethernet (with VLAN tags), Linux cooked, raw IP and
+BSD loopback link types are understood by the filters.
+"""
+
+import math
+import os
+import struct
+from typing import Any, BinaryIO, Iterator, Optional, Union
+
+import simpy
+
+from .core import DestinationProto, PacketSource
+
+CHUNK_SIZE = 1 << 20  # bytes read at once
+
+PCAP_MAGIC = {  # magic number -> (byte order, timestamp fraction unit)
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+PCAPNG_MAGIC = b"\x0a\x0d\x0d\x0a"
+
+# link types
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+UDP = 17
+RTCP_TYPES = range(72, 77)  # RTCP packet types 200-204 seen as RTP payload types
+
+
+class _ChunkReader:
+    """
+    Reads exact byte counts from a file through a buffer of chunks.
+    """
+
+    def __init__(self, file: BinaryIO, chunk_size: int) -> None:
+        self.file = file
+        self.chunk_size = chunk_size
+        self._buffer = b""
+        self._pos = 0
+
+    def read(self, n: int) -> bytes:
+        """
+        Read ``n`` bytes, fewer only at the end of the file.
+        """
+        end = self._pos + n
+        if end > len(self._buffer):
+            rest = self._buffer[self._pos :]
+            self._buffer = rest + self.file.read(max(self.chunk_size, n - len(rest)))
+            self._pos = 0
+            end = n
+        data = self._buffer[self._pos : end]
+        self._pos = end
+        return data
+
+
+def _pcap_frames(
+    reader: _ChunkReader, header: bytes
+) -> Iterator[tuple[float, int, int, bytes]]:
+    """
+    Frames of a classic pcap file after its 4-byte magic number.
+    """
+    order, unit = PCAP_MAGIC[header]
+    rest = reader.read(20)
+    if len(rest) < 20:
+        raise ValueError("Truncated pcap file header.")
+    linktype = struct.unpack(order + "I", rest[16:20])[0] & 0x0FFFFFFF
+    record = struct.Struct(order + "IIII")
+    while True:
+        head = reader.read(16)
+        if len(head) < 16:
+            return
+        seconds, fraction, captured, length = record.unpack(head)
+        data = reader.read(captured)
+        if len(data) < captured:
+            return  # truncated last record
+        yield seconds + fraction * unit, length, linktype, data
+
+
+def _options(body: bytes, order: str) -> Iterator[tuple[int, bytes]]:
+    """
+    Options of a pcapng block as (code, value).
+    """
+    pos = 0
+    while pos + 4 <= len(body):
+        code, length = struct.unpack_from(order + "HH", body, pos)
+        if code == 0:
+            return
+        yield code, body[pos + 4 : pos + 4 + length]
+        pos += 4 + (length + 3) // 4 * 4
+
+
+def _pcapng_frames(reader: _ChunkReader) -> Iterator[tuple[float, int, int, bytes]]:
+    """
+    Frames of the enhanced and obsolete packet blocks of a pcapng file.
+    """
+    order = "<"
+    interfaces: list[tuple[int, float]] = []  # (link type, timestamp unit)
+    block_type = PCAPNG_MAGIC
+    while True:
+        if block_type == PCAPNG_MAGIC:
+            # section header, its byte order magic fixes the byte order
+            head = reader.read(8)
+            if len(head) < 8:
+                return
+            order = "<" if head[4:8] == b"\x4d\x3c\x2b\x1a" else ">"
+            total = struct.unpack(order + "I", head[:4])[0]
+            reader.read(total - 12)
+            interfaces = []
+        else:
+            head = reader.read(4)
+            if len(head) < 4:
+                return
+            total = struct.unpack(order + "I", head)[0]
+            body = reader.read(total - 12)
+            reader.read(4)  # trailing length
+            if len(body) < total - 12:
+                return
+            kind = struct.unpack(order + "I", block_type)[0]
+            if kind == 1:  # interface description
+                linktype = struct.unpack_from(order + "H", body)[0]
+                unit = 1e-6
+                for code, value in _options(body[8:], order):
+                    if code == 9 and value:  # if_tsresol
+                        unit = 2.0 ** -(value[0] & 0x7F) if value[0] & 0x80 else 10.0 ** -value[0]
+                interfaces.append((linktype, unit))
+            elif kind == 6:  # enhanced packet
+                interface, high, low, captured, length = struct.unpack_from(order + "IIIII", body)
+                linktype, unit = interfaces[interface]
+                yield ((high << 32) | low) * unit, length, linktype, body[20 : 20 + captured]
+            elif kind == 2:  # obsolete packet
+                interface, _, high, low, captured, length = struct.unpack_from(
+                    order + "HHIIII", body
+                )
+                linktype, unit = interfaces[interface]
+                yield ((high << 32) | low) * unit, length, linktype, body[20 : 20 + captured]
+            # simple packet blocks have no timestamp, other blocks carry no frames
+        block_type = reader.read(4)
+        if len(block_type) < 4:
+            return
+
+
+def iter_frames(
+    path: Union[str, os.PathLike], chunk_size: int = CHUNK_SIZE
+) -> Iterator[tuple[float, int, int, bytes]]:
+    """
+    Stream the frames of a pcap or pcapng file.
+
+    Parameters
+    ----------
+    path : Union[str, os.PathLike]
+        Capture file, the format is detected from its magic number.
+    chunk_size : int, optional
+        Bytes read at once, by default 1 MiB.
+
+    Yields
+    ------
+    tuple[float, int, int, bytes]
+        Timestamp in seconds, length on the wire, link type and the
+        captured bytes.
+
+    Raises
+    ------
+    ValueError
+        If the file is neither pcap nor pcapng.
+    """
+    with open(path, "rb") as file:
+        reader = _ChunkReader(file, chunk_size)
+        magic = reader.read(4)
+        if magic in PCAP_MAGIC:
+            yield from _pcap_frames(reader, magic)
+        elif magic == PCAPNG_MAGIC:
+            yield from _pcapng_frames(reader)
+        else:
+            raise ValueError(f"{os.fspath(path)} is not a pcap or pcapng file.")
+
+
+def udp_payload(data: bytes, linktype: int) -> Optional[tuple[int, int, int]]:
+    """
+    Locate the UDP header of a frame.
+
+    Parameters
+    ----------
+    data : bytes
+        Captured bytes.
+    linktype : int
+        Link type of the capture.
+
+    Returns
+    -------
+    Optional[tuple[int, int, int]]
+        Source port, destination port and the offset of the UDP payload, or
+        None if the frame is not an unfragmented UDP datagram over IP.
+    """
+    if linktype == LINKTYPE_ETHERNET:
+        offset, ethertype = 14, data[12:14]
+        while ethertype in (b"\x81\x00", b"\x88\xa8"):  # VLAN tags
+            ethertype = data[offset + 2 : offset + 4]
+            offset += 4
+        version = {b"\x08\x00": 4, b"\x86\xdd": 6}.get(ethertype)
+    elif linktype == LINKTYPE_LINUX_SLL:
+        offset = 16
+        version = {b"\x08\x00": 4, b"\x86\xdd": 6}.get(data[14:16])
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        offset = 20
+        version = {b"\x08\x00": 4, b"\x86\xdd": 6}.get(data[0:2])
+    elif linktype == LINKTYPE_NULL:
+        offset = 4
+        version = data[4] >> 4 if len(data) > 4 else None
+    elif linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6, 12, 14):
+        offset = 0
+        version = data[0] >> 4 if data else None
+    else:
+        return None
+
+    if version == 4:
+        if len(data) < offset + 20 or data[offset + 9] != UDP:
+            return None
+        if struct.unpack_from("!H", data, offset + 6)[0] & 0x3FFF:
+            return None  # fragment
+        offset += (data[offset] & 0x0F) * 4
+    elif version == 6:
+        if len(data) < offset + 40 or data[offset + 6] != UDP:
+            return None  # extension headers are not followed
+        offset += 40
+    else:
+        return None
+    if len(data) < offset + 8:
+        return None
+    src, dst = struct.unpack_from("!HH", data, offset)
+    return src, dst, offset + 8
+
+
+def is_rtp(data: bytes, offset: int) -> bool:
+    """
+    Heuristic RTP check of a UDP payload: version 2, a full header and a
+    payload type outside the RTCP range.
+
+    Parameters
+    ----------
+    data : bytes
+        Captured bytes.
+    offset : int
+        Offset of the UDP payload.
+
+    Returns
+    -------
+    bool
+        Whether the payload looks like RTP.
+    """
+    if len(data) < offset + 12 or data[offset] >> 6 != 2:
+        return False
+    if data[offset + 1] & 0x7F in RTCP_TYPES:
+        return False
+    return len(data) >= offset + 12 + 4 * (data[offset] & 0x0F)  # CSRC list
+
+
+def read_trace(
+    path: Union[str, os.PathLike],
+    udp_port: Optional[int] = None,
+    rtp: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[tuple[float, int]]:
+    """
+    Stream the timestamps and wire lengths of the frames of a capture.
+
+    Parameters
+    ----------
+    path : Union[str, os.PathLike]
+        Capture file.
+    udp_port : Optional[int], optional
+        Keep only UDP datagrams from or to this port, by default all frames.
+    rtp : bool, optional
+        Keep only UDP datagrams that look like RTP, by default False.
+    chunk_size : int, optional
+        Bytes read at once, by default 1 MiB.
+
+    Yields
+    ------
+    tuple[float, int]
+        Timestamp in seconds and length on the wire in bytes.
+    """
+    filtered = udp_port is not None or rtp
+    for timestamp, length, linktype, data in iter_frames(path, chunk_size):
+        if filtered:
+            udp = udp_payload(data, linktype)
+            if udp is None:
+                continue
+            src, dst, offset = udp
+            if udp_port is not None and udp_port not in (src, dst):
+                continue
+            if rtp and not is_rtp(data, offset):
+                continue
+        yield timestamp, length
+
+
+class TraceSource(PacketSource):
+    """
+    Packet source replaying the frames of a capture.
+
+    Packets are sent at the capture's timestamps relative to its first
+    frame, multiplied by ``time_scale``, with the frame lengths on the wire
+    as sizes. The capture is streamed, so memory is constant for any
+    length and number of loops. ``packet_interval`` and ``packet_size`` are
+    not used.
+
+    Attributes
+    ----------
+    path : str
+        Capture file.
+    udp_port : Optional[int]
+        UDP port filter, None for all frames.
+    rtp : bool
+        Whether only RTP datagrams are replayed.
+    time_scale : float
+        Simulation time units per second of capture.
+    loops : Optional[int]
+        Number of passes over the capture, None to repeat forever.
+    passes : int
+        Passes started so far.
+    """
+
+    def __init__(
+        self,
+        env: simpy.Environment,
+        source_id: str,
+        destination: Union[DestinationProto, None],
+        path: Union[str, os.PathLike],
+        udp_port: Optional[int] = None,
+        rtp: bool = False,
+        time_scale: float = 1.0,
+        loops: Optional[int] = 1,
+        chunk_size: int = CHUNK_SIZE,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Initialize a trace source and start it.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            The simulation environment.
+        source_id : str
+            Identifier for this packet source.
+        destination : Union[DestinationProto, None]
+            The switch or sink to which the packets are sent.
+        path : Union[str, os.PathLike]
+            Capture file, pcap or pcapng.
+        udp_port : Optional[int], optional
+            Replay only UDP datagrams from or to this port, by default all
+            frames.
+        rtp : bool, optional
+            Replay only datagrams that look like RTP, by default False.
+        time_scale : float, optional
+            Simulation time units per second of capture, by default 1.0.
+            Below 1 the trace is replayed faster.
+        loops : Optional[int], optional
+            Number of passes over the capture, by default 1. None repeats
+            forever; consecutive passes are one mean interval apart.
+        chunk_size : int, optional
+            Bytes read at once, by default 1 MiB.
+        **kwargs : Any
+            Other arguments of ``PacketSource``, e.g. ``pool``, ``dscp`` or
+            ``dst``.
+        """
+        if time_scale <= 0:
+            raise ValueError("time_scale must be positive.")
+        self.path = os.fspath(path)
+        self.udp_port = udp_port
+        self.rtp = rtp
+        self.time_scale = time_scale
+        self.loops = loops
+        self.chunk_size = chunk_size
+        self.passes: int = 0
+        with open(self.path, "rb") as file:  # fail early on a missing file
+            if file.read(4) not in (*PCAP_MAGIC, PCAPNG_MAGIC):
+                raise ValueError(f"{self.path} is not a pcap or pcapng file.")
+        super().__init__(env, source_id, destination, math.nan, math.nan, **kwargs)
+
+    def start(self) -> simpy.Process:
+        """
+        Replay the capture ``loops`` times.
+
+        Returns
+        -------
+        simpy.Process
+            The replay process.
+        """
+        gap = 0.0  # before the first frame of a pass
+        while self.loops is None or self.passes < self.loops:
+            self.passes += 1
+            first = previous = math.nan
+            frames = 0
+            for timestamp, length in read_trace(
+                self.path, self.udp_port, self.rtp, self.chunk_size
+            ):
+                if frames:
+                    gap = (timestamp - previous) * self.time_scale
+                    if gap < 0:
+                        gap = 0.0  # out-of-order timestamps
+                else:
+                    first = timestamp
+                yield self.env.timeout(gap)  # type: ignore
+                self._send(length or 1)
+                previous = timestamp
+                frames += 1
+            if not frames:
+                return  # nothing matches the filters
+            gap = (previous - first) * self.time_scale / max(frames - 1, 1)
+
+    def __repr__(self) -> str:
+        """
+        String representation of the trace source.
+
+        Returns
+        -------
+        str
+            String representation of the trace source.
+        """
+        return f"TraceSource(source_id={self.source_id}, path={self.path}, passes={self.passes})"
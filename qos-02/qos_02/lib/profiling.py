@@ -0,0 +1,457 @@
+"""
+Opt-in profiling of a simulation run.
+
+``Profiler.run`` replaces ``env.run``: it steps the environment event by
+event, attributes every event to the component method whose callback
+processes it, and measures the wall time spent there. Events scheduled while
+processing are counted for the same component. Variates wrapped with
+``instrument_variates`` additionally report the time spent drawing values::
+
+    profiler = Profiler(env)
+    profiler.instrument_variates(source)
+    report = profiler.run(until=1000)
+    print(report)
+
+Both ``simpy.Environment`` and ``kernel.Environment`` can be profiled; on
+the kernel, ``call_later`` callbacks are attributed like event callbacks.
+Profiling slows the run down, compare reports with each other rather than
+with uninstrumented wall times.
+"""
+
+import resource
+import sys
+from time import perf_counter
+from typing import Any, Callable, Optional
+
+import numpy as np
+import simpy
+
+from .kernel import Process, entry_callback
+from .variates import bulk_sampler
+
+
+def component_label(component: Any) -> str:
+    """
+    Short name of a component for reports.
+
+    Parameters
+    ----------
+    component : Any
+        Source, port, sink, tap or any other object.
+
+    Returns
+    -------
+    str
+        Class name and identifier, e.g. "PacketSource[source01]".
+    """
+    for attr in ("source_id", "sink_id", "port_no", "id"):
+        ident = getattr(component, attr, None)
+        if ident is not None and not callable(ident):
+            return f"{type(component).__name__}[{ident}]"
+    port = getattr(component, "port", None)  # taps
+    if port is not None:
+        return f"{type(component).__name__}[{component_label(port)}]"
+    return type(component).__name__
+
+
+class TimedVariate:
+    """
+    Variate wrapper measuring the time spent drawing values.
+
+    Bulk draws stay bulk draws: if the wrapped variate can be drawn in
+    blocks, so can the wrapper.
+
+    Attributes
+    ----------
+    variate : Callable[[], float]
+        The wrapped variate.
+    label : str
+        Name in reports.
+    calls : int
+        Number of calls or bulk draws.
+    values : int
+        Number of values drawn.
+    elapsed : float
+        Wall time spent drawing, in seconds.
+    """
+
+    def __init__(self, variate: Callable[[], float], label: str) -> None:
+        """
+        Wrap a variate.
+
+        Parameters
+        ----------
+        variate : Callable[[], float]
+            Callable returning a single value.
+        label : str
+            Name in reports.
+        """
+        self.variate = variate
+        self.label = label
+        self.calls: int = 0
+        self.values: int = 0
+        self.elapsed: float = 0.0
+        self._bulk = bulk_sampler(variate)
+        if self._bulk is None:
+            # not drawable in blocks, hide ``sample`` from ``bulk_sampler``
+            self.sample = None  # type: ignore
+
+    def __call__(self) -> float:
+        t = perf_counter()
+        value = self.variate()
+        self.elapsed += perf_counter() - t
+        self.calls += 1
+        self.values += 1
+        return value
+
+    def sample(self, n: int) -> np.ndarray:
+        """
+        Draw ``n`` values in bulk.
+
+        Parameters
+        ----------
+        n : int
+            Number of values.
+
+        Returns
+        -------
+        np.ndarray
+            Drawn values.
+        """
+        t = perf_counter()
+        values = self._bulk(n)  # type: ignore
+        self.elapsed += perf_counter() - t
+        self.calls += 1
+        self.values += n
+        return values
+
+    def __repr__(self) -> str:
+        """
+        String representation of the timed variate.
+
+        Returns
+        -------
+        str
+            String representation of the timed variate.
+        """
+        return f"TimedVariate(label={self.label}, values={self.values}, elapsed={self.elapsed:.4f})"
+
+
+class ComponentProfile:
+    """
+    Event counts and wall time of one component method.
+
+    Attributes
+    ----------
+    label : str
+        Component and method, e.g. "SwitchPort[0].transmit".
+    processed : int
+        Number of events processed.
+    scheduled : int
+        Number of events scheduled while processing them.
+    elapsed : float
+        Wall time spent processing, in seconds.
+    """
+
+    __slots__ = ("label", "processed", "scheduled", "elapsed")
+
+    def __init__(self, label: str) -> None:
+        self.label = label
+        self.processed: int = 0
+        self.scheduled: int = 0
+        self.elapsed: float = 0.0
+
+    def __repr__(self) -> str:
+        """
+        String representation of the component profile.
+
+        Returns
+        -------
+        str
+            String representation of the component profile.
+        """
+        return f"ComponentProfile(label={self.label}, processed={self.processed}, elapsed={self.elapsed:.4f})"
+
+
+class ProfileReport:
+    """
+    Result of a profiled run.
+
+    Attributes
+    ----------
+    sim_time : float
+        Simulated time covered by the run.
+    wall_time : float
+        Wall time of the run, in seconds.
+    events : int
+        Number of processed events.
+    peak_queue : int
+        Largest number of scheduled events.
+    max_rss : int
+        Memory high-water mark of the process, in bytes.
+    components : list[ComponentProfile]
+        Per component method, by decreasing wall time.
+    variates : list[TimedVariate]
+        Instrumented variates, by decreasing wall time.
+    """
+
+    def __init__(
+        self,
+        sim_time: float,
+        wall_time: float,
+        events: int,
+        peak_queue: int,
+        max_rss: int,
+        components: list[ComponentProfile],
+        variates: list[TimedVariate],
+    ) -> None:
+        self.sim_time = sim_time
+        self.wall_time = wall_time
+        self.events = events
+        self.peak_queue = peak_queue
+        self.max_rss = max_rss
+        self.components = sorted(components, key=lambda c: -c.elapsed)
+        self.variates = sorted(variates, key=lambda v: -v.elapsed)
+
+    @property
+    def sim_wall_ratio(self) -> float:
+        """Simulated time units per wall-clock second."""
+        return self.sim_time / self.wall_time if self.wall_time > 0 else float("inf")
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.wall_time if self.wall_time > 0 else float("inf")
+
+    def by_function(self) -> dict[str, ComponentProfile]:
+        """
+        Profiles summed over the instances of each component class.
+
+        Returns
+        -------
+        dict[str, ComponentProfile]
+            Profiles by class and method, e.g. "SwitchPort.transmit".
+        """
+        result: dict[str, ComponentProfile] = {}
+        for c in self.components:
+            name, _, method = c.label.rpartition(".")
+            key = f"{name.split('[')[0]}.{method}"
+            total = result.setdefault(key, ComponentProfile(key))
+            total.processed += c.processed
+            total.scheduled += c.scheduled
+            total.elapsed += c.elapsed
+        return dict(sorted(result.items(), key=lambda kv: -kv[1].elapsed))
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the run.
+
+        Returns
+        -------
+        dict[str, float]
+            Wall and simulated time, their ratio, event rate, peak event
+            queue length and memory high-water mark.
+        """
+        return {
+            "sim_time": self.sim_time,
+            "wall_time": self.wall_time,
+            "sim_wall_ratio": self.sim_wall_ratio,
+            "events": self.events,
+            "events_per_second": self.events_per_second,
+            "peak_queue": self.peak_queue,
+            "max_rss": self.max_rss,
+        }
+
+    def __str__(self) -> str:
+        def share(elapsed: float) -> str:
+            return f"{elapsed / self.wall_time if self.wall_time > 0 else 0.0:>7.1%}"
+
+        lines = [
+            f"simulated {self.sim_time:g} in {self.wall_time:.3f} s "
+            f"(ratio {self.sim_wall_ratio:.4g}), {self.events} events "
+            f"({self.events_per_second:,.0f}/s), peak queue {self.peak_queue}, "
+            f"max RSS {self.max_rss / 2**20:.1f} MiB",
+        ]
+        header = f"{'events':>10}{'scheduled':>11}{'time [s]':>10}{'share':>7}"
+        for title, profiles in [
+            ("function", list(self.by_function().values())),
+            ("component (top 20)", self.components[:20]),
+        ]:
+            lines.append(f"\n{title:<48}{header}")
+            for c in profiles:
+                lines.append(
+                    f"{c.label:<48}{c.processed:>10}{c.scheduled:>11}{c.elapsed:>10.3f}{share(c.elapsed)}"
+                )
+        if self.variates:
+            lines.append(f"\n{'variate':<48}{'values':>10}{'calls':>11}{'time [s]':>10}{'share':>7}")
+            for v in self.variates:
+                lines.append(
+                    f"{v.label:<48}{v.values:>10}{v.calls:>11}{v.elapsed:>10.3f}{share(v.elapsed)}"
+                )
+        return "\n".join(lines)
+
+    def __repr__(self) -> str:
+        """
+        String representation of the profile report.
+
+        Returns
+        -------
+        str
+            String representation of the profile report.
+        """
+        return f"ProfileReport(events={self.events}, wall_time={self.wall_time:.3f}, sim_wall_ratio={self.sim_wall_ratio:.4g})"
+
+
+class Profiler:
+    """
+    Runs an environment event by event and attributes events and wall time
+    to components.
+
+    Attributes
+    ----------
+    env : simpy.Environment
+        The simulation environment.
+    profiles : dict[str, ComponentProfile]
+        Profiles by label, accumulated over ``run`` calls.
+    variates : list[TimedVariate]
+        Variates wrapped by ``instrument_variates``.
+    """
+
+    def __init__(self, env: simpy.Environment) -> None:
+        """
+        Initialize a profiler for an environment.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            The simulation environment, a ``simpy.Environment`` or a
+            ``kernel.Environment``.
+        """
+        self.env = env
+        self.profiles: dict[str, ComponentProfile] = {}
+        self.variates: list[TimedVariate] = []
+        self._labels: dict[tuple[int, str], str] = {}
+        self._current: Optional[ComponentProfile] = None
+
+    def instrument_variates(self, *sources: Any) -> None:
+        """
+        Wrap the callable ``packet_interval`` and ``packet_size`` of sources
+        in ``TimedVariate``s. Call before the run starts.
+
+        Parameters
+        ----------
+        *sources : Any
+            Packet sources.
+        """
+        for source in sources:
+            for attr in ("packet_interval", "packet_size"):
+                variate = getattr(source, attr)
+                if callable(variate) and not isinstance(variate, TimedVariate):
+                    timed = TimedVariate(variate, f"{component_label(source)}.{attr}")
+                    setattr(source, attr, timed)
+                    self.variates.append(timed)
+
+    def owner(self, callback: Callable) -> str:
+        """
+        Label of the component method behind an event callback.
+
+        Process resumptions are attributed to the method running in the
+        process generator, other callbacks to their bound method.
+
+        Parameters
+        ----------
+        callback : Callable
+            First callback of an event.
+
+        Returns
+        -------
+        str
+            The label, e.g. "FastSwitchPort[0]._transmitted".
+        """
+        obj = getattr(callback, "__self__", None)
+        if isinstance(obj, (simpy.Process, Process)):
+            generator = obj._generator
+            frame = generator.gi_frame
+            component = frame.f_locals.get("self") if frame is not None else None
+            method = generator.__name__
+        elif obj is not None:
+            component = obj
+            method = callback.__name__
+        else:
+            return getattr(callback, "__qualname__", repr(callback))
+        key = (id(component), method)
+        label = self._labels.get(key)
+        if label is None:
+            label = f"{component_label(component)}.{method}"
+            self._labels[key] = label
+        return label
+
+    def _profile(self, label: str) -> ComponentProfile:
+        profile = self.profiles.get(label)
+        if profile is None:
+            profile = self.profiles[label] = ComponentProfile(label)
+        return profile
+
+    def run(self, until: float) -> ProfileReport:
+        """
+        Run the environment until ``until``, like ``env.run(until=until)``.
+
+        Parameters
+        ----------
+        until : float
+            Simulation horizon.
+
+        Returns
+        -------
+        ProfileReport
+            Profiles of this and earlier runs, timings of this run.
+        """
+        env = self.env
+        queue = env._queue  # type: ignore
+        step = env.step
+        start_time = env.now
+        events = 0
+        peak = len(queue)
+        wall = perf_counter()
+        try:
+            while queue and queue[0][0] < until:
+                size = len(queue)
+                if size > peak:
+                    peak = size
+                callback = entry_callback(queue[0])
+                label = self.owner(callback) if callback is not None else "simpy.<no callbacks>"
+                profile = self._current = self._profile(label)
+                t = perf_counter()
+                step()
+                profile.elapsed += perf_counter() - t
+                profile.processed += 1
+                # a step pops one entry, the rest of the growth was scheduled by it,
+                # including kernel.Environment.call_later calls
+                profile.scheduled += len(queue) - size + 1
+                events += 1
+        finally:
+            self._current = None
+        wall = perf_counter() - wall
+        if until > env.now:
+            env.run(until=until)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        max_rss = rss if sys.platform == "darwin" else rss * 1024
+        return ProfileReport(
+            env.now - start_time,
+            wall,
+            events,
+            peak,
+            max_rss,
+            list(self.profiles.values()),
+            self.variates,
+        )
+
+    def __repr__(self) -> str:
+        """
+        String representation of the profiler.
+
+        Returns
+        -------
+        str
+            String representation of the profiler.
+        """
+        return f"Profiler(components={len(self.profiles)}, variates={len(self.variates)})"
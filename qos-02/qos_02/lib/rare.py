@@ -0,0 +1,403 @@
+"""
+Rare-event estimation of tail-drop probabilities by importance sampling.
+
+Drop probabilities of 1e-6 to 1e-9 are out of reach of plain simulation.
+``estimate_loss`` simulates a Poisson source through a chain of FIFO ports
+(the semantics of ``SwitchPort`` and ``lindley.port_pass``) in regeneration
+cycles: a cycle starts with a packet arriving at an empty chain and ends when
+the next packet finds it empty again. The loss probability is the ratio of
+the mean drops and the mean arrivals per cycle::
+
+    estimate = estimate_loss(source, [port], cycles=20000, seed=1)
+    estimate.loss_rate, estimate.ci
+
+Drops are estimated under an exponentially tilted measure: interarrival
+times are shortened and transmission times of the bottleneck port stretched
+until the queue is unstable, with the tilt ``theta`` solving the Lundberg
+equation ``E[exp(theta (S - A))] = 1`` for the service time ``S`` and the
+interarrival time ``A``. For M/M/1 this swaps the arrival and service rates.
+Every draw multiplies the likelihood ratio; at the first drop of a cycle the
+tilt is switched off and the ratio frozen, so the weighted drop count is an
+unbiased estimate of the drops per cycle. The mean number of arrivals per
+cycle is not rare and is estimated from untilted cycles.
+
+The tilt is applied to the slowest port that can drop. With constant sizes a
+port behind a port at most as fast never builds a queue, so it only counts
+if the size exceeds its capacity. A cycle longer than ``max_cycle_packets``
+raises instead of running forever, e.g. if the tilted arrivals overload an
+upstream port with unlimited capacity.
+
+Only exponential intervals and constant or exponential sizes are supported,
+like in ``analytic``.
+"""
+
+import math
+from collections import deque
+from time import perf_counter
+from typing import Any, Optional, Sequence, Union
+
+import numpy as np
+
+from .analytic import exponential_scale
+from .core import BYTES_TO_BITS
+from .stats import t_quantile
+
+BLOCK = 4096  # standard exponentials drawn at once
+
+
+class LossEstimate:
+    """
+    Estimated loss probability.
+
+    Attributes
+    ----------
+    loss_rate : float
+        Fraction of generated packets dropped at any port.
+    half_width : float
+        Half-width of the confidence interval.
+    confidence : float
+        Confidence level.
+    cycles : int
+        Number of tilted cycles.
+    hits : int
+        Tilted cycles with at least one drop.
+    mean_cycle_packets : float
+        Estimated packets per cycle.
+    theta : float
+        Tilt, 0 for plain simulation.
+    packets : int
+        Packets simulated in total.
+    wall_time : float
+        Wall time of the estimation, in seconds.
+    """
+
+    def __init__(
+        self,
+        loss_rate: float,
+        half_width: float,
+        confidence: float,
+        cycles: int,
+        hits: int,
+        mean_cycle_packets: float,
+        theta: float,
+        packets: int,
+        wall_time: float,
+    ) -> None:
+        self.loss_rate = loss_rate
+        self.half_width = half_width
+        self.confidence = confidence
+        self.cycles = cycles
+        self.hits = hits
+        self.mean_cycle_packets = mean_cycle_packets
+        self.theta = theta
+        self.packets = packets
+        self.wall_time = wall_time
+
+    @property
+    def ci(self) -> tuple[float, float]:
+        """Lower and upper bound of the confidence interval."""
+        return self.loss_rate - self.half_width, self.loss_rate + self.half_width
+
+    @property
+    def relative_error(self) -> float:
+        """Half-width relative to the estimate."""
+        return self.half_width / self.loss_rate if self.loss_rate > 0 else math.inf
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the estimate.
+
+        Returns
+        -------
+        dict[str, float]
+            Loss rate, half-width, relative error, cycles, hits, packets
+            and wall time.
+        """
+        return {
+            "loss_rate": self.loss_rate,
+            "half_width": self.half_width,
+            "relative_error": self.relative_error,
+            "cycles": self.cycles,
+            "hits": self.hits,
+            "packets": self.packets,
+            "wall_time": self.wall_time,
+        }
+
+    def __repr__(self) -> str:
+        """
+        String representation of the loss estimate.
+
+        Returns
+        -------
+        str
+            String representation of the loss estimate.
+        """
+        return (
+            f"LossEstimate(loss_rate={self.loss_rate:.4g}, half_width={self.half_width:.3g}, "
+            f"hits={self.hits}/{self.cycles})"
+        )
+
+
+def lundberg_tilt(arrival_rate: float, service: float, exponential: bool) -> float:
+    """
+    Root ``theta > 0`` of ``E[exp(theta (S - A))] = 1`` for exponential
+    interarrival times ``A``.
+
+    Parameters
+    ----------
+    arrival_rate : float
+        Poisson arrival rate.
+    service : float
+        Mean service time if ``exponential``, else the constant service time.
+    exponential : bool
+        Whether service times are exponential.
+
+    Returns
+    -------
+    float
+        The tilt.
+
+    Raises
+    ------
+    ValueError
+        If the load is 1 or more.
+    """
+    if arrival_rate * service >= 1:
+        raise ValueError("The load must be below 1.")
+    if exponential:
+        return 1 / service - arrival_rate
+    # lambda exp(theta D) = lambda + theta, bisection above the root at 0
+    hi = 1.0 / service
+    while arrival_rate * math.exp(hi * service) < arrival_rate + hi:
+        hi *= 2
+    lo = 1e-12 * hi
+    for _ in range(200):
+        mid = (lo + hi) / 2
+        if arrival_rate * math.exp(mid * service) < arrival_rate + mid:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+class _Exponentials:
+    """Standard exponentials drawn in blocks."""
+
+    def __init__(self, rng: np.random.Generator) -> None:
+        self.rng = rng
+        self._values: list[float] = []
+        self._index = 0
+
+    def __call__(self) -> float:
+        if self._index == len(self._values):
+            self._values = self.rng.standard_exponential(BLOCK).tolist()
+            self._index = 0
+        value = self._values[self._index]
+        self._index += 1
+        return value
+
+
+def _cycle(
+    draw: _Exponentials,
+    arrival_rate: float,
+    size: Optional[int],
+    size_scale: float,
+    capacities: list[float],
+    rates: list[float],
+    theta: float,
+    bottleneck: int,
+    max_packets: int,
+) -> tuple[int, int, float]:
+    """
+    Simulate one regeneration cycle, tilted until the first drop.
+
+    Returns
+    -------
+    tuple[int, int, float]
+        Packets generated, packets dropped and the likelihood ratio frozen at
+        the first drop (1 without tilt, 0 if nothing was dropped).
+
+    Raises
+    ------
+    RuntimeError
+        If the cycle exceeds ``max_packets`` packets.
+    """
+    ports = len(capacities)
+    free_at = [0.0] * ports
+    queues: list[deque] = [deque() for _ in range(ports)]
+    queued = [0] * ports
+    # tilted rates and per-draw log-likelihood constants
+    tilted = theta > 0
+    a_rate = arrival_rate + theta
+    a_log = math.log(arrival_rate / a_rate)
+    bits_per_time = BYTES_TO_BITS / rates[bottleneck]
+    if size is None:
+        mu = 1 / (size_scale * bits_per_time)  # service rate at the bottleneck
+        s_rate = mu - theta
+        s_log = math.log(mu / s_rate) if tilted else 0.0
+    log_lr = 0.0
+    t = 0.0
+    packets = drops = 0
+    while True:
+        packets += 1
+        if packets > max_packets:
+            raise RuntimeError(
+                f"No regeneration after {max_packets} packets, the chain does not empty "
+                f"(theta={theta:.4g}). Use a smaller theta or a larger max_cycle_packets."
+            )
+        if size is None:
+            x = draw() / s_rate if tilted else draw() * size_scale * bits_per_time
+            # x is the bottleneck service time of the continuous size
+            if tilted:
+                log_lr += s_log - theta * x
+            packet_size = int(x / bits_per_time) or 1
+        else:
+            packet_size = size
+        a = t  # arrival at the current port
+        dropped = False
+        for k in range(ports):
+            queue = queues[k]
+            while queue and queue[0][0] < a:
+                queued[k] -= queue.popleft()[1]
+            if queued[k] + packet_size > capacities[k]:
+                dropped = True
+                break
+            start = a if a > free_at[k] else free_at[k]
+            queue.append((start, packet_size))  # waiting until just after start
+            queued[k] += packet_size
+            free_at[k] = a = start + BYTES_TO_BITS * packet_size / rates[k]
+        if dropped:
+            drops += 1
+            if tilted:
+                tilted = False
+                lr = math.exp(log_lr)
+        if tilted:
+            interval = draw() / a_rate
+            log_lr += a_log + theta * interval
+        else:
+            interval = draw() / arrival_rate
+        t += interval
+        if all(f <= t for f in free_at):
+            if theta > 0:
+                return packets, drops, lr if drops else 0.0
+            return packets, drops, 1.0
+
+
+def estimate_loss(
+    source: Any,
+    ports: Union[Any, Sequence[Any]],
+    cycles: int = 10000,
+    mean_cycles: Optional[int] = None,
+    seed: Union[int, np.random.Generator, None] = None,
+    theta: Optional[float] = None,
+    confidence: float = 0.95,
+    max_cycle_packets: int = 1_000_000,
+) -> LossEstimate:
+    """
+    Estimate the probability that a packet is dropped in a chain of ports.
+
+    Parameters
+    ----------
+    source : Any
+        ``PacketSource`` with exponential intervals and constant or
+        exponential sizes. Its variates are not consumed.
+    ports : Union[Any, Sequence[Any]]
+        Port or chain of ports the source feeds, with ``capacity`` and
+        ``transmission_rate``.
+    cycles : int, optional
+        Number of tilted cycles, by default 10000.
+    mean_cycles : Optional[int], optional
+        Number of untilted cycles estimating the packets per cycle,
+        by default ``cycles``.
+    seed : Union[int, np.random.Generator, None], optional
+        Seed or generator, by default None (fresh entropy).
+    theta : Optional[float], optional
+        Tilt, by default the Lundberg root of the bottleneck port, i.e. the
+        port with the lowest rate among those that can drop. 0 gives plain
+        regenerative simulation.
+    confidence : float, optional
+        Confidence level, by default 0.95.
+    max_cycle_packets : int, optional
+        Packets after which a cycle is given up, by default 1000000.
+
+    Returns
+    -------
+    LossEstimate
+        Estimate and confidence interval.
+
+    Raises
+    ------
+    ValueError
+        If the source is not supported or no port can drop.
+    RuntimeError
+        If a cycle exceeds ``max_cycle_packets`` packets.
+    """
+    ports = list(ports) if isinstance(ports, Sequence) else [ports]
+    interval_scale = exponential_scale(source.packet_interval)
+    if interval_scale is None:
+        raise ValueError("Packet intervals must be exponential.")
+    packet_size = source.packet_size
+    size: Optional[int] = None
+    size_scale = 0.0
+    if isinstance(packet_size, (int, float)):
+        size = int(packet_size)
+    else:
+        scale = exponential_scale(packet_size)
+        if scale is None:
+            raise ValueError("Packet sizes must be constant or exponential.")
+        size_scale = scale
+    capacities = [p.capacity or math.inf for p in ports]
+    rates = [p.transmission_rate for p in ports]
+    droppable = [
+        k
+        for k, capacity in enumerate(capacities)
+        if not math.isinf(capacity)
+        and (size is None or size > capacity or k == 0 or rates[k] < min(rates[:k]))
+    ]
+    if not droppable:
+        raise ValueError("No port can drop a packet.")
+    bottleneck = min(droppable, key=lambda k: rates[k])
+    arrival_rate = 1 / interval_scale
+    if theta is None:
+        mean_size = size if size is not None else size_scale
+        theta = lundberg_tilt(
+            arrival_rate, BYTES_TO_BITS * mean_size / rates[bottleneck], size is None
+        )
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    draw = _Exponentials(rng)
+    args = (arrival_rate, size, size_scale, capacities, rates)
+
+    start = perf_counter()
+    total_packets = 0
+    weighted = np.empty(cycles)
+    hits = 0
+    for i in range(cycles):
+        packets, drops, lr = _cycle(draw, *args, theta, bottleneck, max_cycle_packets)
+        total_packets += packets
+        weighted[i] = drops * lr
+        hits += drops > 0
+    counts = np.empty(mean_cycles or cycles)
+    for i in range(len(counts)):
+        packets, _, _ = _cycle(draw, *args, 0.0, bottleneck, max_cycle_packets)
+        total_packets += packets
+        counts[i] = packets
+
+    # ratio of independent means, delta method
+    mean_drops = float(weighted.mean())
+    mean_packets = float(counts.mean())
+    loss = mean_drops / mean_packets
+    var = weighted.var(ddof=1) / cycles / mean_drops**2 if mean_drops > 0 else math.nan
+    var += counts.var(ddof=1) / len(counts) / mean_packets**2
+    z = t_quantile(max(min(cycles, len(counts)) - 1, 1), 0.5 + confidence / 2)
+    half_width = z * loss * math.sqrt(var) if mean_drops > 0 else math.nan
+    return LossEstimate(
+        loss,
+        half_width,
+        confidence,
+        cycles,
+        hits,
+        mean_packets,
+        theta,
+        total_packets,
+        perf_counter() - start,
+    )
@@ -0,0 +1,235 @@
+"""
+Independent replications of a simulation scenario, run in parallel.
+
+A scenario is described by a builder function ``build(env, rng)`` that
+creates the components in ``env``, draws all randomness from ``rng`` and
+returns the components to report on by name::
+
+    def build(env, rng):
+        sink = PacketSink(env, "sink", retention="columnar", keep_packets=False)
+        switch = Switch(env, "switch01", 1, 10000, 1000, port_class=FastSwitchPort)
+        source = PacketSource(
+            env, "source01", switch.ports[0],
+            partial(rng.exponential, 2), partial(rng.exponential, 100),
+        )
+        switch.ports[0].destination = sink
+        return {"sink": sink, "port": switch.ports[0]}
+
+    result = run_replications(build, until=8000, replications=30, seed=1)
+
+Each replication returns only the ``summary()`` of its components, so no
+packet lists cross the process boundary. The builder must be picklable, i.e.
+defined at module level.
+"""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Iterator, Optional, Union
+
+import numpy as np
+import simpy
+
+from .stats import mean_ci
+
+Builder = Callable[[simpy.Environment, np.random.Generator], dict[str, Any]]
+Summary = dict[str, dict[str, float]]
+
+
+def run_replica(
+    build: Builder, until: float, seed: np.random.SeedSequence
+) -> Summary:
+    """
+    Run a single replication.
+
+    Parameters
+    ----------
+    build : Builder
+        Scenario builder.
+    until : float
+        Simulation horizon.
+    seed : np.random.SeedSequence
+        Seed of the replication's generator.
+
+    Returns
+    -------
+    Summary
+        ``summary()`` of every component returned by the builder.
+    """
+    env = simpy.Environment()
+    components = build(env, np.random.default_rng(seed))
+    env.run(until=until)
+    return {name: component.summary() for name, component in components.items()}
+
+
+def iter_replications(
+    build: Builder,
+    until: float,
+    replications: int = 30,
+    seed: Union[int, np.random.SeedSequence, None] = None,
+    max_workers: Optional[int] = None,
+) -> Iterator[tuple[int, Summary]]:
+    """
+    Run replications and yield their summaries as they finish.
+
+    Every replication gets its own generator, spawned from one
+    ``SeedSequence``, so the streams are independent and the whole set is
+    reproducible from ``seed``.
+
+    Parameters
+    ----------
+    build : Builder
+        Scenario builder.
+    until : float
+        Simulation horizon.
+    replications : int, optional
+        Number of replications, by default 30.
+    seed : Union[int, np.random.SeedSequence, None], optional
+        Root seed, by default None (fresh entropy).
+    max_workers : Optional[int], optional
+        Number of worker processes, by default one per CPU. With 1 the
+        replications run in this process.
+
+    Yields
+    ------
+    tuple[int, Summary]
+        Replication index and its summary, in completion order.
+    """
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    seeds = root.spawn(replications)
+    if max_workers == 1:
+        for i, s in enumerate(seeds):
+            yield i, run_replica(build, until, s)
+        return
+
+    workers = min(max_workers or os.cpu_count() or 1, replications)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_replica, build, until, s): i for i, s in enumerate(seeds)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def aggregate(
+    summaries: list[Summary], confidence: float = 0.95
+) -> dict[str, dict[str, dict[str, float]]]:
+    """
+    Mean and confidence interval of every metric over replications.
+
+    Parameters
+    ----------
+    summaries : list[Summary]
+        One summary per replication.
+    confidence : float, optional
+        Confidence level, by default 0.95.
+
+    Returns
+    -------
+    dict[str, dict[str, dict[str, float]]]
+        For every component and metric the ``mean``, the CI ``half_width``,
+        the sample ``std`` and the number ``n`` of replications reporting it.
+    """
+    result: dict[str, dict[str, dict[str, float]]] = {}
+    for name in summaries[0] if summaries else []:
+        metrics: dict[str, list[float]] = {}
+        for summary in summaries:
+            for metric, value in summary.get(name, {}).items():
+                metrics.setdefault(metric, []).append(value)
+        result[name] = {}
+        for metric, values in metrics.items():
+            mean, half_width = mean_ci(values, confidence)
+            result[name][metric] = {
+                "mean": mean,
+                "half_width": half_width,
+                "std": float(np.std(values, ddof=1)) if len(values) > 1 else math.nan,
+                "n": len(values),
+            }
+    return result
+
+
+class ReplicationResult:
+    """
+    Summaries of a set of replications and their aggregate.
+
+    Attributes
+    ----------
+    summaries : list[Summary]
+        Summary of every replication, in replication order.
+    confidence : float
+        Confidence level of the intervals.
+    metrics : dict[str, dict[str, dict[str, float]]]
+        Aggregate, see ``aggregate``.
+    """
+
+    def __init__(self, summaries: list[Summary], confidence: float = 0.95) -> None:
+        self.summaries = summaries
+        self.confidence = confidence
+        self.metrics = aggregate(summaries, confidence)
+
+    def ci(self, component: str, metric: str) -> tuple[float, float]:
+        """
+        Confidence interval of a metric.
+
+        Parameters
+        ----------
+        component : str
+            Component name as returned by the builder.
+        metric : str
+            Metric name from the component's ``summary()``.
+
+        Returns
+        -------
+        tuple[float, float]
+            Lower and upper bound.
+        """
+        m = self.metrics[component][metric]
+        return m["mean"] - m["half_width"], m["mean"] + m["half_width"]
+
+    def __repr__(self) -> str:
+        """
+        String representation of the replication result.
+
+        Returns
+        -------
+        str
+            String representation of the replication result.
+        """
+        return f"ReplicationResult(replications={len(self.summaries)}, components={list(self.metrics)})"
+
+
+def run_replications(
+    build: Builder,
+    until: float,
+    replications: int = 30,
+    seed: Union[int, np.random.SeedSequence, None] = None,
+    max_workers: Optional[int] = None,
+    confidence: float = 0.95,
+) -> ReplicationResult:
+    """
+    Run replications in parallel and aggregate their summaries.
+
+    Parameters
+    ----------
+    build : Builder
+        Scenario builder.
+    until : float
+        Simulation horizon.
+    replications : int, optional
+        Number of replications, by default 30.
+    seed : Union[int, np.random.SeedSequence, None], optional
+        Root seed, by default None (fresh entropy).
+    max_workers : Optional[int], optional
+        Number of worker processes, by default one per CPU.
+    confidence : float, optional
+        Confidence level, by default 0.95.
+
+    Returns
+    -------
+    ReplicationResult
+        Per-replication summaries and their aggregate.
+    """
+    summaries: list[Optional[Summary]] = [None] * replications
+    for i, summary in iter_replications(build, until, replications, seed, max_workers):
+        summaries[i] = summary
+    return ReplicationResult(summaries, confidence)  # type: ignore
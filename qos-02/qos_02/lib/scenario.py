@@ -0,0 +1,450 @@
+"""
+Deterministically hashed scenario descriptions and an on-disk result store.
+
+A ``Scenario`` names a builder function (see ``replicate``), the horizon, the
+seed, the number of replications and the builder's keyword parameters. Its
+``key`` is a SHA-256 of a canonical JSON form, so the same scenario hashes the
+same in every process and session. ``ResultStore`` keeps results under that
+key as compressed ``.npz`` arrays with a JSON sidecar and evicts the least
+recently used entries once a size limit is exceeded::
+
+    store = ResultStore("~/.cache/qos02", max_bytes=500_000_000)
+    for capacity in [1000, 2000, 5000]:
+        scenario = Scenario(build, until=8000, seed=1, replications=30,
+                            port_capacity=capacity)
+        result = scenario.run(store)  # only new points are simulated
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+from functools import lru_cache, partial
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+import numpy as np
+
+from .replicate import ReplicationResult, run_replications
+from .variates import Distribution
+
+
+def canonical(value: Any) -> Any:
+    """
+    Convert a parameter value to a JSON-serializable canonical form.
+
+    Parameters
+    ----------
+    value : Any
+        Number, string, bool, None, sequence, mapping, NumPy scalar or array,
+        or ``Distribution``.
+
+    Returns
+    -------
+    Any
+        Canonical form.
+
+    Raises
+    ------
+    TypeError
+        For values without a stable description, such as lambdas or
+        ``partial(rng.exponential, 2)``. Use a ``Distribution`` instead.
+    """
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return {"float": value.hex()}
+    if isinstance(value, np.generic):
+        return canonical(value.item())
+    if isinstance(value, np.ndarray):
+        return {"array": canonical(value.tolist()), "dtype": str(value.dtype)}
+    if isinstance(value, (list, tuple)):
+        return [canonical(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): canonical(v) for k, v in sorted(value.items())}
+    if isinstance(value, Distribution):
+        # the generator is not part of the description, builders rebind
+        # specs to the replication's generator with ``with_rng``
+        return {"distribution": value.name, "params": canonical(value.params)}
+    raise TypeError(
+        f"Cannot describe {value!r} deterministically, use a Distribution spec."
+    )
+
+
+def source_digest(build: Callable) -> str:
+    """
+    SHA-256 of a builder's source code, so that editing the builder changes
+    the scenario key.
+
+    Parameters
+    ----------
+    build : Callable
+        Builder function, ``partial``s are unwrapped.
+
+    Returns
+    -------
+    str
+        Hex digest of the source, or of the bytecode if the source is not
+        available (e.g. in an interactive session without it).
+    """
+    while isinstance(build, partial):
+        build = build.func
+    try:
+        code = inspect.getsource(build).encode()
+    except (OSError, TypeError):
+        code = getattr(getattr(build, "__code__", None), "co_code", b"")
+    return hashlib.sha256(code).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def library_digest() -> dict[str, str]:
+    """
+    Version of the installed package and SHA-256 of the sources of this
+    library, so that upgrading or editing the library changes every key.
+
+    Returns
+    -------
+    dict[str, str]
+        ``version`` ("unknown" if the package is not installed) and
+        ``sources`` digest.
+    """
+    try:
+        package_version = version("qos-02")
+    except PackageNotFoundError:
+        package_version = "unknown"
+    digest = hashlib.sha256()
+    for path in sorted(Path(__file__).parent.glob("*.py")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return {"version": package_version, "sources": digest.hexdigest()}
+
+
+class Scenario:
+    """
+    Hashable description of a simulation run.
+
+    Attributes
+    ----------
+    build : Callable
+        Builder ``build(env, rng, **params)``, defined at module level.
+    until : float
+        Simulation horizon.
+    seed : int
+        Root seed of the replications.
+    replications : int
+        Number of replications.
+    params : dict[str, Any]
+        Keyword parameters passed to the builder.
+    """
+
+    def __init__(
+        self,
+        build: Callable,
+        until: float,
+        seed: int = 0,
+        replications: int = 1,
+        **params: Any,
+    ) -> None:
+        """
+        Initialize a scenario.
+
+        Parameters
+        ----------
+        build : Callable
+            Builder ``build(env, rng, **params)``, defined at module level.
+        until : float
+            Simulation horizon.
+        seed : int, optional
+            Root seed of the replications, by default 0.
+        replications : int, optional
+            Number of replications, by default 1.
+        **params : Any
+            Keyword parameters passed to the builder, e.g. switch sizes,
+            ``port_capacity`` or ``Distribution`` specs of the sources. The
+            builder should draw from ``spec.with_rng(rng)``, not from the
+            spec's own generator, so replications stay independent.
+        """
+        self.build = build
+        self.until = until
+        self.seed = seed
+        self.replications = replications
+        self.params = params
+        self._key: Optional[str] = None
+
+    def describe(self) -> dict[str, Any]:
+        """
+        Canonical description the key is computed from. Besides the
+        parameters it covers the builder's source and the library's version
+        and sources, so stored results of edited code are not reused.
+
+        Returns
+        -------
+        dict[str, Any]
+            JSON-serializable description.
+        """
+        return {
+            "build": f"{self.build.__module__}.{self.build.__qualname__}",
+            "build_source": source_digest(self.build),
+            "library": library_digest(),
+            "until": canonical(float(self.until)),
+            "seed": self.seed,
+            "replications": self.replications,
+            "params": canonical(self.params),
+        }
+
+    @property
+    def key(self) -> str:
+        """SHA-256 hex digest of the canonical description."""
+        if self._key is None:
+            text = json.dumps(self.describe(), sort_keys=True, separators=(",", ":"))
+            self._key = hashlib.sha256(text.encode()).hexdigest()
+        return self._key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Scenario) and self.key == other.key
+
+    def run(
+        self,
+        store: Optional["ResultStore"] = None,
+        max_workers: Optional[int] = None,
+        confidence: float = 0.95,
+    ) -> ReplicationResult:
+        """
+        Run the replications, or load them from ``store`` if present.
+
+        Parameters
+        ----------
+        store : Optional[ResultStore], optional
+            Result store, by default None (always simulate).
+        max_workers : Optional[int], optional
+            Number of worker processes, by default one per CPU.
+        confidence : float, optional
+            Confidence level, by default 0.95.
+
+        Returns
+        -------
+        ReplicationResult
+            Per-replication summaries and their aggregate.
+        """
+        if store is not None:
+            cached = store.get(self.key)
+            if cached is not None:
+                return ReplicationResult(_unpack_summaries(cached[0]), confidence)
+        result = run_replications(
+            partial(self.build, **self.params),
+            self.until,
+            self.replications,
+            self.seed,
+            max_workers,
+            confidence,
+        )
+        if store is not None:
+            store.put(self.key, _pack_summaries(result.summaries), self.describe())
+        return result
+
+    def __repr__(self) -> str:
+        """
+        String representation of the scenario.
+
+        Returns
+        -------
+        str
+            String representation of the scenario.
+        """
+        return f"Scenario(build={self.build.__qualname__}, until={self.until}, seed={self.seed}, key={self.key[:12]})"
+
+
+def _pack_summaries(summaries: list[dict[str, dict[str, float]]]) -> dict[str, np.ndarray]:
+    """
+    One array per ``component/metric``, NaN where a replication lacks it.
+    """
+    names = sorted({f"{c}/{m}" for s in summaries for c in s for m in s[c]})
+    arrays = {name: np.full(len(summaries), np.nan) for name in names}
+    for i, summary in enumerate(summaries):
+        for component, metrics in summary.items():
+            for metric, value in metrics.items():
+                arrays[f"{component}/{metric}"][i] = value
+    return arrays
+
+
+def _unpack_summaries(arrays: dict[str, np.ndarray]) -> list[dict[str, dict[str, float]]]:
+    """
+    Inverse of ``_pack_summaries``.
+    """
+    n = len(next(iter(arrays.values()))) if arrays else 0
+    summaries: list[dict[str, dict[str, float]]] = [{} for _ in range(n)]
+    for name, values in arrays.items():
+        component, metric = name.split("/", 1)
+        for i, value in enumerate(values.tolist()):
+            if value == value:  # skip NaN
+                summaries[i].setdefault(component, {})[metric] = value
+    return summaries
+
+
+class ResultStore:
+    """
+    Content-addressed result store on disk with LRU eviction.
+
+    Every entry is a compressed ``<key>.npz`` with arrays and a ``<key>.json``
+    with metadata. Reading an entry refreshes its modification time, and
+    writing evicts the entries with the oldest modification times until the
+    store fits into ``max_bytes``.
+
+    Attributes
+    ----------
+    path : Path
+        Directory of the store.
+    max_bytes : Optional[int]
+        Size limit in bytes, unbounded if None.
+    hits : int
+        Number of successful lookups.
+    misses : int
+        Number of failed lookups.
+    """
+
+    def __init__(
+        self, path: Union[str, os.PathLike], max_bytes: Optional[int] = 1 << 30
+    ) -> None:
+        """
+        Open or create a result store.
+
+        Parameters
+        ----------
+        path : Union[str, os.PathLike]
+            Directory of the store, created if missing.
+        max_bytes : Optional[int], optional
+            Size limit in bytes, by default 1 GiB.
+        """
+        self.path = Path(path).expanduser()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def _files(self, key: str) -> tuple[Path, Path]:
+        return self.path / f"{key}.npz", self.path / f"{key}.json"
+
+    def __contains__(self, key: str) -> bool:
+        return all(f.exists() for f in self._files(key))
+
+    def get(self, key: str) -> Optional[tuple[dict[str, np.ndarray], dict[str, Any]]]:
+        """
+        Load an entry.
+
+        Parameters
+        ----------
+        key : str
+            Entry key.
+
+        Returns
+        -------
+        Optional[tuple[dict[str, np.ndarray], dict[str, Any]]]
+            Arrays and metadata, or None if the entry is missing.
+        """
+        data_file, meta_file = self._files(key)
+        try:
+            with np.load(data_file) as data:
+                arrays = {name: data[name] for name in data.files}
+            meta = json.loads(meta_file.read_text())
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+        for f in (data_file, meta_file):
+            os.utime(f)
+        self.hits += 1
+        return arrays, meta
+
+    def put(
+        self, key: str, arrays: dict[str, np.ndarray], meta: Optional[dict[str, Any]] = None
+    ) -> None:
+        """
+        Store an entry, replacing an existing one, and evict old entries.
+
+        Parameters
+        ----------
+        key : str
+            Entry key.
+        arrays : dict[str, np.ndarray]
+            Arrays to store.
+        meta : Optional[dict[str, Any]], optional
+            JSON-serializable metadata, by default None.
+        """
+        data_file, meta_file = self._files(key)
+        # write to temporary files first, readers never see partial entries
+        with tempfile.NamedTemporaryFile(dir=self.path, suffix=".tmp", delete=False) as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(f.name, data_file)
+        with tempfile.NamedTemporaryFile("w", dir=self.path, suffix=".tmp", delete=False) as f:
+            json.dump(meta or {}, f)
+        os.replace(f.name, meta_file)
+        self.evict(keep=key)
+
+    def size(self) -> int:
+        """
+        Total size of the stored entries in bytes.
+
+        Returns
+        -------
+        int
+            Size in bytes.
+        """
+        return sum(
+            f.stat().st_size
+            for pattern in ("*.npz", "*.json")
+            for f in self.path.glob(pattern)
+        )
+
+    def evict(self, keep: Optional[str] = None) -> list[str]:
+        """
+        Delete least recently used entries until the store fits the limit.
+
+        Parameters
+        ----------
+        keep : Optional[str], optional
+            Key that must not be evicted, by default None.
+
+        Returns
+        -------
+        list[str]
+            Keys of the evicted entries.
+        """
+        if self.max_bytes is None:
+            return []
+        entries = []
+        total = 0
+        for data_file in self.path.glob("*.npz"):
+            meta_file = data_file.with_suffix(".json")
+            try:
+                size = data_file.stat().st_size
+                size += meta_file.stat().st_size if meta_file.exists() else 0
+                entries.append((data_file.stat().st_mtime, data_file.stem, size))
+            except FileNotFoundError:
+                continue
+            total += size
+        evicted = []
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for f in self._files(key):
+                f.unlink(missing_ok=True)
+            total -= size
+            evicted.append(key)
+        return evicted
+
+    def __repr__(self) -> str:
+        """
+        String representation of the result store.
+
+        Returns
+        -------
+        str
+            String representation of the result store.
+        """
+        return f"ResultStore(path={self.path}, max_bytes={self.max_bytes}, hits={self.hits}, misses={self.misses})"
@@ -0,0 +1,432 @@
+"""
+Named random streams for common random numbers across configurations.
+
+A ``SeedBank`` derives an independent generator for every stochastic
+component from one master seed and the component's name, e.g.
+"source01.interval". A stream depends only on the seed, the replication and
+its name, so adding, removing or reordering components leaves the other
+streams untouched, and two configurations built from banks with the same
+seed see the same arrivals and sizes::
+
+    def build(env, bank, capacity):
+        sink = PacketSink(env, "sink", retention="streaming", keep_packets=False)
+        port = FastSwitchPort(env, 0, capacity=capacity, transmission_rate=1000)
+        port.destination = sink
+        source = PacketSource(
+            env, "source01", port,
+            bank.variate("source01.interval", "exponential", scale=1.0),
+            bank.variate("source01.size", "exponential", scale=100),
+        )
+        return {"sink": sink, "port": port}
+
+    result = run_paired(partial(build, capacity=2000), partial(build, capacity=3000),
+                        until=10000, replications=20, seed=1)
+    result.difference("port", "loss_rate")
+
+Components built with other variates can be rebound with ``seed_source``
+and ``seed_fork``.
+"""
+
+import hashlib
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from typing import Any, Callable, Iterator, Optional
+
+import numpy as np
+import simpy
+
+from .stats import mean_ci
+from .variates import Distribution, Variate
+
+PairedBuilder = Callable[[simpy.Environment, "SeedBank"], dict[str, Any]]
+Summary = dict[str, dict[str, float]]
+
+
+def name_key(name: str) -> tuple[int, ...]:
+    """
+    Stable 128-bit key of a stream name, as four 32-bit words.
+
+    Parameters
+    ----------
+    name : str
+        Stream name.
+
+    Returns
+    -------
+    tuple[int, ...]
+        The key, independent of the interpreter's hash seed.
+    """
+    digest = hashlib.blake2b(name.encode(), digest_size=16).digest()
+    return tuple(int.from_bytes(digest[i : i + 4], "little") for i in range(0, 16, 4))
+
+
+class SeedBank:
+    """
+    Source of named, independent random streams.
+
+    Attributes
+    ----------
+    seed : int
+        Master seed.
+    replication : int
+        Replication index, part of every stream's key.
+    """
+
+    def __init__(self, seed: Optional[int] = None, replication: int = 0) -> None:
+        """
+        Initialize a seed bank.
+
+        Parameters
+        ----------
+        seed : Optional[int], optional
+            Master seed, by default None (fresh entropy, see ``seed``).
+        replication : int, optional
+            Replication index, by default 0.
+        """
+        self.seed: int = seed if seed is not None else np.random.SeedSequence().entropy  # type: ignore
+        self.replication = replication
+        self._generators: dict[str, np.random.Generator] = {}
+
+    def seed_sequence(self, name: str) -> np.random.SeedSequence:
+        """
+        Seed sequence of a stream.
+
+        Parameters
+        ----------
+        name : str
+            Stream name.
+
+        Returns
+        -------
+        np.random.SeedSequence
+            Seed sequence keyed by the replication and the name.
+        """
+        return np.random.SeedSequence(self.seed, spawn_key=(self.replication, *name_key(name)))
+
+    def rng(self, name: str) -> np.random.Generator:
+        """
+        Generator of a stream, the same object for the same name.
+
+        Parameters
+        ----------
+        name : str
+            Stream name, e.g. "source01.size" or "fork01".
+
+        Returns
+        -------
+        np.random.Generator
+            The generator.
+        """
+        generator = self._generators.get(name)
+        if generator is None:
+            generator = np.random.default_rng(self.seed_sequence(name))
+            self._generators[name] = generator
+        return generator
+
+    def variate(self, name: str, distribution: str, **params: Any) -> Distribution:
+        """
+        Distribution spec drawing from a stream.
+
+        Parameters
+        ----------
+        name : str
+            Stream name.
+        distribution : str
+            Name of the generator method, e.g. "exponential".
+        **params : Any
+            Parameters of the method.
+
+        Returns
+        -------
+        Distribution
+            The spec.
+        """
+        return Distribution(distribution, self.rng(name), **params)
+
+    def rebind(self, variate: Variate, name: str) -> Variate:
+        """
+        Make a variate draw from a stream instead of its own generator.
+
+        Parameters
+        ----------
+        variate : Variate
+            Constant, ``Distribution`` or ``partial`` of a generator method.
+        name : str
+            Stream name.
+
+        Returns
+        -------
+        Variate
+            The rebound variate, constants unchanged.
+
+        Raises
+        ------
+        ValueError
+            If the variate is a callable of an unknown kind.
+        """
+        if isinstance(variate, (int, float)):
+            return variate
+        if isinstance(variate, Distribution):
+            return variate.with_rng(self.rng(name))
+        if isinstance(variate, partial) and isinstance(
+            getattr(variate.func, "__self__", None), np.random.Generator
+        ):
+            method = getattr(self.rng(name), variate.func.__name__)
+            return partial(method, *variate.args, **variate.keywords)
+        raise ValueError(f"Cannot rebind variate {variate!r} to stream {name!r}.")
+
+    def seed_source(self, source: Any, name: Optional[str] = None) -> None:
+        """
+        Rebind the interval and size variates of a source to the streams
+        "<name>.interval" and "<name>.size". Call before the run.
+
+        Parameters
+        ----------
+        source : Any
+            ``PacketSource``.
+        name : Optional[str], optional
+            Stream prefix, by default the source identifier.
+        """
+        name = name if name is not None else source.source_id
+        source.packet_interval = self.rebind(source.packet_interval, f"{name}.interval")
+        source.packet_size = self.rebind(source.packet_size, f"{name}.size")
+
+    def seed_fork(self, fork: Any, name: str) -> None:
+        """
+        Make a fork draw its branches from a stream. Call before the run.
+
+        Parameters
+        ----------
+        fork : Any
+            ``PacketFork``.
+        name : str
+            Stream name.
+        """
+        fork.rng = self.rng(name)
+
+    def __repr__(self) -> str:
+        """
+        String representation of the seed bank.
+
+        Returns
+        -------
+        str
+            String representation of the seed bank.
+        """
+        return f"SeedBank(seed={self.seed}, replication={self.replication}, streams={len(self._generators)})"
+
+
+def run_pair(
+    build_a: PairedBuilder,
+    build_b: PairedBuilder,
+    until: float,
+    seed: int,
+    replication: int,
+) -> tuple[Summary, Summary]:
+    """
+    Run both configurations of one replication with the same streams.
+
+    Parameters
+    ----------
+    build_a : PairedBuilder
+        Builder of the first configuration, ``build(env, bank)``.
+    build_b : PairedBuilder
+        Builder of the second configuration.
+    until : float
+        Simulation horizon.
+    seed : int
+        Master seed.
+    replication : int
+        Replication index.
+
+    Returns
+    -------
+    tuple[Summary, Summary]
+        ``summary()`` of every component of both configurations.
+    """
+    summaries = []
+    for build in (build_a, build_b):
+        env = simpy.Environment()
+        components = build(env, SeedBank(seed, replication))
+        env.run(until=until)
+        summaries.append({name: c.summary() for name, c in components.items()})
+    return summaries[0], summaries[1]
+
+
+class PairedResult:
+    """
+    Summaries of paired replications of two configurations.
+
+    Attributes
+    ----------
+    summaries_a : list[Summary]
+        Summaries of the first configuration, in replication order.
+    summaries_b : list[Summary]
+        Summaries of the second configuration.
+    confidence : float
+        Confidence level of the intervals.
+    """
+
+    def __init__(
+        self, summaries_a: list[Summary], summaries_b: list[Summary], confidence: float = 0.95
+    ) -> None:
+        self.summaries_a = summaries_a
+        self.summaries_b = summaries_b
+        self.confidence = confidence
+
+    def values(self, component: str, metric: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Per-replication values of a metric in both configurations.
+
+        Parameters
+        ----------
+        component : str
+            Component name as returned by the builders.
+        metric : str
+            Metric name from the component's ``summary()``.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            Values of the first and the second configuration.
+        """
+        a = np.array([s[component][metric] for s in self.summaries_a], dtype=np.float64)
+        b = np.array([s[component][metric] for s in self.summaries_b], dtype=np.float64)
+        return a, b
+
+    def difference(self, component: str, metric: str) -> dict[str, float]:
+        """
+        Paired estimate of ``b - a``.
+
+        Parameters
+        ----------
+        component : str
+            Component name.
+        metric : str
+            Metric name.
+
+        Returns
+        -------
+        dict[str, float]
+            ``mean`` and CI ``half_width`` of the difference, the
+            ``half_width`` of the same data treated as independent samples,
+            and the ``variance_reduction`` factor between the two.
+        """
+        a, b = self.values(component, metric)
+        n = len(a)
+        mean, half_width = mean_ci(b - a, self.confidence)
+        paired_var = float(np.var(b - a, ddof=1)) if n > 1 else math.nan
+        independent_var = float(np.var(a, ddof=1) + np.var(b, ddof=1)) if n > 1 else math.nan
+        return {
+            "mean": mean,
+            "half_width": half_width,
+            "independent_half_width": half_width * math.sqrt(independent_var / paired_var)
+            if paired_var > 0
+            else math.nan,
+            "variance_reduction": independent_var / paired_var if paired_var > 0 else math.inf,
+            "n": n,
+        }
+
+    def __repr__(self) -> str:
+        """
+        String representation of the paired result.
+
+        Returns
+        -------
+        str
+            String representation of the paired result.
+        """
+        return f"PairedResult(replications={len(self.summaries_a)})"
+
+
+def iter_paired(
+    build_a: PairedBuilder,
+    build_b: PairedBuilder,
+    until: float,
+    replications: int = 30,
+    seed: Optional[int] = None,
+    max_workers: Optional[int] = None,
+) -> Iterator[tuple[int, tuple[Summary, Summary]]]:
+    """
+    Run paired replications and yield their summaries as they finish.
+
+    Parameters
+    ----------
+    build_a : PairedBuilder
+        Builder of the first configuration, must be picklable.
+    build_b : PairedBuilder
+        Builder of the second configuration, must be picklable.
+    until : float
+        Simulation horizon.
+    replications : int, optional
+        Number of replications, by default 30.
+    seed : Optional[int], optional
+        Master seed, by default None (fresh entropy).
+    max_workers : Optional[int], optional
+        Number of worker processes, by default one per CPU. With 1 the
+        replications run in this process.
+
+    Yields
+    ------
+    tuple[int, tuple[Summary, Summary]]
+        Replication index and the summaries of both configurations.
+    """
+    seed = SeedBank(seed).seed
+    if max_workers == 1:
+        for i in range(replications):
+            yield i, run_pair(build_a, build_b, until, seed, i)
+        return
+
+    workers = min(max_workers or os.cpu_count() or 1, replications)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_pair, build_a, build_b, until, seed, i): i
+            for i in range(replications)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def run_paired(
+    build_a: PairedBuilder,
+    build_b: PairedBuilder,
+    until: float,
+    replications: int = 30,
+    seed: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    confidence: float = 0.95,
+) -> PairedResult:
+    """
+    Run paired replications of two configurations with common random
+    numbers: replication ``i`` of both uses ``SeedBank(seed, i)``.
+
+    Parameters
+    ----------
+    build_a : PairedBuilder
+        Builder of the first configuration, ``build(env, bank)``.
+    build_b : PairedBuilder
+        Builder of the second configuration.
+    until : float
+        Simulation horizon.
+    replications : int, optional
+        Number of replications, by default 30.
+    seed : Optional[int], optional
+        Master seed, by default None (fresh entropy).
+    max_workers : Optional[int], optional
+        Number of worker processes, by default one per CPU.
+    confidence : float, optional
+        Confidence level, by default 0.95.
+
+    Returns
+    -------
+    PairedResult
+        Summaries of both configurations.
+    """
+    pairs: list[Optional[tuple[Summary, Summary]]] = [None] * replications
+    for i, pair in iter_paired(build_a, build_b, until, replications, seed, max_workers):
+        pairs[i] = pair
+    return PairedResult(
+        [p[0] for p in pairs], [p[1] for p in pairs], confidence  # type: ignore
+    )
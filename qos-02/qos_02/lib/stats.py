@@ -0,0 +1,599 @@
+import math
+from statistics import NormalDist
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+def t_quantile(df: int, p: float) -> float:
+    """
+    Quantile of the Student t distribution.
+
+    Exact for 1 and 2 degrees of freedom, otherwise the Cornish-Fisher
+    expansion around the normal quantile, which is accurate to about 1e-3
+    from 3 degrees of freedom up.
+
+    Parameters
+    ----------
+    df : int
+        Degrees of freedom.
+    p : float
+        Probability, e.g. 0.975 for a two-sided 95% interval.
+
+    Returns
+    -------
+    float
+        The quantile.
+    """
+    if df < 1:
+        raise ValueError("At least one degree of freedom is needed.")
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    z = NormalDist().inv_cdf(p)
+    g1 = (z**3 + z) / 4
+    g2 = (5 * z**5 + 16 * z**3 + 3 * z) / 96
+    g3 = (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / 384
+    g4 = (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / 92160
+    return z + g1 / df + g2 / df**2 + g3 / df**3 + g4 / df**4
+
+
+def mean_ci(
+    values: Sequence[float], confidence: float = 0.95
+) -> tuple[float, float]:
+    """
+    Sample mean and half-width of its Student t confidence interval.
+
+    Parameters
+    ----------
+    values : Sequence[float]
+        Independent observations, e.g. one per replication.
+    confidence : float, optional
+        Confidence level, by default 0.95.
+
+    Returns
+    -------
+    tuple[float, float]
+        Mean and half-width. The half-width is NaN for fewer than two values.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    if n == 0:
+        return math.nan, math.nan
+    mean = float(x.mean())
+    if n < 2:
+        return mean, math.nan
+    sem = float(x.std(ddof=1)) / math.sqrt(n)
+    return mean, t_quantile(n - 1, 0.5 + confidence / 2) * sem
+
+
+def mser_truncation(batch_means: Sequence[float]) -> Optional[int]:
+    """
+    Warm-up truncation point by the MSER rule (marginal standard error).
+
+    Deleting the first ``d`` values minimizes
+    ``sum((z[d:] - mean(z[d:])) ** 2) / (n - d) ** 2``. MSER-5 applies the
+    rule to means of batches of 5 observations. A minimum in the second half
+    of the series means the transient has not ended yet.
+
+    Parameters
+    ----------
+    batch_means : Sequence[float]
+        Batch means in time order.
+
+    Returns
+    -------
+    Optional[int]
+        Number of leading batches to delete, None if the series is too short
+        or the minimum lies in its second half.
+    """
+    z = np.asarray(batch_means, dtype=np.float64)
+    n = len(z)
+    if n < 4 or not np.isfinite(z).all():
+        return None
+    # suffix sums give the statistic for every d at once
+    remaining = np.arange(n, 0, -1)
+    total = np.cumsum(z[::-1])[::-1]
+    squares = np.cumsum((z**2)[::-1])[::-1]
+    ss = squares - total**2 / remaining
+    # the last values alone are too noisy to be a candidate
+    d = int(np.argmin(ss[: n - 2] / remaining[: n - 2] ** 2))
+    return d if d <= n // 2 else None
+
+
+def chi_square_sf(statistic: float, df: int) -> float:
+    """
+    Survival function of the chi-square distribution, via the
+    Wilson-Hilferty normal approximation.
+
+    Parameters
+    ----------
+    statistic : float
+        Value of the chi-square statistic.
+    df : int
+        Degrees of freedom.
+
+    Returns
+    -------
+    float
+        Probability of a value at least as large, i.e. the p-value.
+    """
+    if statistic <= 0:
+        return 1.0
+    z = ((statistic / df) ** (1 / 3) - (1 - 2 / (9 * df))) / math.sqrt(2 / (9 * df))
+    return 1.0 - NormalDist().cdf(z)
+
+
+def chi_square_test(
+    counts: Sequence[int], probs: Sequence[float]
+) -> tuple[float, float]:
+    """
+    Pearson's goodness-of-fit test of observed counts against probabilities.
+
+    Outcomes with zero probability are left out. The p-value is approximate,
+    see ``chi_square_sf``.
+
+    Parameters
+    ----------
+    counts : Sequence[int]
+        Observed count of each outcome.
+    probs : Sequence[float]
+        Expected probability of each outcome.
+
+    Returns
+    -------
+    tuple[float, float]
+        The statistic and its p-value, NaN for fewer than two outcomes or no
+        observations.
+    """
+    c = np.asarray(counts, dtype=np.float64)
+    p = np.asarray(probs, dtype=np.float64)
+    mask = p > 0
+    n = c.sum()
+    if mask.sum() < 2 or n == 0:
+        return math.nan, math.nan
+    expected = n * p[mask]
+    statistic = float(((c[mask] - expected) ** 2 / expected).sum())
+    return statistic, chi_square_sf(statistic, int(mask.sum()) - 1)
+
+
+class Welford:
+    """
+    Running count, mean, variance, minimum and maximum in constant memory.
+
+    Attributes
+    ----------
+    count : int
+        Number of observations.
+    mean : float
+        Running mean.
+    min : float
+        Smallest observation.
+    max : float
+        Largest observation.
+    """
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.mean: float = 0.0
+        self.min: float = math.inf
+        self.max: float = -math.inf
+        self._m2: float = 0.0
+
+    def add(self, x: float) -> None:
+        """
+        Add an observation.
+
+        Parameters
+        ----------
+        x : float
+            The observation.
+        """
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    @property
+    def variance(self) -> float:
+        """Population variance, like ``np.var``."""
+        return self._m2 / self.count if self.count else math.nan
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance) if self.count else math.nan
+
+    def __repr__(self) -> str:
+        """
+        String representation of the running statistics.
+
+        Returns
+        -------
+        str
+            String representation of the running statistics.
+        """
+        return f"Welford(count={self.count}, mean={self.mean:.6g}, std={self.std:.6g})"
+
+
+class LogHistogram:
+    """
+    Histogram with logarithmic buckets for quantiles with bounded relative
+    error, in the spirit of HDR histograms.
+
+    A value ``v`` falls into bucket ``ceil(log(v) / log(gamma))`` with
+    ``gamma = (1 + e) / (1 - e)``. Reporting the bucket's midpoint in the
+    ``gamma`` scale is within relative error ``e`` of every value in it. The
+    buckets cover ``[min_value, max_value]`` and are allocated up front;
+    smaller positive values are counted in the lowest bucket, larger ones in
+    the highest, and zero or negative values separately.
+
+    Attributes
+    ----------
+    relative_error : float
+        Relative error bound ``e`` of the quantiles.
+    min_value : float
+        Smallest value with full resolution.
+    max_value : float
+        Largest value with full resolution.
+    count : int
+        Number of values added.
+    """
+
+    def __init__(
+        self,
+        relative_error: float = 0.01,
+        min_value: float = 1e-9,
+        max_value: float = 1e9,
+    ) -> None:
+        """
+        Initialize an empty histogram.
+
+        Parameters
+        ----------
+        relative_error : float, optional
+            Relative error bound of the quantiles, by default 0.01.
+        min_value : float, optional
+            Smallest value with full resolution, by default 1e-9.
+        max_value : float, optional
+            Largest value with full resolution, by default 1e9.
+        """
+        if not 0 < relative_error < 1:
+            raise ValueError("Relative error must be between 0 and 1.")
+        self.relative_error = relative_error
+        self.min_value = min_value
+        self.max_value = max_value
+        self._log_gamma = math.log((1 + relative_error) / (1 - relative_error))
+        self._offset = math.ceil(math.log(min_value) / self._log_gamma)
+        top = math.ceil(math.log(max_value) / self._log_gamma)
+        self.counts = np.zeros(top - self._offset + 1, dtype=np.int64)
+        self.count: int = 0
+        self.non_positive: int = 0
+
+    def add(self, value: float) -> None:
+        """
+        Add a value.
+
+        Parameters
+        ----------
+        value : float
+            The value.
+        """
+        self.count += 1
+        if value <= 0:
+            self.non_positive += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma) - self._offset
+        if index < 0:
+            index = 0
+        elif index >= len(self.counts):
+            index = len(self.counts) - 1
+        self.counts[index] += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Approximate quantile.
+
+        Parameters
+        ----------
+        q : float
+            Probability between 0 and 1.
+
+        Returns
+        -------
+        float
+            Value within the relative error bound of the exact quantile, 0 for
+            quantiles among non-positive values, NaN if empty.
+        """
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+        if rank < self.non_positive:
+            return 0.0
+        cum = np.cumsum(self.counts)
+        index = int(np.searchsorted(cum, rank - self.non_positive, side="right"))
+        index = min(index, len(self.counts) - 1)
+        gamma = math.exp(self._log_gamma)
+        return 2 * gamma ** (index + self._offset) / (gamma + 1)
+
+    def __repr__(self) -> str:
+        """
+        String representation of the histogram.
+
+        Returns
+        -------
+        str
+            String representation of the histogram.
+        """
+        return f"LogHistogram(count={self.count}, buckets={len(self.counts)}, relative_error={self.relative_error})"
+
+
+class JitterEstimator:
+    """
+    Interarrival jitter as defined in RFC 3550, section 6.4.1.
+
+    For consecutive packets ``i`` and ``j`` the transit time difference is
+    ``D = (R_j - R_i) - (S_j - S_i)``, i.e. the difference of their delays,
+    and the estimate is updated as ``J += (|D| - J) / 16``. The plain mean of
+    ``|D|`` is tracked as well.
+
+    Attributes
+    ----------
+    jitter : float
+        Current RFC 3550 estimate.
+    mean_abs_difference : Welford
+        Running statistics of ``|D|``.
+    """
+
+    def __init__(self) -> None:
+        self.jitter: float = 0.0
+        self.mean_abs_difference = Welford()
+        self._last_transit: Optional[float] = None
+
+    def add(self, send_time: float, receive_time: float) -> None:
+        """
+        Add a received packet.
+
+        Parameters
+        ----------
+        send_time : float
+            Time the packet was sent (created).
+        receive_time : float
+            Time the packet was received.
+        """
+        transit = receive_time - send_time
+        if self._last_transit is not None:
+            d = abs(transit - self._last_transit)
+            self.jitter += (d - self.jitter) / 16
+            self.mean_abs_difference.add(d)
+        self._last_transit = transit
+
+    def __repr__(self) -> str:
+        """
+        String representation of the jitter estimator.
+
+        Returns
+        -------
+        str
+            String representation of the jitter estimator.
+        """
+        return f"JitterEstimator(jitter={self.jitter:.6g})"
+
+
+class WindowCounter:
+    """
+    Packet and byte counts per fixed time window, keeping the last
+    ``windows`` windows in a ring buffer.
+
+    Attributes
+    ----------
+    window : float
+        Window length in simulation time units.
+    windows : int
+        Number of windows kept.
+    """
+
+    def __init__(self, window: float = 1.0, windows: int = 1024) -> None:
+        """
+        Initialize the counters.
+
+        Parameters
+        ----------
+        window : float, optional
+            Window length in simulation time units, by default 1.0.
+        windows : int, optional
+            Number of windows kept, by default 1024.
+        """
+        self.window = window
+        self.windows = windows
+        self.packets = np.zeros(windows, dtype=np.int64)
+        self.bytes = np.zeros(windows, dtype=np.int64)
+        self._current = 0  # index of the newest window since time 0
+        self._partial = [0, 0]  # packets and bytes of the newest window
+
+    def add(self, time: float, size: int) -> None:
+        """
+        Count a packet.
+
+        Parameters
+        ----------
+        time : float
+            Arrival time, not earlier than previous ones.
+        size : int
+            Packet size in bytes.
+        """
+        index = int(time // self.window)
+        if index != self._current:
+            self._advance(index)
+        self._partial[0] += 1
+        self._partial[1] += size
+
+    def _advance(self, index: int) -> None:
+        """
+        Close the current window and clear the skipped ones.
+
+        Parameters
+        ----------
+        index : int
+            Index of the new window.
+        """
+        slot = self._current % self.windows
+        self.packets[slot], self.bytes[slot] = self._partial
+        skipped = min(index - self._current - 1, self.windows)
+        for k in range(1, skipped + 1):
+            slot = (self._current + k) % self.windows
+            self.packets[slot] = self.bytes[slot] = 0
+        self._current = index
+        self._partial = [0, 0]
+
+    def series(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Kept windows in time order, including the newest, unfinished one.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, np.ndarray]
+            Window start times, packet counts and byte counts.
+        """
+        first = max(0, self._current - self.windows + 1)
+        index = np.arange(first, self._current + 1)
+        slots = index % self.windows
+        packets = self.packets[slots].copy()
+        sizes = self.bytes[slots].copy()
+        packets[-1], sizes[-1] = self._partial
+        return index * self.window, packets, sizes
+
+    def __repr__(self) -> str:
+        """
+        String representation of the window counter.
+
+        Returns
+        -------
+        str
+            String representation of the window counter.
+        """
+        return f"WindowCounter(window={self.window}, windows={self.windows})"
+
+
+class StreamingPacketStats:
+    """
+    Constant-memory statistics of received packets: delay moments and
+    quantiles, jitter, inter-arrival times and per-window throughput.
+
+    Attributes
+    ----------
+    delay : Welford
+        Running delay statistics.
+    delay_histogram : LogHistogram
+        Delay quantiles.
+    jitter : JitterEstimator
+        RFC 3550 jitter.
+    interarrival : Welford
+        Running inter-arrival statistics, the first one measured from time 0.
+    throughput : WindowCounter
+        Packets and bytes per window.
+    bytes : int
+        Total number of bytes received.
+    """
+
+    def __init__(
+        self,
+        relative_error: float = 0.01,
+        window: float = 1.0,
+        windows: int = 1024,
+    ) -> None:
+        """
+        Initialize the statistics.
+
+        Parameters
+        ----------
+        relative_error : float, optional
+            Relative error bound of the delay quantiles, by default 0.01.
+        window : float, optional
+            Throughput window length, by default 1.0.
+        windows : int, optional
+            Number of throughput windows kept, by default 1024.
+        """
+        self.delay = Welford()
+        self.delay_histogram = LogHistogram(relative_error)
+        self.jitter = JitterEstimator()
+        self.interarrival = Welford()
+        self.throughput = WindowCounter(window, windows)
+        self.bytes: int = 0
+        self.first_arrival: float = math.nan
+        self.last_arrival: float = 0.0
+
+    def add(self, creation_time: float, arrival_time: float, size: int) -> None:
+        """
+        Add a received packet.
+
+        Parameters
+        ----------
+        creation_time : float
+            Time the packet was created.
+        arrival_time : float
+            Time the packet arrived.
+        size : int
+            Packet size in bytes.
+        """
+        delay = arrival_time - creation_time
+        self.delay.add(delay)
+        self.delay_histogram.add(delay)
+        self.jitter.add(creation_time, arrival_time)
+        self.interarrival.add(arrival_time - self.last_arrival)
+        self.throughput.add(arrival_time, size)
+        if self.delay.count == 1:
+            self.first_arrival = arrival_time
+        self.last_arrival = arrival_time
+        self.bytes += size
+
+    def summary(self, bits_per_byte: int = 8) -> dict[str, float]:
+        """
+        Summarize the received packets with the keys of
+        ``core.summarize_packets``.
+
+        Parameters
+        ----------
+        bits_per_byte : int, optional
+            Conversion of bytes to throughput units, by default 8.
+
+        Returns
+        -------
+        dict[str, float]
+            Delay, jitter and throughput statistics.
+        """
+        n = self.delay.count
+        if n == 0:
+            return {"packets": 0, "bytes": 0}
+        span = self.last_arrival - self.first_arrival
+        q = self.delay_histogram.quantile
+        return {
+            "packets": n,
+            "bytes": self.bytes,
+            "mean_delay": self.delay.mean,
+            "std_delay": self.delay.std,
+            "min_delay": self.delay.min,
+            "max_delay": self.delay.max,
+            "p50_delay": q(0.5),
+            "p95_delay": q(0.95),
+            "p99_delay": q(0.99),
+            "jitter": self.jitter.mean_abs_difference.mean if n > 1 else 0.0,
+            "rfc3550_jitter": self.jitter.jitter,
+            "mean_interarrival": span / (n - 1) if n > 1 else 0.0,
+            "throughput": bits_per_byte * self.bytes / span if span > 0 else 0.0,
+        }
+
+    def __repr__(self) -> str:
+        """
+        String representation of the streaming statistics.
+
+        Returns
+        -------
+        str
+            String representation of the streaming statistics.
+        """
+        return f"StreamingPacketStats(packets={self.delay.count}, bytes={self.bytes})"
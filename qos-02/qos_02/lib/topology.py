@@ -0,0 +1,455 @@
+"""
+Routed networks built from networkx graphs.
+
+Every graph node becomes a ``Router`` and every edge ``(u, v)`` an output port
+of ``u`` towards ``v``, with the transmission rate and byte capacity taken
+from the edge attributes. Packets carry their destination node in ``dst`` and
+are forwarded hop by hop along shortest paths::
+
+    graph = nx.grid_2d_graph(50, 50)
+    nx.set_edge_attributes(graph, 1000, "rate")
+    nx.set_edge_attributes(graph, 10000, "capacity")
+    network = Network(env, graph)
+    network.add_source((0, 0), (49, 49), packet_interval=partial(rng.exponential, 2))
+    env.run(until=1000)
+    network.sink((49, 49)).summary()
+
+Routers, ports and sinks are only created once a packet needs them, and the
+next hops towards a destination are computed on its first use and cached in
+a ``RoutingTable``, which can be shared by networks over the same graph.
+"""
+
+from typing import Any, Callable, Hashable, Optional
+
+import networkx as nx
+import simpy
+
+from .core import FastSwitchPort, PacketProto, PacketSink, PacketSource
+
+
+class RoutingTable:
+    """
+    Next-hop forwarding tables of a graph along shortest paths.
+
+    The table towards a destination is computed with a single shortest-path
+    search from it over the reversed edges, and cached. ``compute_all``
+    fills the tables for every destination at once.
+
+    Attributes
+    ----------
+    graph : nx.Graph
+        The network graph, directed or undirected.
+    weight : Optional[str]
+        Edge attribute used as the path length, hop count if None.
+    """
+
+    def __init__(self, graph: nx.Graph, weight: Optional[str] = None) -> None:
+        """
+        Initialize an empty routing table.
+
+        Parameters
+        ----------
+        graph : nx.Graph
+            The network graph, directed or undirected.
+        weight : Optional[str], optional
+            Edge attribute used as the path length, by default None (hops).
+        """
+        self.graph = graph
+        self.weight = weight
+        self._reversed = graph.reverse(copy=False) if graph.is_directed() else graph
+        self._tables: dict[Hashable, dict[Hashable, Hashable]] = {}
+
+    def table(self, dst: Hashable) -> dict[Hashable, Hashable]:
+        """
+        Next hop towards ``dst`` from every node that can reach it.
+
+        Parameters
+        ----------
+        dst : Hashable
+            Destination node.
+
+        Returns
+        -------
+        dict[Hashable, Hashable]
+            Next hop of each node, ``dst`` itself excluded.
+        """
+        table = self._tables.get(dst)
+        if table is None:
+            if self.weight is None:
+                pred = nx.predecessor(self._reversed, dst)
+            else:
+                pred, _ = nx.dijkstra_predecessor_and_distance(
+                    self._reversed, dst, weight=self.weight
+                )
+            # predecessors on the reversed graph are next hops on the original
+            table = {node: hops[0] for node, hops in pred.items() if hops}
+            self._tables[dst] = table
+        return table
+
+    def next_hop(self, node: Hashable, dst: Hashable) -> Hashable:
+        """
+        Next hop from ``node`` towards ``dst``.
+
+        Parameters
+        ----------
+        node : Hashable
+            Current node.
+        dst : Hashable
+            Destination node.
+
+        Returns
+        -------
+        Hashable
+            The neighbour to forward to.
+
+        Raises
+        ------
+        ValueError
+            If ``dst`` cannot be reached from ``node``.
+        """
+        try:
+            return self.table(dst)[node]
+        except (KeyError, nx.NodeNotFound):
+            raise ValueError(f"No route from {node!r} to {dst!r}.") from None
+
+    def compute_all(self) -> None:
+        """
+        Compute the tables towards every node, like all-pairs shortest paths.
+        """
+        for dst in self.graph.nodes:
+            self.table(dst)
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    def __repr__(self) -> str:
+        """
+        String representation of the routing table.
+
+        Returns
+        -------
+        str
+            String representation of the routing table.
+        """
+        return f"RoutingTable(nodes={self.graph.number_of_nodes()}, destinations={len(self._tables)})"
+
+
+class Router:
+    """
+    A network node that delivers packets addressed to it to its sink and
+    forwards the others to the output port of the next hop.
+
+    Attributes
+    ----------
+    network : Network
+        The network the router belongs to.
+    node : Hashable
+        The graph node.
+    sink : Optional[PacketSink]
+        Sink of the node, created by the first packet addressed to it.
+    ports : dict[Hashable, Any]
+        Output ports by neighbour, created by the first packet sent there.
+    packet_count : int
+        Number of packets the router received.
+    """
+
+    def __init__(self, network: "Network", node: Hashable) -> None:
+        """
+        Initialize a router without ports.
+
+        Parameters
+        ----------
+        network : Network
+            The network the router belongs to.
+        node : Hashable
+            The graph node.
+        """
+        self.network = network
+        self.node = node
+        self.sink: Optional[PacketSink] = None
+        self.ports: dict[Hashable, Any] = {}
+        self.packet_count: int = 0
+        self._table: dict[Hashable, Any] = {}  # output port by destination
+
+    def process_packet(self, packet: PacketProto) -> Optional[simpy.Event]:
+        """
+        Deliver or forward a packet.
+
+        Parameters
+        ----------
+        packet : PacketProto
+            The incoming packet, with ``dst`` set.
+
+        Returns
+        -------
+        Optional[simpy.Event]
+            Whatever the sink or port returns.
+        """
+        self.packet_count += 1
+        dst = packet.dst
+        port = self._table.get(dst)
+        if port is None:
+            if dst == self.node:
+                return self.network.sink(dst).process_packet(packet)
+            port = self.port(self.network.routes.next_hop(self.node, dst))
+            self._table[dst] = port
+        return port.process_packet(packet)
+
+    def port(self, neighbour: Hashable) -> Any:
+        """
+        Output port towards a neighbour, created on first use.
+
+        Parameters
+        ----------
+        neighbour : Hashable
+            The neighbouring node.
+
+        Returns
+        -------
+        Any
+            The port, an instance of the network's ``port_class``.
+        """
+        port = self.ports.get(neighbour)
+        if port is None:
+            port = self.network.create_port(self.node, neighbour)
+            self.ports[neighbour] = port
+        return port
+
+    def __repr__(self) -> str:
+        """
+        String representation of the router.
+
+        Returns
+        -------
+        str
+            String representation of the router.
+        """
+        return f"Router(node={self.node}, ports={len(self.ports)}, packets={self.packet_count})"
+
+
+class Network:
+    """
+    A simulated network over a networkx graph.
+
+    Attributes
+    ----------
+    env : simpy.Environment
+        The simulation environment.
+    graph : nx.Graph
+        The network graph.
+    routes : RoutingTable
+        Next-hop tables, possibly shared with other networks.
+    routers : dict[Hashable, Router]
+        Routers created so far.
+    sinks : dict[Hashable, PacketSink]
+        Sinks created so far.
+    sources : list[PacketSource]
+        Sources added with ``add_source``.
+    """
+
+    def __init__(
+        self,
+        env: simpy.Environment,
+        graph: nx.Graph,
+        rate_attr: str = "rate",
+        capacity_attr: str = "capacity",
+        default_rate: float = 1,
+        default_capacity: Optional[int] = 10,
+        port_class: Callable[..., Any] = FastSwitchPort,
+        routes: Optional[RoutingTable] = None,
+        weight: Optional[str] = None,
+        sink_retention: str = "streaming",
+    ) -> None:
+        """
+        Initialize a network. No routers, ports or sinks are created yet.
+
+        Parameters
+        ----------
+        env : simpy.Environment
+            The simulation environment.
+        graph : nx.Graph
+            The network graph. In an undirected graph every edge is a link
+            in both directions with the same attributes.
+        rate_attr : str, optional
+            Edge attribute with the transmission rate, by default "rate".
+        capacity_attr : str, optional
+            Edge attribute with the port capacity in bytes,
+            by default "capacity".
+        default_rate : float, optional
+            Rate of edges without the attribute, by default 1.
+        default_capacity : Optional[int], optional
+            Capacity of edges without the attribute, by default 10.
+        port_class : Callable[..., Any], optional
+            Port implementation, called like ``SwitchPort``,
+            by default ``FastSwitchPort``.
+        routes : Optional[RoutingTable], optional
+            Routing table of the same graph to reuse, e.g. across
+            replications, by default a new one.
+        weight : Optional[str], optional
+            Edge attribute used as the path length of a new routing table,
+            by default None (hops).
+        sink_retention : str, optional
+            Retention of the node sinks, by default "streaming".
+        """
+        if routes is not None and routes.graph is not graph:
+            raise ValueError("Routing table belongs to another graph.")
+        self.env = env
+        self.graph = graph
+        self.rate_attr = rate_attr
+        self.capacity_attr = capacity_attr
+        self.default_rate = default_rate
+        self.default_capacity = default_capacity
+        self.port_class = port_class
+        self.routes = routes if routes is not None else RoutingTable(graph, weight)
+        self.sink_retention = sink_retention
+        self.routers: dict[Hashable, Router] = {}
+        self.sinks: dict[Hashable, PacketSink] = {}
+        self.sources: list[PacketSource] = []
+
+    def router(self, node: Hashable) -> Router:
+        """
+        Router of a node, created on first use.
+
+        Parameters
+        ----------
+        node : Hashable
+            The graph node.
+
+        Returns
+        -------
+        Router
+            The router.
+        """
+        router = self.routers.get(node)
+        if router is None:
+            if node not in self.graph:
+                raise ValueError(f"Unknown node {node!r}.")
+            router = Router(self, node)
+            self.routers[node] = router
+        return router
+
+    def sink(self, node: Hashable) -> PacketSink:
+        """
+        Sink of a node, created on first use.
+
+        Parameters
+        ----------
+        node : Hashable
+            The graph node.
+
+        Returns
+        -------
+        PacketSink
+            The sink.
+        """
+        sink = self.sinks.get(node)
+        if sink is None:
+            sink = PacketSink(
+                self.env, str(node), retention=self.sink_retention, keep_packets=False
+            )
+            self.sinks[node] = sink
+        return sink
+
+    def create_port(self, u: Hashable, v: Hashable) -> Any:
+        """
+        Create the output port of ``u`` towards ``v`` from the edge attributes.
+
+        Parameters
+        ----------
+        u : Hashable
+            Node owning the port.
+        v : Hashable
+            Neighbour the port transmits to.
+
+        Returns
+        -------
+        Any
+            The port, connected to the router of ``v``.
+        """
+        data = self.graph.edges[u, v]
+        port = self.port_class(
+            self.env,
+            port_no=len(self.router(u).ports),
+            capacity=data.get(self.capacity_attr, self.default_capacity),
+            transmission_rate=data.get(self.rate_attr, self.default_rate),
+        )
+        port.destination = self.router(v)
+        return port
+
+    def add_source(
+        self,
+        node: Hashable,
+        dst: Hashable,
+        source_id: Optional[str] = None,
+        **kwargs: Any,
+    ) -> PacketSource:
+        """
+        Add a packet source at ``node`` sending to ``dst``.
+
+        Parameters
+        ----------
+        node : Hashable
+            Node the packets enter the network at.
+        dst : Hashable
+            Destination node of the packets.
+        source_id : Optional[str], optional
+            Identifier of the source, by default "<node>-><dst>".
+        **kwargs : Any
+            Further ``PacketSource`` parameters, e.g. ``packet_interval``.
+
+        Returns
+        -------
+        PacketSource
+            The source.
+        """
+        if dst not in self.graph:
+            raise ValueError(f"Unknown node {dst!r}.")
+        source = PacketSource(
+            self.env,
+            source_id if source_id is not None else f"{node}->{dst}",
+            self.router(node),
+            dst=dst,
+            **kwargs,
+        )
+        self.sources.append(source)
+        return source
+
+    @property
+    def ports(self) -> dict[tuple[Hashable, Hashable], Any]:
+        """Ports created so far by ``(node, neighbour)``."""
+        return {
+            (u, v): port
+            for u, router in self.routers.items()
+            for v, port in router.ports.items()
+        }
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the network.
+
+        Returns
+        -------
+        dict[str, float]
+            Numbers of created routers, ports and sinks, and the packets sent,
+            delivered and dropped.
+        """
+        ports = self.ports.values()
+        return {
+            "routers": len(self.routers),
+            "ports": len(ports),
+            "sinks": len(self.sinks),
+            "sent": sum(s.packets_sent for s in self.sources),
+            "delivered": sum(s.packet_count for s in self.sinks.values()),
+            "drops": sum(p.cum_drop_count for p in ports),
+        }
+
+    def __repr__(self) -> str:
+        """
+        String representation of the network.
+
+        Returns
+        -------
+        str
+            String representation of the network.
+        """
+        return f"Network(nodes={self.graph.number_of_nodes()}, routers={len(self.routers)}, sinks={len(self.sinks)})"
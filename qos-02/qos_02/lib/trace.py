@@ -0,0 +1,260 @@
+"""
+Binary event traces of packets moving through the components.
+
+A ``TraceRecorder`` stores fixed-size records (time, event, component, packet
+id, size) in a preallocated ring buffer. Components record only when a
+recorder is attached to them, so with tracing off the cost is a single
+``trace is not None`` check::
+
+    recorder = TraceRecorder(path="run.trace")
+    recorder.attach(source)
+    recorder.attach(switch.ports[0])
+    recorder.attach(sink)
+    env.run(until=1000)
+    recorder.close()
+
+    drops = load_trace("run.trace", event=DROP)
+
+With a ``path`` every full buffer is appended to the file, otherwise the
+oldest records are overwritten. ``load_trace`` memory-maps the file and
+returns the records matching the filters as a NumPy structured array.
+"""
+
+import json
+import os
+from typing import Any, Optional, Union
+
+import numpy as np
+
+TRACE_DTYPE = np.dtype(
+    [
+        ("time", np.float64),
+        ("event", np.uint8),
+        ("component", np.uint16),
+        ("packet", np.int64),
+        ("size", np.int32),
+    ]
+)
+
+GENERATE = 0  # created by a source
+ENQUEUE = 1  # accepted by a port
+DROP = 2  # dropped by a port or fork
+TRANSMIT = 3  # transmission started
+DEPART = 4  # transmission finished, handed to the next component
+RECEIVE = 5  # received by a sink
+FORWARD = 6  # forwarded by a fork
+EVENT_NAMES = ("generate", "enqueue", "drop", "transmit", "depart", "receive", "forward")
+
+
+class TraceRecorder:
+    """
+    Ring buffer of binary trace records, optionally flushed to a file.
+
+    Attributes
+    ----------
+    capacity : int
+        Number of records in the buffer.
+    path : Optional[str]
+        File the records are appended to, None to keep them in memory only.
+    components : list[str]
+        Names of the attached components, indexed by the ``component`` field.
+    count : int
+        Total number of records.
+    """
+
+    def __init__(
+        self, capacity: int = 1 << 16, path: Union[str, os.PathLike, None] = None
+    ) -> None:
+        """
+        Initialize an empty recorder.
+
+        Parameters
+        ----------
+        capacity : int, optional
+            Number of records in the buffer, by default 65536.
+        path : Union[str, os.PathLike, None], optional
+            File to append the records to, truncated first, by default None.
+            Component and event names are written to ``<path>.json`` on
+            ``close``.
+        """
+        self.capacity = capacity
+        self.path = os.fspath(path) if path is not None else None
+        self.components: list[str] = []
+        self.count: int = 0
+        self._buffer = np.zeros(capacity, dtype=TRACE_DTYPE)
+        self._index: int = 0  # next slot
+        self._file = open(self.path, "wb") if self.path is not None else None
+
+    def attach(self, component: Any, name: Optional[str] = None) -> int:
+        """
+        Record the events of a component.
+
+        Parameters
+        ----------
+        component : Any
+            Source, port, sink or fork with ``trace`` and ``trace_id``
+            attributes.
+        name : Optional[str], optional
+            Name of the component in the trace, by default its identifier or
+            class name and port number.
+
+        Returns
+        -------
+        int
+            Component index used in the records.
+        """
+        if name is None:
+            name = getattr(component, "source_id", None) or getattr(
+                component, "sink_id", None
+            )
+        if name is None:
+            port_no = getattr(component, "port_no", None)
+            name = type(component).__name__ + ("" if port_no is None else f"-{port_no}")
+        component.trace = self
+        component.trace_id = len(self.components)
+        self.components.append(name)
+        return component.trace_id
+
+    def record(
+        self, time: float, event: int, component: int, packet: int, size: int
+    ) -> None:
+        """
+        Append a record.
+
+        Parameters
+        ----------
+        time : float
+            Simulation time.
+        event : int
+            Event code, e.g. ``ENQUEUE``.
+        component : int
+            Index of the recording component.
+        packet : int
+            Packet identifier.
+        size : int
+            Packet size in bytes.
+        """
+        i = self._index
+        self._buffer[i] = (time, event, component, packet, size)
+        self.count += 1
+        i += 1
+        if i == self.capacity:
+            if self._file is not None:
+                self._buffer.tofile(self._file)
+            i = 0
+        self._index = i
+
+    def records(self) -> np.ndarray:
+        """
+        Records still in the buffer, oldest first. With a file these are the
+        records not written yet.
+
+        Returns
+        -------
+        np.ndarray
+            Copy of the records with ``TRACE_DTYPE``.
+        """
+        if self._file is not None or self.count < self.capacity:
+            return self._buffer[: self._index].copy()
+        return np.concatenate((self._buffer[self._index :], self._buffer[: self._index]))
+
+    def flush(self) -> None:
+        """
+        Write the buffered records to the file and clear the buffer.
+        """
+        if self._file is None:
+            return
+        self._buffer[: self._index].tofile(self._file)
+        self._file.flush()
+        self._index = 0
+
+    def close(self) -> None:
+        """
+        Flush the buffer, close the file and write the names sidecar.
+        """
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+        with open(f"{self.path}.json", "w") as f:
+            json.dump({"components": self.components, "events": EVENT_NAMES}, f)
+
+    def __repr__(self) -> str:
+        """
+        String representation of the trace recorder.
+
+        Returns
+        -------
+        str
+            String representation of the trace recorder.
+        """
+        return f"TraceRecorder(count={self.count}, capacity={self.capacity}, path={self.path})"
+
+
+def load_trace(
+    path: Union[str, os.PathLike],
+    event: Union[int, list[int], None] = None,
+    component: Union[int, str, None] = None,
+    packet: Optional[int] = None,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Load the records of a trace file matching all given filters.
+
+    Parameters
+    ----------
+    path : Union[str, os.PathLike]
+        Trace file written by a ``TraceRecorder``.
+    event : Union[int, list[int], None], optional
+        Event code or codes, by default all.
+    component : Union[int, str, None], optional
+        Component index, or name looked up in the sidecar, by default all.
+    packet : Optional[int], optional
+        Packet identifier, by default all.
+    start : Optional[float], optional
+        Earliest time, by default the start of the trace.
+    end : Optional[float], optional
+        Time before which records end, by default the end of the trace.
+
+    Returns
+    -------
+    np.ndarray
+        Matching records with ``TRACE_DTYPE``, in recording order.
+    """
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=TRACE_DTYPE)
+    records = np.memmap(path, dtype=TRACE_DTYPE, mode="r")
+    if isinstance(component, str):
+        component = trace_components(path).index(component)
+    mask = np.ones(len(records), dtype=bool)
+    if event is not None:
+        mask &= np.isin(records["event"], event)
+    if component is not None:
+        mask &= records["component"] == component
+    if packet is not None:
+        mask &= records["packet"] == packet
+    if start is not None:
+        mask &= records["time"] >= start
+    if end is not None:
+        mask &= records["time"] < end
+    return np.asarray(records[mask])
+
+
+def trace_components(path: Union[str, os.PathLike]) -> list[str]:
+    """
+    Component names of a trace file, from its sidecar.
+
+    Parameters
+    ----------
+    path : Union[str, os.PathLike]
+        Trace file written by a ``TraceRecorder``.
+
+    Returns
+    -------
+    list[str]
+        Names indexed by the ``component`` field.
+    """
+    with open(f"{os.fspath(path)}.json") as f:
+        return json.load(f)["components"]
@@ -0,0 +1,374 @@
+from functools import partial
+from typing import Any, Callable, Iterator, Optional, Sequence, Union
+
+import numpy as np
+
+
+class Distribution:
+    """
+    Distribution spec: a ``numpy.random.Generator`` method name, its
+    parameters and the generator to draw from.
+
+    Unlike ``partial(rng.exponential, 2)`` a spec can always be drawn in
+    blocks, and it can be used anywhere a callable variate is accepted.
+
+    Attributes
+    ----------
+    name : str
+        Name of the generator method, e.g. "exponential" or "normal".
+    params : dict[str, Any]
+        Keyword parameters of the method.
+    rng : np.random.Generator
+        Generator the values are drawn from.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rng: Union[np.random.Generator, int, None] = None,
+        **params: Any,
+    ) -> None:
+        """
+        Initialize a distribution spec.
+
+        Parameters
+        ----------
+        name : str
+            Name of the generator method, e.g. "exponential" or "normal".
+        rng : Union[np.random.Generator, int, None], optional
+            Generator, or a seed to create one, by default None (unseeded).
+        **params : Any
+            Keyword parameters of the method, e.g. ``scale=2``.
+        """
+        if not isinstance(rng, np.random.Generator):
+            rng = np.random.default_rng(rng)
+        if not callable(getattr(rng, name, None)):
+            raise ValueError(f"Unknown distribution {name!r}.")
+        self.name = name
+        self.params = params
+        self.rng = rng
+        self._method = getattr(rng, name)
+
+    def sample(self, n: int) -> np.ndarray:
+        """
+        Draw ``n`` values.
+
+        Parameters
+        ----------
+        n : int
+            Number of values.
+
+        Returns
+        -------
+        np.ndarray
+            Drawn values.
+        """
+        return np.asarray(self._method(size=n, **self.params))
+
+    def __call__(self) -> float:
+        return self._method(**self.params)
+
+    def with_rng(self, rng: Union[np.random.Generator, int, None]) -> "Distribution":
+        """
+        Copy of the spec drawing from another generator.
+
+        Parameters
+        ----------
+        rng : Union[np.random.Generator, int, None]
+            Generator, or a seed to create one.
+
+        Returns
+        -------
+        Distribution
+            The new spec.
+        """
+        return Distribution(self.name, rng, **self.params)
+
+    def __repr__(self) -> str:
+        """
+        String representation of the distribution.
+
+        Returns
+        -------
+        str
+            String representation of the distribution.
+        """
+        params = ", ".join(f"{k}={v}" for k, v in self.params.items())
+        return f"Distribution({self.name}, {params})"
+
+
+Variate = Union[Callable[[], float], float, Distribution]
+
+
+def generator_of(variate: Variate) -> Optional[np.random.Generator]:
+    """
+    Return the NumPy generator behind a variate, if it is a partial of one of
+    its methods such as ``partial(rng.exponential, 2)``.
+
+    Parameters
+    ----------
+    variate : Variate
+        Constant or callable returning a single value.
+
+    Returns
+    -------
+    Optional[np.random.Generator]
+        The generator, or None.
+    """
+    if isinstance(variate, Distribution):
+        return variate.rng
+    if isinstance(variate, partial):
+        owner = getattr(variate.func, "__self__", None)
+        if isinstance(owner, np.random.Generator) and "size" not in variate.keywords:
+            return owner
+    return None
+
+
+def bulk_sampler(variate: Variate) -> Optional[Callable[[int], np.ndarray]]:
+    """
+    Return a function drawing ``n`` values of a variate at once.
+
+    Constants, ``Distribution`` specs, partials of
+    ``numpy.random.Generator`` methods and callables with a ``sample(n)``
+    method can be drawn in bulk. Drawing ``n`` values at once consumes the
+    generator exactly like ``n`` single draws, so the values are the same.
+
+    Parameters
+    ----------
+    variate : Variate
+        Constant or callable returning a single value.
+
+    Returns
+    -------
+    Optional[Callable[[int], np.ndarray]]
+        Bulk sampler, or None if the variate can only be called one by one.
+    """
+    if isinstance(variate, (int, float)):
+        return lambda n: np.full(n, variate)
+    if isinstance(variate, Distribution):
+        return variate.sample
+    sample = getattr(variate, "sample", None)
+    if callable(sample):
+        # wrappers such as ``profiling.TimedVariate`` that keep bulk draws
+        return sample
+    if generator_of(variate) is not None:
+        return lambda n: np.asarray(variate(size=n))  # type: ignore
+    return None
+
+
+def alias_table(probs: Sequence[float]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Build Vose's alias table for sampling from a discrete distribution in
+    O(1) per draw.
+
+    A uniform ``u`` in [0, 1) selects the column ``i = floor(u * k)``; the
+    outcome is ``i`` if ``u * k - i < prob[i]`` and ``alias[i]`` otherwise.
+
+    Parameters
+    ----------
+    probs : Sequence[float]
+        Probabilities of the ``k`` outcomes, summing to 1.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Acceptance probability and alias of each column.
+    """
+    k = len(probs)
+    scaled = [p * k for p in probs]
+    prob = np.ones(k)
+    alias = np.arange(k)
+    small = [i for i, p in enumerate(scaled) if p < 1]
+    large = [i for i, p in enumerate(scaled) if p >= 1]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] -= 1 - scaled[s]
+        (small if scaled[l] < 1 else large).append(l)
+    # leftovers are 1 up to rounding
+    return prob, alias
+
+
+def alias_choice(
+    prob: np.ndarray, alias: np.ndarray, uniforms: np.ndarray
+) -> np.ndarray:
+    """
+    Map uniforms to outcomes with an alias table, see ``alias_table``.
+
+    Parameters
+    ----------
+    prob : np.ndarray
+        Acceptance probability of each column.
+    alias : np.ndarray
+        Alias of each column.
+    uniforms : np.ndarray
+        Uniform values in [0, 1).
+
+    Returns
+    -------
+    np.ndarray
+        Outcome indices.
+    """
+    x = uniforms * len(prob)
+    column = x.astype(np.int64)
+    return np.where(x - column < prob[column], column, alias[column])
+
+
+def packet_sizes(values: np.ndarray, constant: bool) -> np.ndarray:
+    """
+    Convert drawn sizes to packet sizes the way ``PacketSource`` does.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Drawn sizes.
+    constant : bool
+        Whether the sizes come from a constant, which is used as is.
+
+    Returns
+    -------
+    np.ndarray
+        Integer packet sizes. Sizes drawn from a distribution that truncate to
+        zero become 1.
+    """
+    sizes = np.trunc(values).astype(np.int64)
+    if not constant:
+        sizes[sizes == 0] = 1
+    return sizes
+
+
+def variate_stream(
+    variate: Variate, block_size: int = 4096, size: bool = False
+) -> Iterator[float]:
+    """
+    Iterate over values of a variate drawn in blocks.
+
+    Variates that cannot be drawn in bulk are called ``block_size`` times
+    per block.
+
+    Parameters
+    ----------
+    variate : Variate
+        Constant, callable or ``Distribution``.
+    block_size : int, optional
+        Number of values drawn at once, by default 4096.
+    size : bool, optional
+        Convert the values to packet sizes, see ``packet_sizes``,
+        by default False.
+
+    Yields
+    ------
+    float
+        The next value.
+    """
+    sampler = bulk_sampler(variate)
+    if sampler is None:
+
+        def sampler(n: int) -> np.ndarray:
+            return np.fromiter((variate() for _ in range(n)), np.float64, n)  # type: ignore
+
+    constant = isinstance(variate, (int, float))
+    while True:
+        block = sampler(block_size)
+        if size:
+            block = packet_sizes(block, constant)
+        yield from block.tolist()
+
+
+def draw_source(
+    packet_interval: Variate,
+    packet_size: Variate,
+    until: float,
+    match_simpy: bool = True,
+    block_size: int = 65536,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Draw creation times and sizes of all packets a ``PacketSource`` with the
+    same parameters generates before ``until``.
+
+    Parameters
+    ----------
+    packet_interval : Variate
+        Interval between packets, constant or callable.
+    packet_size : Variate
+        Packet size, constant or callable.
+    until : float
+        Simulation horizon. Only packets created before it are returned.
+    match_simpy : bool, optional
+        If both variates draw from the same generator, ``PacketSource``
+        alternates between them. Matching that order needs one call per
+        value. With False they are drawn in bulk anyway, which gives a
+        different but statistically equivalent sample path. By default True.
+    block_size : int, optional
+        Number of intervals drawn at once, by default 65536.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Creation times and sizes of the packets.
+    """
+    interval_sampler = bulk_sampler(packet_interval)
+    size_sampler = bulk_sampler(packet_size)
+    shared = generator_of(packet_interval) is not None and generator_of(
+        packet_interval
+    ) is generator_of(packet_size)
+    constant_size = isinstance(packet_size, (int, float))
+    if isinstance(packet_interval, (int, float)) and packet_interval <= 0:
+        raise ValueError("Constant packet interval must be positive.")
+
+    if interval_sampler is None or size_sampler is None or (shared and match_simpy):
+        return _draw_interleaved(packet_interval, packet_size, until)
+
+    blocks: list[np.ndarray] = []
+    now = 0.0
+    while now < until:
+        intervals = interval_sampler(block_size)
+        if (intervals < 0).any():
+            raise ValueError("Negative packet interval.")
+        # cumsum over [now, ...] adds sequentially, exactly like env.now + delay
+        times = np.cumsum(np.concatenate(([now], intervals)))[1:]
+        now = times[-1]
+        blocks.append(times[times < until])
+    creation_times = np.concatenate(blocks)
+    sizes = packet_sizes(size_sampler(len(creation_times)), constant_size)
+    return creation_times, sizes
+
+
+def _draw_interleaved(
+    packet_interval: Variate, packet_size: Variate, until: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Draw packets one by one in the order ``PacketSource`` does.
+
+    Parameters
+    ----------
+    packet_interval : Variate
+        Interval between packets, constant or callable.
+    packet_size : Variate
+        Packet size, constant or callable.
+    until : float
+        Simulation horizon.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Creation times and sizes of the packets.
+    """
+    constant_interval = isinstance(packet_interval, (int, float))
+    constant_size = isinstance(packet_size, (int, float))
+    times: list[float] = []
+    sizes: list[float] = []
+    now = 0.0
+    while True:
+        interval = packet_interval if constant_interval else packet_interval()  # type: ignore
+        if interval < 0:
+            raise ValueError("Negative packet interval.")
+        now += interval
+        if now >= until:
+            break
+        times.append(now)
+        sizes.append(packet_size if constant_size else packet_size())  # type: ignore
+    return np.asarray(times, dtype=np.float64), packet_sizes(
+        np.asarray(sizes, dtype=np.float64), constant_size
+    )